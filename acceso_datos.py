@@ -0,0 +1,106 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pymysql
+
+from metricas import metricas, normalizar_sql
+
+
+metricas.histograma('db_espera_pool_segundos', "Espera por una conexión libre del pool (incluye abrirla)")
+metricas.histograma('db_consulta_segundos', "Duración de cada sentencia SQL (ejecución y lectura del resultado)")
+metricas.contador('db_filas_total', "Filas devueltas o afectadas por cada sentencia SQL")
+
+
+# Capa de acceso a datos para las rutas async.
+# pymysql es bloqueante, así que cada consulta se ejecuta en un ThreadPoolExecutor
+# acotado al tamaño del pool: el bucle de eventos nunca espera a MySQL y como
+# mucho hay tantos hilos trabajando como conexiones disponibles.
+class AccesoDatos:
+    def __init__(self, pool, max_hilos=None):
+        self.pool = pool
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_hilos or pool.tamano_maximo,
+            thread_name_prefix='db'
+        )
+
+    # Ejecuta funcion(conexion, *args) en un hilo con una conexión prestada del pool
+    async def ejecutar(self, funcion, *args):
+        loop = asyncio.get_running_loop()
+        encolada = time.monotonic()
+        return await loop.run_in_executor(self._executor, self._con_conexion, encolada, funcion, args)
+
+    async def fetchall(self, query, params=None):
+        return await self.ejecutar(_fetchall, query, params)
+
+    async def fetchone(self, query, params=None):
+        return await self.ejecutar(_fetchone, query, params)
+
+    # Ejecuta una sentencia de escritura, hace commit y devuelve el rowcount
+    async def execute(self, query, params=None):
+        return await self.ejecutar(_execute, query, params)
+
+    def cerrar(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _con_conexion(self, encolada, funcion, args):
+        # El tiempo pasado en la cola del ejecutor cuenta para el plazo del pool,
+        # así la contrapresión sigue funcionando aunque la espera no sea en el semáforo
+        restante = self.pool.tiempo_espera - (time.monotonic() - encolada)
+        with metricas.medir('db_espera_pool_segundos'):
+            conn = self.pool.adquirir(tiempo_espera=restante)
+        try:
+            return funcion(conn, *args)
+        finally:
+            self.pool.liberar(conn)
+
+
+# Cursor de la API: un DictCursor que registra la duración y las filas de cada
+# sentencia, etiquetadas con su texto normalizado (ver metricas.normalizar_sql).
+# Se activa con 'cursorclass': CursorMedido en la configuración de la conexión.
+class CursorMedido(pymysql.cursors.DictCursor):
+    _en_lote = False
+
+    def execute(self, query, args=None):
+        if self._en_lote:
+            return super().execute(query, args)
+        inicio = time.perf_counter()
+        try:
+            return super().execute(query, args)
+        finally:
+            self._registrar(query, inicio)
+
+    # executemany llama a execute con los valores ya incrustados en el SQL; se
+    # mide una sola vez con la plantilla para no crear una etiqueta por lote
+    def executemany(self, query, args):
+        inicio = time.perf_counter()
+        self._en_lote = True
+        try:
+            return super().executemany(query, args)
+        finally:
+            self._en_lote = False
+            self._registrar(query, inicio)
+
+    def _registrar(self, query, inicio):
+        consulta = normalizar_sql(query)
+        metricas.observar('db_consulta_segundos', time.perf_counter() - inicio, consulta=consulta)
+        metricas.incrementar('db_filas_total', max(self.rowcount or 0, 0), consulta=consulta)
+
+
+def _fetchall(db, query, params):
+    with db.cursor() as cursor:
+        cursor.execute(query, params)
+        return cursor.fetchall()
+
+
+def _fetchone(db, query, params):
+    with db.cursor() as cursor:
+        cursor.execute(query, params)
+        return cursor.fetchone()
+
+
+def _execute(db, query, params):
+    with db.cursor() as cursor:
+        cursor.execute(query, params)
+        db.commit()
+        return cursor.rowcount
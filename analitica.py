@@ -0,0 +1,349 @@
+import threading
+import time
+
+import numpy as np
+import pymysql
+from pymysql.constants import ER
+
+from busqueda_empleados import normalizar
+from estadisticas import RANGOS_EDAD, formatear_carrera
+from lectura_incremental import MARGEN_MARCA, marca_bd, mismas_filas, query_totales
+
+
+COLUMNAS_CANDIDATOS = ['id_candidato', 'carrera', 'nivel_ingles', 'nota_media', 'edad']
+
+QUERY_CANDIDATOS = f"SELECT {', '.join(COLUMNAS_CANDIDATOS)} FROM candidatos"
+
+# Candidatos creados o modificados desde una marca (columna fecha_actualizacion,
+# ver sql/fecha_actualizacion_candidatos.sql)
+QUERY_CANDIDATOS_CAMBIADOS = QUERY_CANDIDATOS + " WHERE fecha_actualizacion >= %s"
+
+QUERY_TOTAL_CANDIDATOS = query_totales('candidatos', 'id_candidato')
+
+# Filas que se piden de cada vez al leer candidatos
+TAMANO_LOTE_LECTURA = 10000
+
+# Dimensiones por las que se puede agrupar y filtrar. rango_edad sale de la edad
+# con los mismos rangos que CASE_RANGO_EDAD.
+DIMENSIONES = ('carrera', 'nivel_ingles', 'rango_edad')
+
+# Límite inferior de cada rango de RANGOS_EDAD. Como en el CASE, las edades por
+# debajo del primero (y las nulas) caen en el último, '60+'.
+LIMITES_EDAD = np.array([19, 25, 30, 35, 40, 45, 50, 55, 60])
+
+# Edad guardada para los candidatos sin edad (las notas nulas se guardan como NaN)
+SIN_EDAD = -1
+
+
+def _rangos_edad(edad):
+    rangos = np.searchsorted(LIMITES_EDAD, edad, side='right') - 1
+    rangos[rangos < 0] = len(RANGOS_EDAD) - 1
+    return rangos.astype(np.int8)
+
+
+# Clave con la que se agrupan carrera y nivel_ingles: sin mayúsculas ni tildes,
+# como la collation de la tabla en el GROUP BY de QUERY_RESUMEN ('Física' y
+# 'física' son el mismo grupo)
+def _clave(valor):
+    return None if valor is None else normalizar(valor).casefold()
+
+
+# Codifica `valores` con los códigos de `diccionario` (lista de valores
+# distintos), que se amplía con los que no estaban. Los valores con la misma
+# _clave comparten código y el diccionario guarda el primero que aparece, como
+# MySQL devuelve uno cualquiera del grupo. Devuelve (códigos, diccionario).
+def _codificar(valores, diccionario=()):
+    diccionario = list(diccionario)
+    posiciones = {_clave(valor): i for i, valor in enumerate(diccionario)}
+
+    def codigo(valor):
+        clave = _clave(valor)
+        if clave not in posiciones:
+            posiciones[clave] = len(diccionario)
+            diccionario.append(valor)
+        return posiciones[clave]
+
+    codigos = np.fromiter((codigo(valor) for valor in valores), dtype=np.int32, count=len(valores))
+    return codigos, diccionario
+
+
+# Códigos de un diccionario ordenados por su valor (los nulos al final)
+def _orden_valores(diccionario):
+    return sorted(range(len(diccionario)), key=lambda i: (diccionario[i] is None, diccionario[i] or ''))
+
+
+# Instantánea en columnas de candidatos (carrera, nivel_ingles, nota_media, edad),
+# ordenada por id_candidato. carrera y nivel_ingles se guardan como códigos de
+# un diccionario de valores. Además se guarda un cubo con el número de
+# candidatos y la suma y el número de notas de cada combinación de carrera,
+# nivel de inglés y edad: las consultas reducen el cubo (unos miles de celdas)
+# en vez de recorrer las filas, salvo si filtran por nota, que obliga a
+# rehacerlo con las filas que pasan el filtro (un np.bincount).
+# Es inmutable: los refrescos crean otra, de modo que se puede consultar desde
+# cualquier hilo mientras se construye la siguiente.
+class TablaCandidatos:
+    def __init__(self, ids, codigos, diccionarios, nota, edad, marca=None, completa_en=None):
+        self.ids = ids
+        self.codigos = codigos  # carrera y nivel_ingles
+        self.diccionarios = diccionarios
+        self.nota = nota
+        self.edad = edad
+        self.marca = marca  # hora de la BD hasta la que está al día
+        self.completa_en = completa_en  # time.time() de la última lectura completa
+
+        # El tercer eje del cubo son las edades distintas; cada una con su rango
+        self.edades, codigo_edad = np.unique(edad, return_inverse=True)
+        self._rango_edad = _rangos_edad(self.edades)
+        self._forma = (len(diccionarios['carrera']), len(diccionarios['nivel_ingles']), len(self.edades))
+        self._celdas = np.ravel_multi_index(
+            (codigos['carrera'], codigos['nivel_ingles'], codigo_edad.reshape(-1)), self._forma
+        )
+        self._cubo = self._cubo_de(self._celdas, nota)
+        self._orden = {d: _orden_valores(diccionarios[d]) for d in codigos}
+        self._filas_resumen = None
+
+    @classmethod
+    def desde_columnas(cls, columnas, marca=None, completa_en=None, diccionarios=None):
+        diccionarios = diccionarios or {}
+        ids = np.array(columnas['id_candidato'], dtype=np.int64)
+        codigos, nuevos = {}, {}
+        for dimension in ('carrera', 'nivel_ingles'):
+            codigos[dimension], nuevos[dimension] = _codificar(columnas[dimension], diccionarios.get(dimension, ()))
+        nota = np.array([np.nan if n is None else float(n) for n in columnas['nota_media']], dtype=np.float64)
+        edad = np.array([SIN_EDAD if e is None else e for e in columnas['edad']], dtype=np.int32)
+        orden = np.argsort(ids, kind='stable')
+        return cls(ids[orden], {d: c[orden] for d, c in codigos.items()}, nuevos, nota[orden], edad[orden],
+                   marca, completa_en)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def memoria(self):
+        return sum(a.nbytes for a in [self.ids, self.nota, self.edad, self._celdas, *self.codigos.values(), *self._cubo])
+
+    # Sustituye (o añade) los candidatos de `columnas` y devuelve la tabla nueva
+    def fusionar(self, columnas, marca):
+        cambios = TablaCandidatos.desde_columnas(columnas, diccionarios=self.diccionarios)
+        conservar = ~np.isin(self.ids, cambios.ids)
+        ids = np.concatenate([self.ids[conservar], cambios.ids])
+        orden = np.argsort(ids, kind='stable')
+
+        def unir(a, b):
+            return np.concatenate([a[conservar], b])[orden]
+
+        codigos = {d: unir(self.codigos[d], cambios.codigos[d]) for d in self.codigos}
+        return TablaCandidatos(ids[orden], codigos, cambios.diccionarios, unir(self.nota, cambios.nota),
+                               unir(self.edad, cambios.edad), marca, self.completa_en)
+
+    # Filas de QUERY_RESUMEN (estadisticas.py) calculadas sobre la instantánea,
+    # para obtener con resumen_desde_filas las mismas respuestas que con SQL
+    def filas_resumen(self):
+        if self._filas_resumen is None:
+            filas = []
+            for dimension, clave in (('carrera', 'carrera'), ('ingles', 'nivel_ingles'), ('edad', 'rango_edad')):
+                valores, _, (counts, sumas_nota, con_nota, _, _) = self._reducir(self._cubo, (clave,))
+                for (valor,), count, suma_nota, n_nota in zip(valores, counts.tolist(), sumas_nota.tolist(), con_nota.tolist()):
+                    average = suma_nota / n_nota if dimension == 'carrera' and n_nota else None
+                    filas.append({'dimension': dimension, 'clave': valor, 'count': count, 'average': average})
+            self._filas_resumen = filas
+        return self._filas_resumen
+
+    # Conteo, porcentaje, nota media y edad media de los candidatos que cumplen
+    # los filtros, agrupados por las dimensiones de `agrupar` (un solo grupo si no
+    # se indica ninguna). `filtros` es {dimensión: [valores]}; la carrera se puede
+    # dar tal cual o como sale en /estadisticas/carrera. El porcentaje es sobre el
+    # total filtrado o, con `porcentaje_de`, sobre el total de su grupo en esa
+    # dimensión (p. ej. el % de cada nivel de inglés dentro de cada carrera).
+    # Lanza ValueError si algún parámetro no es válido.
+    def consultar(self, agrupar=(), filtros=None, edad_min=None, edad_max=None,
+                  nota_min=None, nota_max=None, porcentaje_de=None):
+        agrupar = tuple(agrupar)
+        filtros = filtros or {}
+        for dimension in agrupar + tuple(filtros):
+            if dimension not in DIMENSIONES:
+                raise ValueError(f"Dimensión no válida: {dimension}. Disponibles: {', '.join(DIMENSIONES)}")
+        if len(set(agrupar)) != len(agrupar):
+            raise ValueError("Dimensión repetida en agrupar")
+        if porcentaje_de is not None and porcentaje_de not in agrupar:
+            raise ValueError("porcentaje_de tiene que ser una de las dimensiones de agrupar")
+
+        cubo = self._cubo
+        if nota_min is not None or nota_max is not None:
+            filtro = np.ones(len(self.ids), dtype=bool)
+            if nota_min is not None:
+                filtro &= self.nota >= nota_min
+            if nota_max is not None:
+                filtro &= self.nota <= nota_max
+            cubo = self._cubo_de(self._celdas[filtro], self.nota[filtro])
+
+        # Qué posiciones de cada eje del cubo pasan los filtros
+        carreras = np.ones(self._forma[0], dtype=bool)
+        niveles = np.ones(self._forma[1], dtype=bool)
+        edades = np.ones(self._forma[2], dtype=bool)
+        if 'carrera' in filtros:
+            carreras = np.isin(np.arange(self._forma[0]), self._codigos('carrera', filtros['carrera']))
+        if 'nivel_ingles' in filtros:
+            niveles = np.isin(np.arange(self._forma[1]), self._codigos('nivel_ingles', filtros['nivel_ingles']))
+        if 'rango_edad' in filtros:
+            edades &= np.isin(self._rango_edad, [RANGOS_EDAD.index(v) for v in filtros['rango_edad'] if v in RANGOS_EDAD])
+        if edad_min is not None:
+            edades &= self.edades >= edad_min
+        if edad_max is not None:
+            edades &= (self.edades <= edad_max) & (self.edades != SIN_EDAD)
+        seleccion = carreras[:, None, None] & niveles[None, :, None] & edades[None, None, :]
+
+        valores, posiciones, (counts, sumas_nota, con_nota, sumas_edad, con_edad) = self._reducir(cubo, agrupar, seleccion)
+        total = int(counts.sum())
+        if porcentaje_de is None:
+            bases = np.full(len(counts), total)
+        else:
+            # Total de cada valor de porcentaje_de, repetido en cada uno de sus grupos
+            eje = posiciones[agrupar.index(porcentaje_de)]
+            bases = np.bincount(eje, weights=counts)[eje]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            medias = [np.round(counts / bases * 100, 2), np.round(sumas_nota / con_nota, 2),
+                      np.round(sumas_edad / con_edad, 2)]
+        medias = [_con_nulos(m) for m in medias]
+        columnas = agrupar + ('count', 'porcentaje', 'nota_media', 'edad_media')
+        grupos = [dict(zip(columnas, (*v, *m))) for v, *m in zip(valores, counts.tolist(), *medias)]
+        return {'total': total, 'grupos': grupos}
+
+    def _codigos(self, dimension, valores):
+        diccionario = self.diccionarios[dimension]
+        codigos = {_clave(valor): i for i, valor in enumerate(diccionario)}
+        if dimension == 'carrera':
+            codigos.update({_clave(formatear_carrera(valor)): i for i, valor in enumerate(diccionario) if valor is not None})
+        return [codigos[_clave(valor)] for valor in valores if _clave(valor) in codigos]
+
+    # Cubo (conteos, suma de notas, número de notas) de las filas con esas celdas
+    def _cubo_de(self, celdas, nota):
+        total = int(np.prod(self._forma))
+        con_nota = ~np.isnan(nota)
+        return (
+            np.bincount(celdas, minlength=total).reshape(self._forma),
+            np.bincount(celdas[con_nota], weights=nota[con_nota], minlength=total).reshape(self._forma),
+            np.bincount(celdas[con_nota], minlength=total).reshape(self._forma),
+        )
+
+    # Reduce el cubo a las dimensiones de `agrupar`, contando sólo las celdas de
+    # `seleccion`. Devuelve los grupos no vacíos en el orden de sus valores:
+    # (valores de cada grupo, posición de cada grupo en cada eje, [candidatos,
+    # suma de notas, notas no nulas, suma de edades, edades no nulas]).
+    def _reducir(self, cubo, agrupar, seleccion=None):
+        conteos, sumas_nota, con_nota = cubo
+        con_edad = self.edades != SIN_EDAD
+        medidas = [conteos, sumas_nota, con_nota, conteos * np.where(con_edad, self.edades, 0), conteos * con_edad]
+        if seleccion is not None:
+            medidas = [m * seleccion for m in medidas]
+
+        # El eje de edades pasa a rangos si se agrupa por rango_edad; si no, se suma
+        if 'rango_edad' in agrupar:
+            a_rango = (self._rango_edad[:, None] == np.arange(len(RANGOS_EDAD))).astype(np.int64)
+            medidas = [m @ a_rango for m in medidas]
+            ejes = ['carrera', 'nivel_ingles', 'rango_edad']
+        else:
+            medidas = [m.sum(axis=2) for m in medidas]
+            ejes = ['carrera', 'nivel_ingles']
+
+        sobrantes = tuple(i for i, d in enumerate(ejes) if d not in agrupar)
+        ejes = [d for d in ejes if d in agrupar]
+        medidas = [m.sum(axis=sobrantes).transpose([ejes.index(d) for d in agrupar]) for m in medidas]
+
+        # Cada eje ordenado por sus valores, así los grupos salen ya ordenados
+        etiquetas = []
+        for eje, dimension in enumerate(agrupar):
+            if dimension == 'rango_edad':
+                etiquetas.append(list(RANGOS_EDAD))
+                continue
+            orden = self._orden[dimension]
+            medidas = [np.take(m, orden, axis=eje) for m in medidas]
+            etiquetas.append([self.diccionarios[dimension][i] for i in orden])
+
+        if not agrupar:
+            return [()], (), [m.reshape(1) for m in medidas]
+        presentes = np.flatnonzero(medidas[0])
+        posiciones = np.unravel_index(presentes, medidas[0].shape)
+        valores = list(zip(*([etiquetas[eje][i] for i in p.tolist()] for eje, p in enumerate(posiciones))))
+        return valores, posiciones, [m.reshape(-1)[presentes] for m in medidas]
+
+
+# Lista con None en lugar de NaN
+def _con_nulos(valores):
+    lista = valores.astype(object)
+    lista[np.isnan(valores)] = None
+    return lista.tolist()
+
+
+# Con cursor de servidor (SSDictCursor), como en reentrenamiento.py: las filas
+# llegan por lotes y nunca está todo el resultado en memoria a la vez
+def _leer_columnas(db, query, params=None, tamano_lote=TAMANO_LOTE_LECTURA):
+    columnas = {c: [] for c in COLUMNAS_CANDIDATOS}
+    with db.cursor(pymysql.cursors.SSDictCursor) as cursor:
+        cursor.execute(query, params)
+        while True:
+            filas = cursor.fetchmany(tamano_lote)
+            if not filas:
+                break
+            for columna, valores in columnas.items():
+                valores.extend(fila[columna] for fila in filas)
+    return columnas
+
+
+# Lee candidatos de la BD partiendo de la tabla anterior: sólo los cambiados
+# desde su marca, que se sustituyen en ella. Se hace una lectura completa si no
+# hay tabla anterior, si la última completa tiene más de `completo_cada`
+# segundos, si falta la columna fecha_actualizacion o si el número de
+# candidatos o la suma de sus ids no cuadran (hubo DELETE). Devuelve (tabla, estadisticas).
+def leer_candidatos(db, anterior=None, completo_cada=86400):
+    inicio = time.perf_counter()
+    marca = marca_bd(db)
+
+    tabla = None
+    cambios = None
+    if anterior is not None and time.time() - anterior.completa_en < completo_cada:
+        try:
+            cambios = _leer_columnas(db, QUERY_CANDIDATOS_CAMBIADOS, (anterior.marca - MARGEN_MARCA,))
+        except pymysql.MySQLError as e:
+            if e.args[0] != ER.BAD_FIELD_ERROR:
+                raise
+        if cambios is not None:
+            tabla = anterior.fusionar(cambios, marca)
+            if not mismas_filas(db, QUERY_TOTAL_CANDIDATOS, None, tabla.ids):
+                tabla = None
+
+    incremental = tabla is not None
+    if not incremental:
+        tabla = TablaCandidatos.desde_columnas(_leer_columnas(db, QUERY_CANDIDATOS), marca, time.time())
+
+    return tabla, {
+        'tipo': 'incremental' if incremental else 'completa',
+        'cambios': len(cambios['id_candidato']) if incremental else None,
+        'filas': len(tabla),
+        'segundos': round(time.perf_counter() - inicio, 4),
+    }
+
+
+# Instantánea de candidatos de la API. refrescar() es bloqueante (recibe una
+# conexión, para AccesoDatos.ejecutar) y los refrescos van de uno en uno, así
+# cada uno parte de la tabla que dejó el anterior.
+class AnaliticaCandidatos:
+    def __init__(self, completo_cada=86400):
+        self.completo_cada = completo_cada
+        self.tabla = None
+        self.ultimo_refresco = None
+        self._lock = threading.Lock()
+
+    def refrescar(self, db):
+        with self._lock:
+            self.tabla, self.ultimo_refresco = leer_candidatos(db, self.tabla, self.completo_cada)
+            return self.tabla
+
+    def estadisticas(self):
+        tabla = self.tabla
+        return {
+            'filas': len(tabla) if tabla is not None else None,
+            'memoria_bytes': tabla.memoria() if tabla is not None else None,
+            'marca': tabla.marca.isoformat() if tabla is not None and tabla.marca is not None else None,
+            'ultimo_refresco': self.ultimo_refresco,
+        }
@@ -1,14 +1,38 @@
-from fastapi import FastAPI, HTTPException, Request, Query
+from fastapi import FastAPI, HTTPException, Request, Query, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 import os
 import pymysql
-import pandas as pd
-from typing import Optional
-import re 
-import joblib
-from sklearn.ensemble import RandomForestClassifier
-import boto3
+from pymysql.constants import ER
+from typing import List, Optional
+from datetime import date, datetime
+from starlette.concurrency import run_in_threadpool
+from registro_modelos import RegistroModelos, FuenteS3, FuenteArchivo
+from reentrenamiento import ColaReentrenamiento
+import modelo_compacto
+from s3_local import S3Local, ClienteS3Perezoso
+from inferencia import matriz_competencias, vector_competencias, PredictorRapido
+from cache_estadisticas import CacheEstadisticas
+from cache_predicciones import CachePredicciones
+from estadisticas import resumen_desde_filas
+from analitica import AnaliticaCandidatos
+from consultas_candidaturas import (consulta_conteo_por_status, consulta_matriz_por_status, matriz_desde_filas,
+                                    comprobar_columna_fecha, COLUMNA_FECHA)
+from paginacion import codificar_cursor, decodificar_cursor
+from busqueda_empleados import IndiceEmpleados, CAMPOS_BUSQUEDA
+from escritura_empleados import combinar_cambios, actualizar_empleados, eliminar_empleados, es_id
+import asyncio
+import signal
+import sys
+import time
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pool_conexiones import PoolConexiones, PoolAgotado
+from acceso_datos import AccesoDatos, CursorMedido
+from metricas import metricas, MiddlewareMetricas, PerfiladoMuestreado
+from respuestas import RespuestaJSON, CacheRespuestas, MiddlewareRespuestas
+from exportacion import (Exportador, ExportacionesAgotadas, TABLAS_EXPORTACION, FORMATOS_EXPORTACION,
+                         GENERADORES_EXPORTACION, parquet_disponible)
 
 
 
@@ -26,12 +50,68 @@ config = {
     'user': username,
     'password': password,
     'host': host,
-    'port': 3306,  # Asegúrate de incluir el puerto si es necesario
+    'port': int(os.getenv('DB_PORT', '3306')),
     'database': database,
-    'cursorclass': pymysql.cursors.DictCursor
+    'cursorclass': CursorMedido  # DictCursor que mide cada sentencia para /metrics
 }
 
-app = FastAPI()
+# Crear el pool de conexiones al arrancar y cerrarlo al apagar
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.pool = PoolConexiones(
+        config,
+        tamano_maximo=int(os.getenv('DB_POOL_SIZE', '10')),
+        tiempo_vida=float(os.getenv('DB_POOL_MAX_LIFETIME', '1800')),
+        tiempo_espera=float(os.getenv('DB_POOL_TIMEOUT', '5')),
+    )
+    app.state.datos = AccesoDatos(app.state.pool)
+    # Una columna de fecha mal configurada impide arrancar; si la BD no responde
+    # se arranca igual (el resto de rutas no la necesitan)
+    try:
+        await app.state.datos.ejecutar(comprobar_columna_fecha)
+    except (pymysql.MySQLError, PoolAgotado) as e:
+        print(f"No se pudo comprobar CANDIDATURAS_COLUMNA_FECHA: {e}", file=sys.stderr, flush=True)
+    # El modelo se carga en segundo plano: la API acepta peticiones enseguida y
+    # /ready indica cuándo puede predecir
+    carga_modelo = asyncio.create_task(cargar_modelo_local())
+    # SIGUSR1 recarga el modelo; servidor.py lo reenvía a todos los workers
+    # cuando uno de ellos publica un reentrenamiento. Sólo se puede instalar si
+    # el bucle corre en el hilo principal (no con TestClient, p. ej.).
+    if hasattr(signal, 'SIGUSR1'):
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(signal.SIGUSR1, lambda: loop.run_in_executor(None, registro_local.recargar))
+        except RuntimeError:
+            pass
+    yield
+    carga_modelo.cancel()
+    cola_reentrenamiento.cerrar()
+    app.state.datos.cerrar()
+    app.state.pool.cerrar()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=RespuestaJSON)
+
+# Rutas de lectura con ETag/Last-Modified y caché de respuestas (ver respuestas.py),
+# agrupadas por lo que las invalida
+RUTAS_EMPLEADOS = ('/all_empleados', '/empleados/buscar')
+RUTAS_CANDIDATURAS = ('/candidaturas_por_empleado', '/candidaturas_por_empleado/matrix', '/candidaturas_status')
+RUTAS_ESTADISTICAS = ('/estadisticas/resumen', '/estadisticas/carrera', '/estadisticas/notas', '/estadisticas/ingles', '/estadisticas/edad',
+                      '/estadisticas/consulta')
+
+cache_respuestas = CacheRespuestas(
+    ttl=float(os.getenv('RESPUESTAS_TTL', '5')),
+    max_entradas=int(os.getenv('RESPUESTAS_CACHE_ENTRADAS', '1000'))
+)
+
+# Se añade antes que el resto para que sea el más interno: CORS y las métricas
+# también se aplican a las respuestas que salen de la caché
+app.add_middleware(
+    MiddlewareRespuestas,
+    cache=cache_respuestas,
+    rutas=RUTAS_EMPLEADOS + RUTAS_CANDIDATURAS + RUTAS_ESTADISTICAS,
+    comprimir_min=int(os.getenv('RESPUESTAS_COMPRIMIR_MIN', '1024'))  # 0 = sin compresión
+)
 
 # Configuración del middleware CORS
 app.add_middleware(
@@ -46,47 +126,316 @@ app.add_middleware(
     allow_headers=["*"],  # Allow all headers
 )
 
-# Cargar el modelo
-model_path = 'models/model_web.pkl'  # Actualiza el nombre del archivo del modelo
-with open(model_path, 'rb') as f:
-    model = joblib.load(f)
+# Latencia por ruta para /metrics y perfilado de una de cada PERFILADO_CADA peticiones (0 = nunca)
+perfilado = PerfiladoMuestreado(cada=int(os.getenv('PERFILADO_CADA', '0')))
+app.add_middleware(MiddlewareMetricas, perfilado=perfilado)
+
+metricas.histograma('modelo_prediccion_segundos', "Inferencia del modelo por llamada")
+
 
-#Conectar con S3
+# predictor.predecir midiendo cada llamada en modelo_prediccion_segundos
+def predecir_medido(predictor, modelo):
+    def predecir(vector):
+        with metricas.medir('modelo_prediccion_segundos', modelo=modelo, tipo='individual'):
+            return predictor.predecir(vector)
+    return predecir
+
+# El bosque se evalúa aplanado en NumPy; con MODELO_APLANADO=0 se usa sklearn
+aplanar_modelo = os.getenv('MODELO_APLANADO', '1') == '1'
+
+# Cargar el modelo. /retrain lo sustituye en disco y lo recarga; el resto de
+# procesos que sirvan la API lo ven como mucho MODELO_LOCAL_TTL segundos después
+model_path = 'models/model_web.pkl'  # Actualiza el nombre del archivo del modelo
 
-s3_client = boto3.client(
-    's3',
-    aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
-    aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
-    region_name=os.getenv('AWS_REGION')
+# Con MODELO_COMPACTO=1 se sirve el formato compacto (modelo_compacto.py): se
+# abre con mmap sin deserializar sklearn y los workers comparten sus páginas
+modelo_compacto_activo = os.getenv('MODELO_COMPACTO', '0') == '1'
+if modelo_compacto_activo:
+    fuente_local = FuenteArchivo(modelo_compacto.ruta_compacta(model_path), cargador=modelo_compacto.cargar)
+    preparar_local = lambda modelo: modelo
+else:
+    fuente_local = FuenteArchivo(model_path)
+    preparar_local = lambda modelo: PredictorRapido(modelo, aplanar=aplanar_modelo)
+
+registro_local = RegistroModelos(
+    fuente_local,
+    ttl=float(os.getenv('MODELO_LOCAL_TTL', '30')),
+    preparar=preparar_local
 )
+
+# Si la primera carga falla se reintenta cada MODELO_REINTENTO segundos; /ready muestra el error
+MODELO_REINTENTO = float(os.getenv('MODELO_REINTENTO', '5'))
+error_carga_modelo = None
+
+
+def cargar_primer_modelo():
+    if modelo_compacto_activo:
+        modelo_compacto.asegurar(model_path)
+    registro_local.obtener()
+
+
+async def cargar_modelo_local():
+    global error_carga_modelo
+    while registro_local.actual is None:
+        try:
+            await run_in_threadpool(cargar_primer_modelo)
+            error_carga_modelo = None
+        except Exception as e:
+            error_carga_modelo = str(e)
+            await asyncio.sleep(MODELO_REINTENTO)
+
+
+# Comprobación de versión del modelo local en curso (una a la vez, en el executor)
+comprobacion_modelo = None
+
+
+# Modelo de /predict (ModeloCargado). Mientras se carga el primero se responde
+# 503 en lugar de bloquear el bucle de eventos esperándolo. Pasado el TTL, la
+# comprobación y la recarga (joblib.load + PredictorRapido) se hacen en el
+# executor y esta petición se sirve con el modelo que ya está en memoria.
+def modelo_local():
+    global comprobacion_modelo
+    actual = registro_local.actual
+    if actual is None:
+        raise HTTPException(status_code=503, detail="El modelo todavía se está cargando.", headers={"Retry-After": "5"})
+    if registro_local.caducado() and (comprobacion_modelo is None or comprobacion_modelo.done()):
+        comprobacion_modelo = asyncio.get_running_loop().run_in_executor(None, registro_local.obtener)
+    return actual
+
+
+#Conectar con S3 (o con un directorio local si se define S3_LOCAL_DIR).
+# El cliente se crea la primera vez que se usa.
+def crear_cliente_s3():
+    if os.getenv('S3_LOCAL_DIR'):
+        return S3Local(os.getenv('S3_LOCAL_DIR'))
+    import boto3
+    return boto3.client(
+        's3',
+        aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
+        aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
+        region_name=os.getenv('AWS_REGION')
+    )
+
+
+s3_client = ClienteS3Perezoso(crear_cliente_s3)
 s3_bucket_name = 'modelosexe'
 s3_model_key = 'model_web.pkl'
 
+# Resultados de /estadisticas/*: se recalculan como mucho cada ESTADISTICAS_TTL segundos
+cache_estadisticas = CacheEstadisticas(ttl=float(os.getenv('ESTADISTICAS_TTL', '300')))
+
+# Instantánea en columnas de candidatos sobre la que se calculan /estadisticas/*
+# (ver analitica.py). Cada refresco lee sólo los candidatos cambiados, salvo
+# una lectura completa cada ANALITICA_COMPLETA_CADA segundos.
+analitica_candidatos = AnaliticaCandidatos(completo_cada=float(os.getenv('ANALITICA_COMPLETA_CADA', '86400')))
+
+# Vectores de competencias por candidatura y predicciones por vector y versión del modelo
+cache_predicciones = CachePredicciones(
+    max_vectores=int(os.getenv('PREDICCION_CACHE_VECTORES', '100000')),
+    ttl_vectores=float(os.getenv('PREDICCION_CACHE_TTL', '60')),
+    max_predicciones=int(os.getenv('PREDICCION_CACHE_PREDICCIONES', '50000'))
+)
+
+# Workers que sirven la API; lo fija servidor.py al lanzarlos
+workers_api = int(os.getenv('API_WORKERS', '1'))
+
+# Cuando un reentrenamiento termina: usar el modelo nuevo ya (en todos los
+# workers, avisando al proceso principal de servidor.py) y subirlo a S3
+def publicar_modelo(ruta):
+    registro_local.recargar()
+    if workers_api > 1:
+        os.kill(os.getppid(), signal.SIGUSR1)
+    s3_client.upload_file(ruta, s3_bucket_name, s3_model_key)
+
+
+# El conjunto de entrenamiento se guarda junto al modelo para que cada
+# reentrenamiento sólo lea de la BD las candidaturas cambiadas
+cola_reentrenamiento = ColaReentrenamiento(
+    model_path,
+    n_jobs=int(os.getenv('REENTRENAMIENTO_N_JOBS', '-1')),
+    al_publicar=publicar_modelo,
+    ruta_instantanea=os.path.splitext(model_path)[0] + '.datos.npz',
+    modo=os.getenv('REENTRENAMIENTO_MODO', 'refit'),
+    completo_cada=float(os.getenv('REENTRENAMIENTO_COMPLETO_CADA', '86400')),
+    busqueda=os.getenv('REENTRENAMIENTO_BUSQUEDA', 'halving'),
+    cache_dir=os.getenv('REENTRENAMIENTO_CACHE', '.cache_entrenamiento'),
+    directorio_trabajos=os.path.join(os.path.dirname(model_path), 'trabajos') if workers_api > 1 else None,
+    ruta_bloqueo=model_path + '.lock' if workers_api > 1 else None
+)
+
+# Máximo de candidaturas que se pueden puntuar en una llamada a /predict/batch
+MAX_LOTE_PREDICCION = 1000
+
+# Modelo del bucket en memoria; se comprueba si hay versión nueva cada MODELO_BUCKET_TTL segundos
+registro_bucket = RegistroModelos(
+    FuenteS3(s3_client, s3_bucket_name, 'model_web1.pkl'),
+    ttl=float(os.getenv('MODELO_BUCKET_TTL', '60')),
+    preparar=lambda modelo: PredictorRapido(modelo, aplanar=aplanar_modelo)
+)
+
+
+# Dependencia para las rutas async: las consultas se ejecutan fuera del bucle de eventos
+def get_datos(request: Request):
+    return request.app.state.datos
+
+
+@app.exception_handler(PoolAgotado)
+async def pool_agotado_handler(request: Request, exc: PoolAgotado):
+    return JSONResponse(status_code=503, content={"detail": f"Base de datos saturada: {exc}"})
+
+
+# Readiness: 200 cuando el modelo de /predict está en memoria y 503 mientras se carga
+@app.get("/ready")
+async def ready():
+    actual = registro_local.actual
+    if actual is None:
+        return JSONResponse(status_code=503, content={"listo": False, "error": error_carga_modelo})
+    return {"listo": True, "modelo": actual.version, "cargado_en": actual.cargado_en}
+
+
+# Métricas de este proceso en formato Prometheus
+@app.get("/metrics")
+async def get_metrics():
+    return PlainTextResponse(metricas.exportar(), media_type="text/plain; version=0.0.4")
+
+
+# Últimos perfiles de cProfile tomados por muestreo
+@app.get("/metrics/perfiles")
+async def get_perfiles():
+    return {"cada": perfilado.cada, "perfiles": perfilado.perfiles()}
+
+
+# Activa el perfilado de una de cada `cada` peticiones; 0 lo desactiva
+@app.post("/metrics/perfilado")
+async def configurar_perfilado(cada: int = Query(..., ge=0)):
+    perfilado.configurar(cada)
+    return {"cada": perfilado.cada}
+
+
+@app.get("/pool_status")
+async def get_pool_status(request: Request):
+    return request.app.state.pool.estadisticas()
+
+
+# Columnas que necesita el listado de empleados (sin el hash de la contraseña)
+COLUMNAS_LISTADO_EMPLEADOS = ['id_empleado', 'nombre_empleado', 'apellidos_empleado', 'rol', 'is_logged', 'last_logged_date', 'num_candidaturas']
+
+# Índice de búsqueda de empleados en memoria. Se mantiene al día con
+# update/delete y se reconstruye desde la BD cada BUSQUEDA_TTL segundos para
+# recoger cambios hechos fuera de este proceso.
+indice_empleados = IndiceEmpleados()
+lock_indice_empleados = asyncio.Lock()
+BUSQUEDA_TTL = float(os.getenv('BUSQUEDA_TTL', '300'))
+
+# Con más coincidencias que esto el filtro de /all_empleados vuelve al LIKE
+MAX_IDS_BUSQUEDA = 5000
 
+
+async def reconstruir_indice_empleados(datos):
+    async with lock_indice_empleados:
+        if not indice_empleados.caducado(BUSQUEDA_TTL):
+            return
+
+        def construir(db):
+            with db.cursor() as cursor:
+                cursor.execute(f"SELECT id_empleado, {', '.join(CAMPOS_BUSQUEDA)} FROM empleados")
+                indice_empleados.reconstruir(cursor.fetchall())
+
+        await datos.ejecutar(construir)
+
+
+# Reconstrucción en segundo plano en curso. Se guarda la referencia para que la
+# tarea no se pierda antes de terminar; sus errores se muestran al acabar.
+tarea_indice_empleados = None
+
+
+def fin_reconstruccion_indice(tarea):
+    if not tarea.cancelled() and tarea.exception() is not None:
+        print(f"Error al reconstruir el índice de empleados: {tarea.exception()!r}", file=sys.stderr, flush=True)
+
+
+async def obtener_indice_empleados(datos):
+    global tarea_indice_empleados
+    # La primera vez se espera a construirlo; después, si caduca, se reconstruye
+    # en segundo plano mientras se sigue buscando en el anterior
+    if indice_empleados.construido_en is None:
+        await reconstruir_indice_empleados(datos)
+    elif (indice_empleados.caducado(BUSQUEDA_TTL) and not lock_indice_empleados.locked()
+          and (tarea_indice_empleados is None or tarea_indice_empleados.done())):
+        tarea_indice_empleados = asyncio.create_task(reconstruir_indice_empleados(datos))
+        tarea_indice_empleados.add_done_callback(fin_reconstruccion_indice)
+    return indice_empleados
+
+
+# Búsqueda de empleados por nombre, apellidos o rol, sin distinguir tildes y
+# ordenada por relevancia
+@app.get("/empleados/buscar")
+async def buscar_empleados(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, le=50),
+    datos=Depends(get_datos)
+):
+    try:
+        indice = await obtener_indice_empleados(datos)
+        resultados = await run_in_threadpool(indice.buscar, q, limit)
+        if not resultados:
+            return RespuestaJSON({"empleados": []})
+
+        ids = [id_empleado for id_empleado, _ in resultados]
+        marcadores = ', '.join(['%s'] * len(ids))
+        filas = await datos.fetchall(
+            f"SELECT {', '.join(COLUMNAS_LISTADO_EMPLEADOS)} FROM empleados WHERE id_empleado IN ({marcadores})",
+            ids
+        )
+
+        por_id = {fila['id_empleado']: fila for fila in filas}
+        return RespuestaJSON({"empleados": [
+            {**por_id[id_empleado], "puntuacion": puntuacion}
+            for id_empleado, puntuacion in resultados if id_empleado in por_id
+        ]})
+
+    except pymysql.MySQLError as e:
+        raise HTTPException(status_code=500, detail=f"Error de base de datos: {e}")
+
+
+# Paginación:
+# - con `offset` se mantiene la paginación clásica LIMIT/OFFSET (compatibilidad)
+# - sin `offset` se pagina por keyset: la respuesta incluye `next_cursor`, que se
+#   pasa como `cursor` para pedir la página siguiente. MySQL salta directamente a
+#   la posición por el índice en lugar de recorrer y descartar `offset` filas.
 @app.get("/all_empleados")
 async def get_all_empleados(
     limit: int = Query(..., le=50),  # Límite máximo es 50
-    offset: int = Query(...),
+    offset: Optional[int] = Query(None, ge=0),
+    cursor: Optional[str] = Query(None, description="next_cursor devuelto por la página anterior"),
     search: Optional[str] = None,
     sort_by: Optional[str] = Query('num_candidaturas', enum=['num_candidaturas', 'nombre_empleado', 'rol']),
-    sort_order: Optional[str] = Query('desc', enum=['asc', 'desc'])  # Agregar parámetro opcional para ordenar
+    sort_order: Optional[str] = Query('desc', enum=['asc', 'desc']),  # Agregar parámetro opcional para ordenar
+    datos=Depends(get_datos)
 ):
     try:
-        # Conectar a la base de datos
-        db = pymysql.connect(**config)
-        cursor = db.cursor()
+        if offset is not None and cursor is not None:
+            raise HTTPException(status_code=400, detail="Usa 'offset' o 'cursor', no ambos.")
 
         # Construir la consulta base
-        query = """
-        SELECT * FROM empleados
+        query = f"""
+        SELECT {', '.join(COLUMNAS_LISTADO_EMPLEADOS)} FROM empleados
         WHERE TRUE
         """
         parameters = []
 
-        # Agregar filtro de búsqueda si se proporciona
+        # Agregar filtro de búsqueda si se proporciona: los ids salen del índice de búsqueda
         if search:
-            query += ' AND (nombre_empleado LIKE %s OR apellidos_empleado LIKE %s OR rol LIKE %s)'
-            parameters.extend([f'%{search}%', f'%{search}%', f'%{search}%'])
+            indice = await obtener_indice_empleados(datos)
+            ids = [id_empleado for id_empleado, _ in await run_in_threadpool(indice.buscar, search)]
+            if not ids:
+                query += ' AND FALSE'
+            elif len(ids) <= MAX_IDS_BUSQUEDA:
+                query += f" AND id_empleado IN ({', '.join(['%s'] * len(ids))})"
+                parameters.extend(ids)
+            else:
+                query += ' AND (nombre_empleado LIKE %s OR apellidos_empleado LIKE %s OR rol LIKE %s)'
+                parameters.extend([f'%{search}%', f'%{search}%', f'%{search}%'])
 
         # Construir la cláusula ORDER BY dinámicamente basada en el parámetro sort_by y sort_order
         valid_sort_columns = ['num_candidaturas', 'nombre_empleado', 'rol']
@@ -96,63 +445,119 @@ async def get_all_empleados(
         if sort_order not in ['asc', 'desc']:
             sort_order = 'desc'  # Valor por defecto
 
-        query += f' ORDER BY {sort_by} {sort_order.upper()} LIMIT %s OFFSET %s'
-        parameters.extend([limit, offset])
+        if offset is not None:
+            query += f' ORDER BY {sort_by} {sort_order.upper()} LIMIT %s OFFSET %s'
+            parameters.extend([limit, offset])
+
+            # Ejecutar la consulta
+            empleados = await datos.fetchall(query, parameters)
+
+            return RespuestaJSON({"empleados": empleados})
+
+        # Keyset: continuar justo después de la última fila de la página anterior
+        comparador = '<' if sort_order == 'desc' else '>'
+        if cursor is not None:
+            try:
+                valor, ultimo_id = decodificar_cursor(cursor, sort_by, sort_order)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            query += f' AND ({sort_by} {comparador} %s OR ({sort_by} = %s AND id_empleado {comparador} %s))'
+            parameters.extend([valor, valor, ultimo_id])
+
+        # Se pide una fila de más para saber si hay página siguiente
+        query += f' ORDER BY {sort_by} {sort_order.upper()}, id_empleado {sort_order.upper()} LIMIT %s'
+        parameters.append(limit + 1)
 
-        # Ejecutar la consulta
-        cursor.execute(query, parameters)
-        empleados = cursor.fetchall()
+        empleados = await datos.fetchall(query, parameters)
 
-        return {"empleados": empleados}
+        next_cursor = None
+        if len(empleados) > limit:
+            empleados = empleados[:limit]
+            ultimo = empleados[-1]
+            next_cursor = codificar_cursor(sort_by, sort_order, ultimo[sort_by], ultimo['id_empleado'])
+
+        return RespuestaJSON({"empleados": empleados, "next_cursor": next_cursor})
 
     except pymysql.MySQLError as e:
         raise HTTPException(status_code=500, detail=f"Error de base de datos: {e}")
 
-    finally:
-        # Asegurarse de cerrar el cursor y la conexión a la base de datos
-        if 'cursor' in locals() and cursor:
-            cursor.close()
-        if 'db' in locals() and db:
-            db.close()
+# Exportaciones completas o incrementales para el data warehouse (ver exportacion.py)
+exportador = Exportador(config, max_concurrentes=int(os.getenv('EXPORT_MAX_CONCURRENTES', '2')))
+
+# Segundos que se pide esperar cuando ya hay EXPORT_MAX_CONCURRENTES exportaciones en curso
+EXPORT_REINTENTO = 30
+
+
+# Vuelca una tabla entera en streaming (NDJSON, CSV o Parquet) con memoria
+# constante, sin paginar. `columns` elige columnas y `updated_since` limita la
+# exportación a las filas creadas o modificadas desde esa fecha.
+@app.get("/export/{tabla}")
+async def exportar_tabla(
+    tabla: str,
+    formato: str = Query('ndjson', alias='format', enum=list(FORMATOS_EXPORTACION)),
+    columns: Optional[str] = Query(None, description="Columnas separadas por comas (por defecto todas)"),
+    updated_since: Optional[datetime] = Query(None, description="Sólo filas con fecha_actualizacion posterior o igual"),
+):
+    if tabla not in TABLAS_EXPORTACION:
+        raise HTTPException(status_code=404, detail=f"Tabla no exportable. Disponibles: {', '.join(TABLAS_EXPORTACION)}")
+    if formato not in FORMATOS_EXPORTACION:
+        raise HTTPException(status_code=400, detail=f"Formato no válido. Disponibles: {', '.join(FORMATOS_EXPORTACION)}")
+    if formato == 'parquet' and not parquet_disponible():
+        raise HTTPException(status_code=501, detail="Formato parquet no disponible: falta instalar pyarrow.")
 
-@app.delete("/delete_empleado")
-async def delete_empleado(id_empleado: int):
     try:
-        # Conectar a la base de datos
-        db = pymysql.connect(**config)
-        cursor = db.cursor()
+        exportacion = await run_in_threadpool(exportador.abrir, tabla, columns, updated_since)
+    except ValueError as e:
+        # Columnas pedidas que no tiene la tabla, o updated_since sin fecha_actualizacion
+        raise HTTPException(status_code=400, detail=str(e))
+    except ExportacionesAgotadas as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={'Retry-After': str(EXPORT_REINTENTO)})
+    except pymysql.MySQLError as e:
+        if e.args[0] == ER.BAD_FIELD_ERROR:
+            raise HTTPException(status_code=400, detail=f"Columna no disponible en la base de datos (¿falta aplicar las migraciones de sql/?): {e}")
+        raise HTTPException(status_code=500, detail=f"Error de base de datos: {e}")
 
-        # Verificar si el empleado existe
-        select_query = "SELECT id_empleado FROM empleados WHERE id_empleado = %s"
-        cursor.execute(select_query, (id_empleado,))
-        empleado = cursor.fetchone()
+    return StreamingResponse(
+        GENERADORES_EXPORTACION[formato](exportacion),
+        media_type=FORMATOS_EXPORTACION[formato],
+        headers={'Content-Disposition': f'attachment; filename="{tabla}.{formato}"'}
+    )
 
-        if not empleado:
-            raise HTTPException(status_code=404, detail="Empleado no encontrado")
 
-        # Actualizar las candidaturas para que el id_empleado sea 1
-        update_query = "UPDATE candidaturas SET id_empleado = 1 WHERE id_empleado = %s"
-        cursor.execute(update_query, (id_empleado,))
-        db.commit()
+@app.delete("/delete_empleado")
+async def delete_empleado(id_empleado: int, datos=Depends(get_datos)):
+    def eliminar(db):
+        with db.cursor() as cursor:
+            # Verificar si el empleado existe
+            select_query = "SELECT id_empleado FROM empleados WHERE id_empleado = %s"
+            cursor.execute(select_query, (id_empleado,))
+            empleado = cursor.fetchone()
+
+            if not empleado:
+                raise HTTPException(status_code=404, detail="Empleado no encontrado")
+
+            # Actualizar las candidaturas para que el id_empleado sea 1
+            update_query = "UPDATE candidaturas SET id_empleado = 1 WHERE id_empleado = %s"
+            cursor.execute(update_query, (id_empleado,))
+            db.commit()
+
+            # Eliminar el empleado
+            delete_query = "DELETE FROM empleados WHERE id_empleado = %s"
+            cursor.execute(delete_query, (id_empleado,))
+            db.commit()
 
-        # Eliminar el empleado
-        delete_query = "DELETE FROM empleados WHERE id_empleado = %s"
-        cursor.execute(delete_query, (id_empleado,))
-        db.commit()
+    try:
+        await datos.ejecutar(eliminar)
+        indice_empleados.eliminar(id_empleado)
+        cache_respuestas.invalidar(*RUTAS_EMPLEADOS, *RUTAS_CANDIDATURAS)
 
         return {"detail": "Empleado eliminado exitosamente"}
 
     except pymysql.MySQLError as e:
         raise HTTPException(status_code=500, detail=f"Error de base de datos: {e}")
 
-    finally:
-        if 'cursor' in locals() and cursor:
-            cursor.close()
-        if 'db' in locals() and db:
-            db.close()
-
 @app.put("/update_empleado")
-async def update_empleado(request: Request):
+async def update_empleado(request: Request, datos=Depends(get_datos)):
     try:
         body = await request.json()
         id_empleado = body.get("id_empleado")
@@ -165,10 +570,6 @@ async def update_empleado(request: Request):
         if not id_empleado:
             raise HTTPException(status_code=400, detail="El campo 'id_empleado' es requerido.")
 
-        # Conectar a la base de datos
-        db = pymysql.connect(**config)
-        cursor = db.cursor()
-
         # Preparar la consulta de actualización con COALESCE
         update_query = """
         UPDATE empleados
@@ -182,7 +583,7 @@ async def update_empleado(request: Request):
         """
         
         # Ejecutar la consulta de actualización
-        cursor.execute(update_query, (
+        rowcount = await datos.execute(update_query, (
             nombre_empleado,
             apellidos_empleado,
             password,
@@ -190,463 +591,481 @@ async def update_empleado(request: Request):
             is_logged,
             id_empleado
         ))
-        db.commit()
 
-        if cursor.rowcount == 0:
+        if rowcount == 0:
             raise HTTPException(status_code=404, detail="Empleado no encontrado")
 
+        # Mantener el índice de búsqueda al día; si el empleado no estaba indexado se reconstruye
+        if not indice_empleados.actualizar(
+            id_empleado,
+            nombre_empleado=nombre_empleado,
+            apellidos_empleado=apellidos_empleado,
+            rol=rol
+        ):
+            indice_empleados.caducar()
+        cache_respuestas.invalidar(*RUTAS_EMPLEADOS)
+
         return {"detail": "Empleado actualizado exitosamente"}
 
     except pymysql.MySQLError as e:
         raise HTTPException(status_code=500, detail=f"Error de base de datos: {e}")
 
-    finally:
-        if 'cursor' in locals() and cursor:
-            cursor.close()
-        if 'db' in locals() and db:
-            db.close()
 
-@app.get("/candidaturas_por_empleado")
-async def get_candidaturas_por_empleado(id_empleado: int = Query(..., description="ID del empleado para filtrar candidaturas")):
+# Máximo de empleados por llamada a /update_empleados y /delete_empleados
+MAX_LOTE_EMPLEADOS = 1000
+
+
+# Como PUT /update_empleado para una lista de empleados: {"empleados": [{"id_empleado": 1, "rol": ...}, ...]}.
+# Todo se aplica en una transacción con una sola sentencia UPDATE (ver
+# escritura_empleados.actualizar_empleados) y se devuelve el resultado de cada id.
+@app.put("/update_empleados")
+async def update_empleados(request: Request, datos=Depends(get_datos)):
     try:
-        # Conectar a la base de datos
-        db = pymysql.connect(**config)
-        cursor = db.cursor(pymysql.cursors.DictCursor)  # Use DictCursor to get results as dictionaries
-
-        # Obtener los datos de la tabla de candidaturas para el empleado específico
-        query = """
-        SELECT status, COUNT(*) as count 
-        FROM candidaturas 
-        WHERE id_empleado = %s
-        GROUP BY status
-        """
-        cursor.execute(query, (id_empleado,))
-        data = cursor.fetchall()
-        
-        # Convertir los datos a un DataFrame de pandas
-        df = pd.DataFrame(data)
+        body = await request.json()
+        empleados = body.get("empleados")
+
+        if not isinstance(empleados, list) or not all(
+            isinstance(empleado, dict) and es_id(empleado.get("id_empleado")) for empleado in empleados
+        ):
+            raise HTTPException(status_code=400, detail="El campo 'empleados' debe ser una lista de objetos con 'id_empleado' entero.")
+
+        cambios = combinar_cambios(empleados)
+        if len(cambios) > MAX_LOTE_EMPLEADOS:
+            raise HTTPException(status_code=400, detail=f"Como máximo se pueden actualizar {MAX_LOTE_EMPLEADOS} empleados por llamada.")
+        if not cambios:
+            return {"resultados": []}
+
+        existentes = await datos.ejecutar(actualizar_empleados, cambios)
+        cache_respuestas.invalidar(*RUTAS_EMPLEADOS)
+
+        resultados = []
+        for id_empleado, valores in cambios.items():
+            if id_empleado not in existentes:
+                resultados.append({"id_empleado": id_empleado, "status_code": 404, "detail": "Empleado no encontrado"})
+                continue
+            # Mantener el índice de búsqueda al día; si el empleado no estaba indexado se reconstruye
+            if not indice_empleados.actualizar(id_empleado, **valores):
+                indice_empleados.caducar()
+            resultados.append({"id_empleado": id_empleado, "status_code": 200, "detail": "Empleado actualizado exitosamente"})
+
+        return {"resultados": resultados}
+
+    except pymysql.MySQLError as e:
+        raise HTTPException(status_code=500, detail=f"Error de base de datos: {e}")
 
-        # Cerrar la conexión
-        cursor.close()
-        db.close()
 
-        # Verificar si se obtuvieron datos
-        if df.empty:
-            return {"message": "No se encontraron candidaturas para el empleado especificado."}
+# Como DELETE /delete_empleado para una lista de ids: {"ids": [1, 2, ...]}. Las
+# candidaturas de todos se reasignan con un UPDATE y se borran con un DELETE, en
+# una transacción (ver escritura_empleados.eliminar_empleados).
+@app.delete("/delete_empleados")
+async def delete_empleados(request: Request, datos=Depends(get_datos)):
+    try:
+        body = await request.json()
+        ids = body.get("ids")
 
-        # Convertir el DataFrame a un diccionario
-        result = df.set_index('status')['count'].to_dict()
+        if not isinstance(ids, list) or not all(es_id(i) for i in ids):
+            raise HTTPException(status_code=400, detail="El campo 'ids' debe ser una lista de enteros.")
 
-        # Retornar el diccionario como respuesta JSON
-        return result
+        # Quitar duplicados conservando el orden
+        ids = list(dict.fromkeys(ids))
+        if len(ids) > MAX_LOTE_EMPLEADOS:
+            raise HTTPException(status_code=400, detail=f"Como máximo se pueden eliminar {MAX_LOTE_EMPLEADOS} empleados por llamada.")
+        if not ids:
+            return {"resultados": []}
+
+        eliminados = await datos.ejecutar(eliminar_empleados, ids)
+        cache_respuestas.invalidar(*RUTAS_EMPLEADOS, *RUTAS_CANDIDATURAS)
+
+        resultados = []
+        for id_empleado in ids:
+            if id_empleado not in eliminados:
+                resultados.append({"id_empleado": id_empleado, "status_code": 404, "detail": "Empleado no encontrado"})
+                continue
+            indice_empleados.eliminar(id_empleado)
+            resultados.append({"id_empleado": id_empleado, "status_code": 200, "detail": "Empleado eliminado exitosamente"})
+
+        return {"resultados": resultados}
 
     except pymysql.MySQLError as e:
         raise HTTPException(status_code=500, detail=f"Error de base de datos: {e}")
 
-    except Exception as e:
-   
- 
-        raise HTTPException(status_code=500, detail=f"Error al generar la respuesta: {e}")
-    
+# La tabla resumen se usa mientras exista. Si no se ha creado se cuenta sobre
+# candidaturas y se vuelve a probar cada RESUMEN_REINTENTO segundos, por si la
+# migración se aplica con la API en marcha.
+RESUMEN_REINTENTO = float(os.getenv('RESUMEN_REINTENTO', '60'))
+resumen_ausente_desde = None  # time.monotonic() de la última vez que no existía
 
 
-@app.get("/candidaturas_status")
-async def get_candidaturas_status():
-    try:
-        # Conectar a la base de datos
-        db = pymysql.connect(**config)
-        cursor = db.cursor(pymysql.cursors.DictCursor)
+# Ejecuta una consulta de consultas_candidaturas sobre la tabla resumen o, si no
+# existe, sobre candidaturas
+async def consultar_conteos(datos, consulta, ids_empleado, desde, hasta):
+    global resumen_ausente_desde
 
-        # Obtener los datos de la tabla de candidaturas
-        query = "SELECT status FROM candidaturas"
-        cursor.execute(query)
-        data = cursor.fetchall()
+    if COLUMNA_FECHA is None and (desde is not None or hasta is not None):
+        raise HTTPException(status_code=400, detail="Los filtros desde/hasta están desactivados: falta CANDIDATURAS_COLUMNA_FECHA.")
+
+    if resumen_ausente_desde is None or time.monotonic() - resumen_ausente_desde >= RESUMEN_REINTENTO:
+        try:
+            filas = await datos.fetchall(*consulta(ids_empleado, desde, hasta, resumen=True))
+            resumen_ausente_desde = None
+            return filas
+        except pymysql.err.ProgrammingError as e:
+            if e.args[0] != ER.NO_SUCH_TABLE:
+                raise
+            resumen_ausente_desde = time.monotonic()
+
+    return await datos.fetchall(*consulta(ids_empleado, desde, hasta, resumen=False))
 
-        # Convertir los datos a un DataFrame de pandas
-        df = pd.DataFrame(data)
 
-        # Contar candidatos en cada estado
-        status_counts = df['status'].value_counts().reset_index()
-        status_counts.columns = ['status', 'count']
+# Conteo de candidaturas por status con filtros opcionales, agregado en MySQL
+async def contar_candidaturas_por_status(datos, id_empleado=None, desde=None, hasta=None):
+    data = await consultar_conteos(datos, consulta_conteo_por_status, id_empleado, desde, hasta)
+    return {row['status']: int(row['count']) for row in data}
 
-        # Convertir el DataFrame a un diccionario
-        result = status_counts.set_index('status')['count'].to_dict()
 
-        # Cerrar la conexión
-        cursor.close()
-        db.close()
+@app.get("/candidaturas_por_empleado")
+async def get_candidaturas_por_empleado(
+    id_empleado: int = Query(..., description="ID del empleado para filtrar candidaturas"),
+    desde: Optional[date] = Query(None, description="Fecha inicial (incluida)"),
+    hasta: Optional[date] = Query(None, description="Fecha final (incluida)"),
+    datos=Depends(get_datos)
+):
+    try:
+        # Obtener el conteo por status de las candidaturas del empleado específico
+        result = await contar_candidaturas_por_status(datos, id_empleado, desde, hasta)
+
+        # Verificar si se obtuvieron datos
+        if not result:
+            return {"message": "No se encontraron candidaturas para el empleado especificado."}
 
         # Retornar el diccionario como respuesta JSON
-        return result
+        return RespuestaJSON(result)
 
     except pymysql.MySQLError as e:
         raise HTTPException(status_code=500, detail=f"Error de base de datos: {e}")
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error: {e}")
 
-@app.get("/estadisticas/carrera")
-async def get_career_count():
-    try:
-        # Conectar a la base de datos
-        db = pymysql.connect(**config)
-        cursor = db.cursor()
-
-        # Obtener el total de candidatos
-        cursor.execute('SELECT COUNT(*) as total FROM candidatos')
-        total_count = cursor.fetchone()['total']
+# Conteos por status de todos los empleados (o de los id_empleado indicados) con
+# un solo GROUP BY, para no llamar a /candidaturas_por_empleado una vez por empleado
+@app.get("/candidaturas_por_empleado/matrix")
+async def get_matriz_candidaturas_por_empleado(
+    id_empleado: Optional[List[int]] = Query(None, description="IDs de empleado (se puede repetir); por defecto todos"),
+    desde: Optional[date] = Query(None, description="Fecha inicial (incluida)"),
+    hasta: Optional[date] = Query(None, description="Fecha final (incluida)"),
+    datos=Depends(get_datos)
+):
+    if id_empleado is not None and len(id_empleado) > MAX_LOTE_EMPLEADOS:
+        raise HTTPException(status_code=400, detail=f"Como máximo se pueden pedir {MAX_LOTE_EMPLEADOS} empleados por llamada.")
 
-        # Obtener el conteo de cada carrera
-        cursor.execute('SELECT carrera, COUNT(*) as count FROM candidatos GROUP BY carrera')
-        data = cursor.fetchall()
+    try:
+        ids = sorted(set(id_empleado)) if id_empleado else None
+        filas = await consultar_conteos(datos, consulta_matriz_por_status, ids, desde, hasta)
+        return RespuestaJSON(matriz_desde_filas(filas))
 
-        # Calcular el porcentaje para cada carrera
-        if total_count == 0:
-            return {"message": "No hay datos disponibles"}
+    except pymysql.MySQLError as e:
+        raise HTTPException(status_code=500, detail=f"Error de base de datos: {e}")
 
-        career_count = {
-            re.sub(r'\s+', '_', row['carrera']).lower(): round((row['count'] / total_count) * 100, 2)
-            for row in data
-        }
 
-        return career_count
+@app.get("/candidaturas_status")
+async def get_candidaturas_status(
+    id_empleado: Optional[int] = Query(None, description="ID del empleado para filtrar candidaturas"),
+    desde: Optional[date] = Query(None, description="Fecha inicial (incluida)"),
+    hasta: Optional[date] = Query(None, description="Fecha final (incluida)"),
+    datos=Depends(get_datos)
+):
+    try:
+        # Contar candidaturas en cada estado
+        return RespuestaJSON(await contar_candidaturas_por_status(datos, id_empleado, desde, hasta))
 
     except pymysql.MySQLError as e:
         raise HTTPException(status_code=500, detail=f"Error de base de datos: {e}")
 
-    finally:
-        cursor.close()
-        db.close()
-
-
-@app.get("/estadisticas/notas")
-async def get_average_grades():
+# Refresca la instantánea de candidatos desde la BD
+async def refrescar_candidatos(datos):
     try:
-        # Conectar a la base de datos
-        db = pymysql.connect(**config)
-        cursor = db.cursor()
-
-        # Ejecutar la consulta para obtener el promedio de notas por carrera
-        cursor.execute('SELECT carrera, AVG(nota_media) as average FROM candidatos GROUP BY carrera')
-        
-        # Obtener los resultados
-        average_grades = {}
-        for row in cursor.fetchall():
-            carrera = row['carrera']
-            average = row['average']
-            
-            # Formatear el nombre de la carrera
-            formatted_carrera = re.sub(r'\s+', '_', carrera).lower()
-            
-            # Redondear la nota media a 2 decimales si no es None
-            average_grades[formatted_carrera] = round(average, 2) if average is not None else None
-        
-        return average_grades
+        return await datos.ejecutar(analitica_candidatos.refrescar)
 
     except pymysql.MySQLError as e:
         raise HTTPException(status_code=500, detail=f"Error de base de datos: {e}")
 
-    finally:
-        cursor.close()
-        db.close()
 
+# La instantánea se refresca como mucho una vez por TTL, la pidan las rutas que la pidan
+async def obtener_candidatos(datos):
+    return await cache_estadisticas.obtener('candidatos', lambda: refrescar_candidatos(datos))
 
 
-@app.get("/estadisticas/ingles")
-async def get_english_level_count():
-    try:
-        # Conectar a la base de datos
-        db = pymysql.connect(**config)
-        cursor = db.cursor()
+# Todas las estadísticas de candidatos a partir de la instantánea, con las mismas
+# respuestas que la consulta SQL original (ver estadisticas.QUERY_RESUMEN)
+async def calcular_resumen(datos):
+    tabla = await obtener_candidatos(datos)
+    return resumen_desde_filas(tabla.filas_resumen())
 
-        # Obtener el total de candidatos
-        cursor.execute('SELECT COUNT(*) as total FROM candidatos')
-        total_count = cursor.fetchone()['total']
 
-        # Obtener el conteo de cada nivel de inglés
-        cursor.execute('SELECT nivel_ingles, COUNT(*) as count FROM candidatos GROUP BY nivel_ingles')
-        data = cursor.fetchall()
+# Las cuatro rutas y /estadisticas/resumen comparten la misma entrada de la caché,
+# así que una vista del dashboard cuesta como mucho un refresco por TTL
+async def obtener_resumen(datos):
+    return await cache_estadisticas.obtener('resumen', lambda: calcular_resumen(datos))
 
-        # Calcular el porcentaje para cada nivel de inglés
-        if total_count == 0:
-            return {"message": "No hay datos disponibles"}
 
-        english_level_count = {
-            row['nivel_ingles']: round((row['count'] / total_count) * 100, 2)
-            for row in data
-        }
-        return english_level_count
+@app.get("/estadisticas/resumen")
+async def get_resumen_estadisticas(datos=Depends(get_datos)):
+    return RespuestaJSON(await obtener_resumen(datos))
 
-    except pymysql.MySQLError as e:
-        raise HTTPException(status_code=500, detail=f"Error de base de datos: {e}")
 
-    finally:
-        cursor.close()
-        db.close()
+@app.get("/estadisticas/carrera")
+async def get_career_count(datos=Depends(get_datos)):
+    return RespuestaJSON((await obtener_resumen(datos))['carrera'])
 
 
+@app.get("/estadisticas/notas")
+async def get_average_grades(datos=Depends(get_datos)):
+    return RespuestaJSON((await obtener_resumen(datos))['notas'])
+
+
+@app.get("/estadisticas/ingles")
+async def get_english_level_count(datos=Depends(get_datos)):
+    return RespuestaJSON((await obtener_resumen(datos))['ingles'])
 
 
 @app.get("/estadisticas/edad")
-async def get_age_distribution():
+async def get_age_distribution(datos=Depends(get_datos)):
+    return RespuestaJSON((await obtener_resumen(datos))['edad'])
+
+
+# Cruces de las estadísticas de candidatos: conteo, porcentaje, nota media y edad
+# media agrupando por varias dimensiones y con filtros, p. ej. el nivel de inglés
+# por carrera (?agrupar=carrera,nivel_ingles&porcentaje_de=carrera)
+@app.get("/estadisticas/consulta")
+async def consultar_estadisticas(
+    agrupar: Optional[str] = Query(None, description="Dimensiones separadas por comas: carrera, nivel_ingles, rango_edad"),
+    carrera: Optional[List[str]] = Query(None, description="Carreras (se puede repetir)"),
+    nivel_ingles: Optional[List[str]] = Query(None, description="Niveles de inglés (se puede repetir)"),
+    rango_edad: Optional[List[str]] = Query(None, description="Rangos de edad, p. ej. 25-29 (se puede repetir)"),
+    edad_min: Optional[int] = Query(None),
+    edad_max: Optional[int] = Query(None),
+    nota_min: Optional[float] = Query(None),
+    nota_max: Optional[float] = Query(None),
+    porcentaje_de: Optional[str] = Query(None, description="Dimensión de agrupar sobre cuyo total se calcula el porcentaje"),
+    datos=Depends(get_datos)
+):
+    filtros = {dimension: valores for dimension, valores in
+               (('carrera', carrera), ('nivel_ingles', nivel_ingles), ('rango_edad', rango_edad)) if valores}
+    dimensiones = [d.strip() for d in agrupar.split(',') if d.strip()] if agrupar else []
+
+    tabla = await obtener_candidatos(datos)
     try:
-        # Conectar a la base de datos
-        db = pymysql.connect(**config)
-        cursor = db.cursor(pymysql.cursors.DictCursor)
-
-        # Obtener el total de candidatos
-        cursor.execute('SELECT COUNT(*) as total FROM candidatos')
-        total_count = cursor.fetchone()['total']
-
-        # Consulta SQL para agrupar edades en los rangos especificados y ordenarlos
-        query = """
-        SELECT 
-            CASE
-                WHEN edad BETWEEN 19 AND 24 THEN '19-24'
-                WHEN edad BETWEEN 25 AND 29 THEN '25-29'
-                WHEN edad BETWEEN 30 AND 34 THEN '30-34'
-                WHEN edad BETWEEN 35 AND 39 THEN '35-39'
-                WHEN edad BETWEEN 40 AND 44 THEN '40-44'
-                WHEN edad BETWEEN 45 AND 49 THEN '45-49'
-                WHEN edad BETWEEN 50 AND 54 THEN '50-54'
-                WHEN edad BETWEEN 55 AND 59 THEN '55-59'
-                ELSE '60+'
-            END AS age_range,
-            COUNT(*) as count 
-        FROM 
-            candidatos 
-        GROUP BY 
-            age_range
-        ORDER BY
-            CASE
-                WHEN age_range = '19-24' THEN 1
-                WHEN age_range = '25-29' THEN 2
-                WHEN age_range = '30-34' THEN 3
-                WHEN age_range = '35-39' THEN 4
-                WHEN age_range = '40-44' THEN 5
-                WHEN age_range = '45-49' THEN 6
-                WHEN age_range = '50-54' THEN 7
-                WHEN age_range = '55-59' THEN 8
-                ELSE 9
-            END
-        """
-        cursor.execute(query)
-        data = cursor.fetchall()
+        return RespuestaJSON(tabla.consultar(dimensiones, filtros, edad_min, edad_max, nota_min, nota_max, porcentaje_de))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        # Calcular el porcentaje para cada rango de edad
-        if total_count == 0:
-            return {"message": "No hay datos disponibles"}
 
-        df = pd.DataFrame(data)
-        df['percentage'] = (df['count'] / total_count) * 100
-        df['percentage'] = df['percentage'].round(2)  # Round percentages to 2 decimal places
+@app.get("/estadisticas/cache")
+async def get_estadisticas_cache():
+    return {**cache_estadisticas.estadisticas(), 'candidatos': analitica_candidatos.estadisticas()}
 
-        # Convertir el DataFrame a un diccionario
-        result = df.set_index('age_range')['percentage'].to_dict()
 
-        # Cerrar la conexión
-        cursor.close()
-        db.close()
+# Descarta los resultados guardados tras cambios en candidatos
+@app.post("/estadisticas/cache/invalidar")
+async def invalidar_estadisticas_cache():
+    cache_estadisticas.invalidar()
+    cache_respuestas.invalidar(*RUTAS_ESTADISTICAS)
+    return {"detail": "Caché de estadísticas invalidada"}
 
-        return result
 
-    except pymysql.MySQLError as e:
-        raise HTTPException(status_code=500, detail=f"Error de base de datos: {e}")
+@app.get("/respuestas/cache")
+async def get_respuestas_cache():
+    return cache_respuestas.estadisticas()
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error: {e}")
+
+# Descarta las respuestas guardadas de las rutas de lectura, p. ej. tras cambios
+# hechos en la BD fuera de esta API
+@app.post("/respuestas/cache/invalidar")
+async def invalidar_respuestas_cache():
+    cache_respuestas.invalidar()
+    return {"detail": "Caché de respuestas invalidada"}
 
 
+# Vector de entrada de una candidatura en el orden de COMPETENCIAS (0 si falta
+# alguna competencia), de la caché o de la BD. 404 si no tiene competencias.
+async def vector_candidatura(datos, id_candidatura):
+    vector = cache_predicciones.vector(id_candidatura)
+    if vector is not None:
+        return vector
+
+    competencias = await datos.fetchall("""
+        SELECT nombre_competencia, nota
+        FROM competencias
+        WHERE id_candidatura = %s
+    """, (id_candidatura,))
+
+    if not competencias:
+        raise HTTPException(status_code=404, detail="No se encontraron competencias para la candidatura proporcionada.")
+
+    vector = vector_competencias(competencias)
+    cache_predicciones.guardar_vector(id_candidatura, vector)
+    return vector
 
 
 @app.get("/predict")
-async def predict(id_candidatura: int):
-    # Conectar a la base de datos
-    db = pymysql.connect(**config)
-    cursor = db.cursor()
-    
+async def predict(id_candidatura: int, datos=Depends(get_datos)):
     try:
         # Obtener las notas de competencias de la candidatura
-        cursor.execute("""
-            SELECT nombre_competencia, nota
-            FROM competencias
-            WHERE id_candidatura = %s
-        """, (id_candidatura,))
-        
-        competencias = cursor.fetchall()
-
-        if not competencias:
-            raise HTTPException(status_code=404, detail="No se encontraron competencias para la candidatura proporcionada.")
-
-        # Crear un diccionario para las competencias
-        competencias_dict = {comp['nombre_competencia']: comp['nota'] for comp in competencias}
-
-        # Verificar que todas las competencias necesarias están presentes
-        required_competencies = ['Profesionalidad', 'Dominio', 'Resiliencia', 'HabilidadesSociales', 'Liderazgo', 'Colaboracion', 'Compromiso', 'Iniciativa']
-        for comp in required_competencies:
-            if comp not in competencias_dict:
-                competencias_dict[comp] = 0  # Asignar 0 si la competencia no está presente
-
-        # Crear un DataFrame con las competencias en el orden correcto
-        input_data = pd.DataFrame([[
-            competencias_dict['Profesionalidad'],
-            competencias_dict['Dominio'],
-            competencias_dict['Resiliencia'],
-            competencias_dict['HabilidadesSociales'],
-            competencias_dict['Liderazgo'],
-            competencias_dict['Colaboracion'],
-            competencias_dict['Compromiso'],
-            competencias_dict['Iniciativa']
-        ]], columns=[
-            'Profesionalidad', 'Dominio', 'Resiliencia', 'HabilidadesSociales', 'Liderazgo', 'Colaboracion', 'Compromiso', 'Iniciativa'
-        ])
-
-        # Realizar la predicción
-        prediction = model.predict(input_data)
+        input_data = await vector_candidatura(datos, id_candidatura)
+
+        # Realizar la predicción (o reutilizarla si ya se hizo para el mismo vector y modelo)
+        modelo = modelo_local()
+        prediction = cache_predicciones.prediccion(('local', modelo.version), input_data, predecir_medido(modelo.predictor, 'local'))
         result = 'Admitido' if prediction == 1 else 'Rechazado'
 
         return {"prediction": result}
 
-    finally:
-        cursor.close()
-        db.close()
+    except pymysql.MySQLError as e:
+        raise HTTPException(status_code=500, detail=f"Error de base de datos: {e}")
 
 
-@app.post("/retrain")
-def retrain():
+@app.post("/predict/batch")
+async def predict_batch(request: Request, datos=Depends(get_datos)):
     try:
-        # Conectar a la base de datos
-        db = pymysql.connect(**config)
-        cursor = db.cursor()
-
-        # Obtener todas las competencias y candidaturas
-        cursor.execute("SELECT * FROM competencias")
-        competencias = cursor.fetchall()
-
-        cursor.execute("""
-            SELECT * FROM candidaturas
-            WHERE status IN ('Entrevista2', 'Ofertado', 'Entrevista1', 'CentroEvaluación', 'Descartado')
-        """)
-        candidaturas = cursor.fetchall()
-
-        if not competencias or not candidaturas:
-            raise HTTPException(status_code=404, detail="No se encontraron suficientes datos para reentrenar el modelo.")
-
-        # Crear un diccionario para las competencias por candidatura
-        competencias_dict = {}
-        for comp in competencias:
-            if comp['id_candidatura'] not in competencias_dict:
-                competencias_dict[comp['id_candidatura']] = {}
-            competencias_dict[comp['id_candidatura']][comp['nombre_competencia']] = comp['nota']
-
-        # Crear listas para los datos de entrada (X) y las etiquetas (y)
-        X = []
-        y = []
-
-        required_competencies = ['Profesionalidad', 'Dominio', 'Resiliencia', 'HabilidadesSociales', 'Liderazgo', 'Colaboracion', 'Compromiso', 'Iniciativa']
-        for cand in candidaturas:
-            if cand['id_candidatura'] in competencias_dict:
-                comp_dict = competencias_dict[cand['id_candidatura']]
-                # Verificar que todas las competencias necesarias están presentes
-                if all(comp in comp_dict for comp in required_competencies):
-                    X.append([comp_dict[comp] for comp in required_competencies])
-                    y.append(1 if cand['status'] in ["Entrevista2", "Ofertado", "Entrevista1", "CentroEvaluación"] else 0)
-
-        if not X or not y:
-            raise HTTPException(status_code=400, detail="No se encontraron suficientes datos válidos para reentrenar el modelo.")
-
-        # Convertir a DataFrame
-        X = pd.DataFrame(X, columns=required_competencies)
-        y = pd.Series(y)
-
-        # Entrenar el modelo
-        new_model = RandomForestClassifier()
-        new_model.fit(X, y)
-
-        # Guardar el nuevo modelo localmente
-        local_model_path = 'models/model_web.pkl'
-        joblib.dump(new_model, local_model_path)
-
-        # Subir el modelo al bucket S3
-        try:
-            s3_client.upload_file(local_model_path, s3_bucket_name, s3_model_key)
-            return {
-                "detail": "Modelo reentrenado y actualizado con los datos actuales.",
-            }
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error al subir el modelo a S3: {e}")
+        body = await request.json()
+        ids = body.get("ids")
+        status = body.get("status")
+        id_empleado = body.get("id_empleado")
+
+        if ids is None and status is None and id_empleado is None:
+            raise HTTPException(status_code=400, detail="Se requiere 'ids' o algún filtro ('status', 'id_empleado').")
+
+        # Si no se pasan ids, se seleccionan las candidaturas que cumplen los filtros
+        if ids is None:
+            query = "SELECT id_candidatura FROM candidaturas WHERE TRUE"
+            parameters = []
+            if status is not None:
+                query += " AND status = %s"
+                parameters.append(status)
+            if id_empleado is not None:
+                query += " AND id_empleado = %s"
+                parameters.append(id_empleado)
+            ids = [row['id_candidatura'] for row in await datos.fetchall(query, parameters)]
+
+        if not isinstance(ids, list) or not all(es_id(i) for i in ids):
+            raise HTTPException(status_code=400, detail="El campo 'ids' debe ser una lista de enteros.")
+
+        # Quitar duplicados conservando el orden
+        ids = list(dict.fromkeys(ids))
+        if len(ids) > MAX_LOTE_PREDICCION:
+            raise HTTPException(status_code=400, detail=f"Como máximo se pueden puntuar {MAX_LOTE_PREDICCION} candidaturas por llamada.")
+        if not ids:
+            return {"resultados": []}
+
+        # Una sola consulta para todas las competencias del lote
+        marcadores = ', '.join(['%s'] * len(ids))
+        competencias = await datos.fetchall(f"""
+            SELECT id_candidatura, nombre_competencia, nota
+            FROM competencias
+            WHERE id_candidatura IN ({marcadores})
+        """, ids)
+
+        matriz, encontrados = matriz_competencias(competencias, ids)
+
+        # Una única predicción vectorizada para todas las candidaturas con datos
+        predictor = modelo_local().predictor
+
+        def puntuar():
+            with metricas.medir('modelo_prediccion_segundos', modelo='local', tipo='lote'):
+                probabilidades = predictor.predecir_proba(matriz[encontrados])
+            # Un modelo entrenado sin ningún admitido no tiene la clase 1: nunca admite
+            clases = list(predictor.classes_)
+            if 1 not in clases:
+                return [0.0] * len(probabilidades)
+            return probabilidades[:, clases.index(1)]
+
+        probabilidad_admitido = iter(await run_in_threadpool(puntuar) if encontrados.any() else [])
+
+        resultados = []
+        for id_candidatura, encontrado in zip(ids, encontrados):
+            if not encontrado:
+                resultados.append({
+                    "id_candidatura": id_candidatura,
+                    "status_code": 404,
+                    "detail": "No se encontraron competencias para la candidatura proporcionada."
+                })
+                continue
+            probabilidad = float(next(probabilidad_admitido))
+            resultados.append({
+                "id_candidatura": id_candidatura,
+                "prediction": 'Admitido' if probabilidad > 0.5 else 'Rechazado',
+                "probabilidad": round(probabilidad, 4)
+            })
+
+        return {"resultados": resultados}
+
+    except pymysql.MySQLError as e:
+        raise HTTPException(status_code=500, detail=f"Error de base de datos: {e}")
+
+
+@app.get("/predict/cache")
+async def get_predict_cache():
+    return cache_predicciones.estadisticas()
+
+
+# Descarta el vector guardado de una candidatura tras cambiar sus competencias
+# (o toda la caché si no se indica id_candidatura)
+@app.post("/predict/cache/invalidar")
+async def invalidar_predict_cache(id_candidatura: Optional[int] = None):
+    cache_predicciones.invalidar(id_candidatura)
+    return {"detail": "Caché de predicciones invalidada"}
+
 
-    finally:
-        # Asegurarse de cerrar el cursor y la conexión a la base de datos
-        if 'cursor' in locals() and cursor:
-            cursor.close()
-        if 'db' in locals() and db:
-            db.close()
+# Lanza un reentrenamiento en segundo plano y devuelve el trabajo al momento.
+# Si ya hay uno esperando turno, se devuelve ese mismo.
+@app.post("/retrain", status_code=202)
+async def retrain(datos=Depends(get_datos)):
+    trabajo = cola_reentrenamiento.solicitar(datos)
+    return {"detail": "Reentrenamiento en cola.", **trabajo}
+
+
+# Estado de un reentrenamiento: fase actual, métricas al terminar o el error
+@app.get("/retrain/{job_id}")
+async def retrain_estado(job_id: str):
+    trabajo = cola_reentrenamiento.obtener(job_id)
+    if trabajo is None:
+        raise HTTPException(status_code=404, detail="Trabajo de reentrenamiento no encontrado")
+    return trabajo
 
 @app.get("/predict_bucket")
-async def predict_bucket(id_candidatura: int):
-    # Conectar a la base de datos
-    db = pymysql.connect(**config)
-    cursor = db.cursor()
-    
+async def predict_bucket(id_candidatura: int, datos=Depends(get_datos)):
     try:
         # Obtener las notas de competencias de la candidatura
-        cursor.execute("""
-            SELECT nombre_competencia, nota
-            FROM competencias
-            WHERE id_candidatura = %s
-        """, (id_candidatura,))
-        
-        competencias = cursor.fetchall()
-
-        if not competencias:
-            raise HTTPException(status_code=404, detail="No se encontraron competencias para la candidatura proporcionada.")
-
-        # Crear un diccionario para las competencias
-        competencias_dict = {comp['nombre_competencia']: comp['nota'] for comp in competencias}
-
-        # Verificar que todas las competencias necesarias están presentes
-        required_competencies = ['Profesionalidad', 'Dominio', 'Resiliencia', 'HabilidadesSociales', 'Liderazgo', 'Colaboracion', 'Compromiso', 'Iniciativa']
-        for comp in required_competencies:
-            if comp not in competencias_dict:
-                competencias_dict[comp] = 0  # Asignar 0 si la competencia no está presente
-
-        # Crear un DataFrame con las competencias en el orden correcto
-        input_data = pd.DataFrame([[
-            competencias_dict['Profesionalidad'],
-            competencias_dict['Dominio'],
-            competencias_dict['Resiliencia'],
-            competencias_dict['HabilidadesSociales'],
-            competencias_dict['Liderazgo'],
-            competencias_dict['Colaboracion'],
-            competencias_dict['Compromiso'],
-            competencias_dict['Iniciativa']
-        ]], columns=[
-            'Profesionalidad', 'Dominio', 'Resiliencia', 'HabilidadesSociales', 'Liderazgo', 'Colaboracion', 'Compromiso', 'Iniciativa'
-        ])
-
-        # Descargar y cargar el modelo desde S3
-        model_path = 'models/model_web1.pkl'  # Ruta temporal en el sistema de archivos local
-        s3_client.download_file(s3_bucket_name, 'model_web1.pkl', model_path)
-
-        with open(model_path, 'rb') as f:
-            model = joblib.load(f)
-
-        # Realizar la predicción
-        prediction = model.predict(input_data)
+        input_data = await vector_candidatura(datos, id_candidatura)
+
+        # Obtener el modelo del bucket (sólo se descarga si hay una versión nueva)
+        modelo_bucket = await run_in_threadpool(registro_bucket.obtener)
+
+        # Realizar la predicción (o reutilizarla si ya se hizo para el mismo vector y modelo)
+        prediction = cache_predicciones.prediccion(('bucket', modelo_bucket.version), input_data, predecir_medido(modelo_bucket.predictor, 'bucket'))
         result = 'Admitido' if prediction == 1 else 'Rechazado'
 
         return {"prediction": result}
 
+    except HTTPException:
+        raise
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {e}")
 
-    finally:
-        cursor.close()
-        db.close()
 
 
 
+@app.post("/predict_bucket/reload")
+async def reload_predict_bucket():
+    try:
+        actualizado = await run_in_threadpool(registro_bucket.recargar)
+        # recargar() deja el modelo comprobado en memoria: no hace falta volver a S3
+        modelo_bucket = registro_bucket.actual
+        return {"version": modelo_bucket.version, "actualizado": actualizado}
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al recargar el modelo desde S3: {e}")
+
 
 # Código para ejecutar el servidor Uvicorn si el script se ejecuta directamente
 if __name__ == "__main__":
@@ -0,0 +1,117 @@
+# Benchmark de la instantánea de candidatos (analitica.py) que usan /estadisticas/*:
+# construcción completa, refresco incremental con un 1% de candidatos cambiados,
+# memoria de las columnas y microsegundos por consulta (el resumen de las cuatro
+# rutas y varios cruces con filtros).
+#
+# Por defecto genera candidatos sintéticos con las distribuciones de sembrar_bd.py.
+# Con --mysql lee la tabla de la base de datos local y compara además con
+# estadisticas.QUERY_RESUMEN: tiempo de la consulta SQL y que las respuestas
+# coincidan.
+#
+#   python benchmarks/bench_analitica.py --filas 10000,100000,1000000
+#   python benchmarks/bench_analitica.py --mysql
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+from analitica import TablaCandidatos, leer_candidatos
+from estadisticas import QUERY_RESUMEN, resumen_desde_filas
+from respuestas import serializar
+from sembrar_bd import CARRERAS, NIVELES_INGLES, PESOS_INGLES, argumentos, conectar
+
+CONSULTAS = {
+    'resumen (4 rutas)': lambda tabla: resumen_desde_filas(tabla.filas_resumen()),
+    'inglés por carrera': lambda tabla: tabla.consultar(['carrera', 'nivel_ingles'], porcentaje_de='carrera'),
+    'nota por rango de edad': lambda tabla: tabla.consultar(['rango_edad']),
+    'B2+ de 25 a 34 por carrera': lambda tabla: tabla.consultar(
+        ['carrera'], {'nivel_ingles': ['B2', 'C1', 'C2']}, edad_min=25, edad_max=34),
+    'total con nota >= 8': lambda tabla: tabla.consultar(nota_min=8),
+}
+
+
+def columnas_sinteticas(n, rng, primero=1):
+    carreras = rng.integers(len(CARRERAS), size=n)
+    ingles = rng.choice(len(NIVELES_INGLES), size=n, p=PESOS_INGLES)
+    return {
+        'id_candidato': list(range(primero, primero + n)),
+        'carrera': [CARRERAS[i] for i in carreras],
+        'nivel_ingles': [NIVELES_INGLES[i] for i in ingles],
+        'nota_media': np.clip(rng.normal(7.0, 1.1, size=n), 5.0, 10.0).round(2).tolist(),
+        'edad': np.clip(rng.gamma(4.0, 2.5, size=n) + 19, 19, 70).astype(int).tolist(),
+    }
+
+
+def segundos(funcion):
+    inicio = time.perf_counter()
+    resultado = funcion()
+    return time.perf_counter() - inicio, resultado
+
+
+def microsegundos(funcion, tabla, veces):
+    inicio = time.perf_counter()
+    for _ in range(veces):
+        funcion(tabla)
+    return (time.perf_counter() - inicio) / veces * 1e6
+
+
+def informe_consultas(tabla, veces):
+    for nombre, consulta in CONSULTAS.items():
+        print(f"  {nombre:<28} {microsegundos(consulta, tabla, veces):10.1f} µs", flush=True)
+
+
+def sinteticos(args):
+    rng = np.random.default_rng(args.semilla)
+    for n in [int(x) for x in args.filas.split(',')]:
+        columnas = columnas_sinteticas(n, rng)
+        construccion, tabla = segundos(lambda: TablaCandidatos.desde_columnas(columnas, completa_en=time.time()))
+        cambios = columnas_sinteticas(max(1, n // 100), rng, primero=int(rng.integers(1, n)))
+        fusion, _ = segundos(lambda: tabla.fusionar(cambios, None))
+        print(f"{n} candidatos: construcción {construccion * 1000:.1f} ms, "
+              f"refresco con {len(cambios['id_candidato'])} cambios {fusion * 1000:.1f} ms, "
+              f"{tabla.memoria() / 1e6:.2f} MB")
+        informe_consultas(tabla, args.veces)
+
+
+def mysql(args):
+    db = conectar(args, args.database)
+    try:
+        sql, filas = segundos(lambda: _fetchall(db, QUERY_RESUMEN))
+        completa, (tabla, _) = segundos(lambda: leer_candidatos(db))
+        incremental, (tabla, estadisticas) = segundos(lambda: leer_candidatos(db, tabla))
+    finally:
+        db.close()
+
+    print(f"{len(tabla)} candidatos: QUERY_RESUMEN {sql * 1000:.1f} ms, lectura completa {completa * 1000:.1f} ms, "
+          f"refresco {estadisticas['tipo']} {incremental * 1000:.1f} ms, {tabla.memoria() / 1e6:.2f} MB")
+    # Se comparan los JSON que recibe el cliente (MySQL devuelve las medias como Decimal)
+    iguales = serializar(resumen_desde_filas(filas)) == serializar(resumen_desde_filas(tabla.filas_resumen()))
+    print(f"  respuestas iguales a las de QUERY_RESUMEN: {'sí' if iguales else 'NO'}")
+    informe_consultas(tabla, args.veces)
+
+
+def _fetchall(db, query):
+    with db.cursor() as cursor:
+        cursor.execute(query)
+        return cursor.fetchall()
+
+
+def main(args):
+    if args.mysql:
+        mysql(args)
+    else:
+        sinteticos(args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    argumentos(parser)
+    parser.add_argument('--filas', default='10000,100000,1000000', help="tamaños sintéticos, separados por comas")
+    parser.add_argument('--mysql', action='store_true', help="leer los candidatos de la base de datos local")
+    parser.add_argument('--veces', type=int, default=200, help="repeticiones de cada consulta")
+    parser.add_argument('--semilla', type=int, default=42)
+    main(parser.parse_args())
@@ -0,0 +1,99 @@
+# Benchmark del arranque de api_empleados:
+#   - import: `python -X importtime -c "import api_empleados"` en un proceso nuevo;
+#     tiempo total, los módulos que más tardan y qué dependencias pesadas se cargaron
+#   - listo: desde el inicio del proceso hasta que /ready responde 200 (import,
+#     lifespan y carga del modelo en segundo plano)
+# Cada medida se repite en procesos nuevos y se muestra la mediana.
+#
+#   python benchmarks/bench_arranque.py --repeticiones 5
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+RAIZ = os.path.join(os.path.dirname(__file__), '..')
+
+# Dependencias que la API no debería importar al arrancar
+PESADAS = ['sklearn', 'pandas', 'scipy', 'joblib', 'boto3', 'botocore']
+
+CODIGO_LISTO = """
+import time
+inicio = time.perf_counter()
+from fastapi.testclient import TestClient
+import api_empleados
+importado = time.perf_counter()
+with TestClient(api_empleados.app) as cliente:
+    while cliente.get('/ready').status_code != 200:
+        time.sleep(0.005)
+    print(importado - inicio, time.perf_counter() - inicio)
+"""
+
+
+# Devuelve {módulo: (propio, acumulado)} en segundos para los imports directos de
+# api_empleados, el tiempo total y las dependencias pesadas que quedaron cargadas
+def medir_import():
+    codigo = f"import sys, api_empleados; print(','.join(m for m in {PESADAS!r} if m in sys.modules))"
+    proceso = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', codigo],
+        cwd=RAIZ, capture_output=True, text=True, check=True
+    )
+    # importtime escribe cada módulo al terminar de importarlo, después de sus
+    # dependencias; los imports directos de api_empleados son las líneas con un
+    # nivel de sangría que preceden a la suya
+    modulos = {}
+    total = None
+    for linea in proceso.stderr.splitlines():
+        if not linea.startswith('import time:') or 'self [us]' in linea:
+            continue
+        propio, acumulado, nombre = linea[len('import time:'):].split('|')
+        if not nombre.startswith('  '):
+            if nombre.strip() == 'api_empleados':
+                total = int(acumulado) / 1e6
+                break
+            modulos = {}
+        elif not nombre.startswith('    '):
+            modulos[nombre.strip()] = (int(propio) / 1e6, int(acumulado) / 1e6)
+    pesadas = proceso.stdout.strip()
+    return total, modulos, pesadas.split(',') if pesadas else []
+
+
+def medir_listo():
+    proceso = subprocess.run(
+        [sys.executable, '-c', CODIGO_LISTO],
+        cwd=RAIZ, capture_output=True, text=True, check=True
+    )
+    importado, listo = proceso.stdout.split()
+    return float(importado), float(listo)
+
+
+def main(args):
+    totales, modulos, pesadas = [], {}, []
+    for _ in range(args.repeticiones):
+        total, por_modulo, pesadas = medir_import()
+        totales.append(total)
+        for nombre, (_, acumulado) in por_modulo.items():
+            modulos.setdefault(nombre, []).append(acumulado)
+
+    print(f"import api_empleados (-X importtime, mediana de {args.repeticiones})")
+    print(f"  total: {statistics.median(totales) * 1e3:.0f} ms")
+    print(f"  dependencias pesadas cargadas: {', '.join(pesadas) or 'ninguna'}")
+    print(f"  imports directos más lentos:")
+    lentos = sorted(modulos.items(), key=lambda m: statistics.median(m[1]), reverse=True)
+    for nombre, tiempos in lentos[:args.top]:
+        print(f"    {nombre:<28}{statistics.median(tiempos) * 1e3:>8.1f} ms")
+
+    if args.sin_listo:
+        return
+    medidas = [medir_listo() for _ in range(args.repeticiones)]
+    print(f"Arranque hasta /ready (mediana de {args.repeticiones})")
+    print(f"  import (con fastapi.testclient): {statistics.median(m[0] for m in medidas) * 1e3:.0f} ms")
+    print(f"  /ready 200: {statistics.median(m[1] for m in medidas) * 1e3:.0f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help="módulos más lentos que se muestran")
+    parser.add_argument('--sin-listo', action='store_true', help="medir sólo el import")
+    main(parser.parse_args())
@@ -0,0 +1,122 @@
+# Benchmark del formato del modelo de /predict:
+#   - pkl: models/model_web.pkl con joblib.load + PredictorRapido con sklearn
+#   - pkl-aplanado: igual pero con el bosque aplanado (como sirve la API por defecto)
+#   - compacto: models/model_web.bosque con modelo_compacto.cargar (MODELO_COMPACTO=1)
+# Cada formato se carga en un proceso nuevo para medir el tiempo de carga desde
+# cero (imports incluidos) y la memoria del proceso. Antes de medir se comprueba
+# que todos dan las mismas probabilidades.
+#
+#   python benchmarks/bench_artefacto.py --repeticiones 2000
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+RAIZ = os.path.join(os.path.dirname(__file__), '..')
+RUTA_MODELO = os.path.join(RAIZ, 'models', 'model_web.pkl')
+
+
+# RSS actual en MB (Linux); None si no se puede leer
+def rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError):
+        return None
+
+
+# Pico de RSS en MB; sin importar reentrenamiento.pico_rss_mb, que trae sklearn
+def pico_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def cargar_pkl(ruta, aplanar=False):
+    import joblib
+    from inferencia import PredictorRapido
+    return PredictorRapido(joblib.load(ruta), aplanar=aplanar)
+
+
+def cargar_compacto(ruta):
+    import modelo_compacto
+    return modelo_compacto.cargar(modelo_compacto.ruta_compacta(ruta))
+
+
+FORMATOS = {
+    'pkl': cargar_pkl,
+    'pkl-aplanado': lambda ruta: cargar_pkl(ruta, aplanar=True),
+    'compacto': cargar_compacto,
+}
+
+
+# Se ejecuta en un proceso aparte
+def medir(formato, args):
+    import numpy as np
+    rss_inicial = rss_mb()
+    inicio = time.perf_counter()
+    modelo = FORMATOS[formato](RUTA_MODELO)
+    carga = time.perf_counter() - inicio
+    rss_cargado = rss_mb()
+
+    rng = np.random.default_rng(0)
+    lote = rng.integers(0, 11, size=(args.lote, 8)).astype(float)
+    individual = []
+    for i in range(args.repeticiones):
+        fila = lote[i % len(lote)]
+        inicio = time.perf_counter()
+        modelo.predecir(fila)
+        individual.append(time.perf_counter() - inicio)
+    inicio = time.perf_counter()
+    probabilidades = modelo.predecir_proba(lote)
+    por_lote = time.perf_counter() - inicio
+
+    return {
+        'carga': carga,
+        'rss': (rss_cargado - rss_inicial) if rss_inicial is not None else None,
+        'pico_rss': pico_rss_mb(),
+        'individual': float(np.median(individual)),
+        'lote': por_lote,
+        'sklearn': 'sklearn' in sys.modules,
+        'probabilidades': probabilidades,
+    }
+
+
+def main(args):
+    import modelo_compacto
+    modelo_compacto.asegurar(RUTA_MODELO)
+
+    contexto = multiprocessing.get_context('spawn')
+    resultados = {}
+    for formato in FORMATOS:
+        with contexto.Pool(1) as proceso:
+            resultados[formato] = proceso.apply(medir, (formato, args))
+
+    for formato, r in resultados.items():
+        diferencia = abs(r['probabilidades'] - resultados['pkl']['probabilidades']).max()
+        if diferencia > 1e-12:
+            raise SystemExit(f"{formato} no coincide con pkl: diferencia máxima {diferencia}")
+
+    tamano_pkl = os.path.getsize(RUTA_MODELO)
+    tamanos = {'pkl': tamano_pkl, 'pkl-aplanado': tamano_pkl,
+               'compacto': os.path.getsize(modelo_compacto.ruta_compacta(RUTA_MODELO))}
+    print(f"Formato del modelo ({args.repeticiones} predicciones individuales, lote de {args.lote} filas)")
+    print(f"{'formato':<14}{'KB':>8}{'carga ms':>10}{'+RSS MB':>9}{'pico RSS MB':>13}"
+          f"{'1 fila µs':>11}{'lote ms':>9}  sklearn")
+    for formato, r in resultados.items():
+        print(f"{formato:<14}{tamanos[formato] / 1024:>8.0f}{r['carga'] * 1e3:>10.1f}"
+              f"{r['rss'] if r['rss'] is not None else float('nan'):>9.1f}"
+              f"{r['pico_rss'] or float('nan'):>13.1f}{r['individual'] * 1e6:>11.1f}"
+              f"{r['lote'] * 1e3:>9.1f}  {'sí' if r['sklearn'] else 'no'}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeticiones', type=int, default=2000)
+    parser.add_argument('--lote', type=int, default=1000, help="filas de la predicción por lotes")
+    main(parser.parse_args())
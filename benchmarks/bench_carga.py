@@ -0,0 +1,380 @@
+# Prueba de carga de todas las rutas de api_empleados contra una base de datos
+# local (sembrada con sembrar_bd.py) y S3 servido por s3_local.S3Local.
+#
+#   python benchmarks/sembrar_bd.py --candidaturas 100000 --reiniciar
+#   python benchmarks/bench_carga.py --concurrencia 32 --duracion 10 --json antes.json
+#   ... cambios ...
+#   python benchmarks/bench_carga.py --concurrencia 32 --duracion 10 --comparar antes.json
+#
+# Sin --url arranca la API en un directorio temporal (copia de models/ y un
+# bucket local modelosexe con model_web.pkl y model_web1.pkl), así un
+# reentrenamiento no toca el modelo del repositorio; con --workers N usa
+# servidor.py. Con --url mide una API ya arrancada (la BD sigue haciendo falta
+# para conocer los ids que existen).
+#
+# Cada ruta se mide por separado en bucle cerrado: --concurrencia clientes que
+# lanzan la siguiente petición en cuanto reciben la respuesta, --calentamiento
+# segundos sin medir y --duracion segundos medidos. --mezcla añade una pasada con
+# todas las rutas a la vez. /retrain sólo se mide con --reentrenar (entrena un
+# modelo en segundo plano y falsea las rutas que se midan después).
+# El cliente es un único proceso con httpx: por encima de unos pocos miles de
+# peticiones por segundo el límite puede ser el cliente y no la API.
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, namedtuple
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import httpx
+import numpy as np
+
+from sembrar_bd import ROL_DESECHABLE, argumentos, conectar
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# peticion(ctx, rng) devuelve los argumentos de httpx (params, json); la ruta
+# puede llevar campos de ctx, p. ej. /retrain/{job_id}
+Escenario = namedtuple('Escenario', ['nombre', 'metodo', 'ruta', 'peticion', 'al_responder'], defaults=[None])
+
+
+# Datos de la BD y de la propia API con los que se construyen las peticiones
+class Contexto:
+    def __init__(self, min_candidatura, max_candidatura, empleados, desechables, terminos):
+        self.min_candidatura = min_candidatura
+        self.max_candidatura = max_candidatura
+        self.empleados = empleados
+        self.desechables = desechables
+        self.terminos = terminos
+        self.cursores = []
+        self.job_id = None
+
+    def candidatura(self, rng):
+        return int(rng.integers(self.min_candidatura, self.max_candidatura + 1))
+
+    def empleado(self, rng):
+        return int(self.empleados[rng.integers(len(self.empleados))])
+
+
+def descubrir(args):
+    db = conectar(args, args.database)
+    try:
+        with db.cursor() as cursor:
+            cursor.execute("SELECT MIN(id_candidatura) AS minimo, MAX(id_candidatura) AS maximo FROM candidaturas")
+            rango = cursor.fetchone()
+            cursor.execute("SELECT id_empleado FROM empleados WHERE rol <> %s LIMIT 10000", (ROL_DESECHABLE,))
+            empleados = [fila['id_empleado'] for fila in cursor.fetchall()]
+            cursor.execute("SELECT id_empleado FROM empleados WHERE rol = %s ORDER BY id_empleado", (ROL_DESECHABLE,))
+            desechables = [fila['id_empleado'] for fila in cursor.fetchall()]
+            cursor.execute("SELECT DISTINCT nombre_empleado FROM empleados LIMIT 50")
+            terminos = [fila['nombre_empleado'] for fila in cursor.fetchall()]
+            cursor.execute("SELECT DISTINCT apellidos_empleado FROM empleados LIMIT 50")
+            terminos += [fila['apellidos_empleado'].split()[0] for fila in cursor.fetchall()]
+    finally:
+        db.close()
+    if rango['maximo'] is None or not empleados:
+        raise SystemExit(f"La base de datos {args.database} está vacía; ejecuta antes sembrar_bd.py")
+    return Contexto(rango['minimo'], rango['maximo'], empleados, desechables, terminos)
+
+
+# Cursores de /all_empleados para pedir páginas intermedias por keyset
+async def recoger_cursores(cliente, ctx, paginas=20):
+    params = {'limit': 20}
+    for _ in range(paginas):
+        respuesta = await cliente.get('/all_empleados', params=params)
+        cursor = respuesta.json().get('next_cursor') if respuesta.status_code == 200 else None
+        if cursor is None:
+            break
+        ctx.cursores.append(cursor)
+        params = {'limit': 20, 'cursor': cursor}
+
+
+def fechas(rng):
+    anio = int(rng.integers(2023, 2026))
+    return {'desde': f"{anio}-01-01", 'hasta': f"{anio}-06-30"}
+
+
+def siguiente_desechable(ctx, rng):
+    # Agotados los desechables se borra un id que no existe (404)
+    return {'params': {'id_empleado': ctx.desechables.pop() if ctx.desechables else 2 ** 31 - 1}}
+
+
+def lote_desechables(ctx, rng, tamano=20):
+    ids = [ctx.desechables.pop() for _ in range(min(tamano, len(ctx.desechables)))]
+    return {'json': {'ids': ids or [2 ** 31 - 1]}}
+
+
+def guardar_trabajo(ctx, respuesta):
+    if respuesta.status_code == 202:
+        ctx.job_id = respuesta.json()['job_id']
+
+
+ESCENARIOS = [
+    Escenario('ready', 'GET', '/ready', lambda ctx, rng: {}),
+    Escenario('pool_status', 'GET', '/pool_status', lambda ctx, rng: {}),
+    Escenario('all_empleados_offset', 'GET', '/all_empleados',
+              lambda ctx, rng: {'params': {'limit': 20, 'offset': int(rng.integers(0, 1000))}}),
+    Escenario('all_empleados_cursor', 'GET', '/all_empleados',
+              lambda ctx, rng: {'params': {'limit': 20, **({'cursor': ctx.cursores[rng.integers(len(ctx.cursores))]} if ctx.cursores else {})}}),
+    Escenario('all_empleados_search', 'GET', '/all_empleados',
+              lambda ctx, rng: {'params': {'limit': 20, 'search': ctx.terminos[rng.integers(len(ctx.terminos))]}}),
+    Escenario('empleados_buscar', 'GET', '/empleados/buscar',
+              lambda ctx, rng: {'params': {'q': ctx.terminos[rng.integers(len(ctx.terminos))]}}),
+    Escenario('candidaturas_por_empleado', 'GET', '/candidaturas_por_empleado',
+              lambda ctx, rng: {'params': {'id_empleado': ctx.empleado(rng)}}),
+    Escenario('candidaturas_por_empleado_fechas', 'GET', '/candidaturas_por_empleado',
+              lambda ctx, rng: {'params': {'id_empleado': ctx.empleado(rng), **fechas(rng)}}),
+    Escenario('candidaturas_matriz', 'GET', '/candidaturas_por_empleado/matrix', lambda ctx, rng: {'params': fechas(rng)}),
+    Escenario('candidaturas_matriz_pagina', 'GET', '/candidaturas_por_empleado/matrix',
+              lambda ctx, rng: {'params': {'id_empleado': [ctx.empleado(rng) for _ in range(20)]}}),
+    Escenario('candidaturas_status', 'GET', '/candidaturas_status', lambda ctx, rng: {}),
+    Escenario('candidaturas_status_fechas', 'GET', '/candidaturas_status', lambda ctx, rng: {'params': fechas(rng)}),
+    Escenario('estadisticas_resumen', 'GET', '/estadisticas/resumen', lambda ctx, rng: {}),
+    Escenario('estadisticas_carrera', 'GET', '/estadisticas/carrera', lambda ctx, rng: {}),
+    Escenario('estadisticas_notas', 'GET', '/estadisticas/notas', lambda ctx, rng: {}),
+    Escenario('estadisticas_ingles', 'GET', '/estadisticas/ingles', lambda ctx, rng: {}),
+    Escenario('estadisticas_edad', 'GET', '/estadisticas/edad', lambda ctx, rng: {}),
+    Escenario('estadisticas_consulta', 'GET', '/estadisticas/consulta',
+              lambda ctx, rng: {'params': {'agrupar': 'carrera,nivel_ingles', 'porcentaje_de': 'carrera'}}),
+    Escenario('estadisticas_consulta_nota', 'GET', '/estadisticas/consulta',
+              lambda ctx, rng: {'params': {'agrupar': 'rango_edad', 'nota_min': round(float(rng.uniform(5, 9)), 1)}}),
+    Escenario('estadisticas_cache', 'GET', '/estadisticas/cache', lambda ctx, rng: {}),
+    Escenario('predict', 'GET', '/predict', lambda ctx, rng: {'params': {'id_candidatura': ctx.candidatura(rng)}}),
+    Escenario('predict_batch', 'POST', '/predict/batch',
+              lambda ctx, rng: {'json': {'ids': [ctx.candidatura(rng) for _ in range(100)]}}),
+    Escenario('predict_bucket', 'GET', '/predict_bucket', lambda ctx, rng: {'params': {'id_candidatura': ctx.candidatura(rng)}}),
+    Escenario('predict_cache', 'GET', '/predict/cache', lambda ctx, rng: {}),
+    Escenario('metrics', 'GET', '/metrics', lambda ctx, rng: {}),
+    Escenario('metrics_perfiles', 'GET', '/metrics/perfiles', lambda ctx, rng: {}),
+    # Escrituras e invalidaciones: se miden después de las lecturas
+    Escenario('update_empleado', 'PUT', '/update_empleado',
+              lambda ctx, rng: {'json': {'id_empleado': ctx.empleado(rng), 'is_logged': int(rng.integers(2))}}),
+    Escenario('delete_empleado', 'DELETE', '/delete_empleado', siguiente_desechable),
+    Escenario('update_empleados', 'PUT', '/update_empleados',
+              lambda ctx, rng: {'json': {'empleados': [{'id_empleado': ctx.empleado(rng), 'is_logged': int(rng.integers(2))}
+                                                       for _ in range(50)]}}),
+    Escenario('delete_empleados', 'DELETE', '/delete_empleados', lote_desechables),
+    Escenario('predict_cache_invalidar', 'POST', '/predict/cache/invalidar',
+              lambda ctx, rng: {'params': {'id_candidatura': ctx.candidatura(rng)}}),
+    Escenario('estadisticas_cache_invalidar', 'POST', '/estadisticas/cache/invalidar', lambda ctx, rng: {}),
+    Escenario('predict_bucket_reload', 'POST', '/predict_bucket/reload', lambda ctx, rng: {}),
+    Escenario('metrics_perfilado', 'POST', '/metrics/perfilado', lambda ctx, rng: {'params': {'cada': 0}}),
+    Escenario('retrain', 'POST', '/retrain', lambda ctx, rng: {}, guardar_trabajo),
+    Escenario('retrain_estado', 'GET', '/retrain/{job_id}', lambda ctx, rng: {}),
+]
+
+REENTRENAMIENTO = {'retrain', 'retrain_estado'}
+
+
+def percentil(valores, p):
+    return float(np.percentile(valores, p)) * 1000 if valores else None
+
+
+# --concurrencia clientes en bucle cerrado eligiendo al azar entre `escenarios`.
+# Devuelve por escenario las latencias medidas y los códigos de respuesta.
+async def ejecutar(cliente, escenarios, ctx, args, semilla):
+    latencias = {e.nombre: [] for e in escenarios}
+    codigos = {e.nombre: Counter() for e in escenarios}
+    inicio_medida = time.perf_counter() + args.calentamiento
+    fin = inicio_medida + args.duracion
+
+    async def usuario(i):
+        rng = np.random.default_rng([semilla, i])
+        while time.perf_counter() < fin:
+            escenario = escenarios[rng.integers(len(escenarios))]
+            peticion = escenario.peticion(ctx, rng)
+            inicio = time.perf_counter()
+            try:
+                respuesta = await cliente.request(escenario.metodo, escenario.ruta.format(job_id=ctx.job_id), **peticion)
+                codigo = respuesta.status_code
+                if escenario.al_responder is not None:
+                    escenario.al_responder(ctx, respuesta)
+            except httpx.HTTPError as e:
+                codigo = type(e).__name__
+            if inicio >= inicio_medida:
+                latencias[escenario.nombre].append(time.perf_counter() - inicio)
+                codigos[escenario.nombre][codigo] += 1
+
+    await asyncio.gather(*(usuario(i) for i in range(args.concurrencia)))
+    return {
+        nombre: resultado(latencias[nombre], codigos[nombre], args.duracion)
+        for nombre in latencias
+    }
+
+
+def resultado(latencias, codigos, duracion):
+    errores = sum(n for codigo, n in codigos.items() if not isinstance(codigo, int) or codigo >= 500)
+    return {
+        'peticiones': len(latencias),
+        'rps': round(len(latencias) / duracion, 1),
+        'p50_ms': percentil(latencias, 50),
+        'p95_ms': percentil(latencias, 95),
+        'p99_ms': percentil(latencias, 99),
+        'max_ms': max(latencias) * 1000 if latencias else None,
+        'errores': errores,
+        'codigos': {str(codigo): n for codigo, n in sorted(codigos.items(), key=str)},
+    }
+
+
+def ms(valor):
+    return f"{valor:9.2f}" if valor is not None else f"{'-':>9}"
+
+
+def informe(nombre, r):
+    otros = {c: n for c, n in r['codigos'].items() if not c.startswith('2')}
+    print(f"{nombre:<34} {r['rps']:9.1f} {ms(r['p50_ms'])} {ms(r['p95_ms'])} {ms(r['p99_ms'])} "
+          f"{r['errores']:7d}  {otros or ''}", flush=True)
+
+
+def comparar(base, actual, umbral):
+    print(f"\nComparación con la ejecución anterior (umbral {umbral:.0%})")
+    print(f"{'ruta':<34} {'rps antes':>10} {'rps ahora':>10} {'p95 antes':>10} {'p95 ahora':>10}")
+    regresiones = 0
+    for nombre, r in actual.items():
+        b = base.get(nombre)
+        if b is None or not b['rps'] or r['p95_ms'] is None or b['p95_ms'] is None:
+            continue
+        peor = r['rps'] < b['rps'] * (1 - umbral) or r['p95_ms'] > b['p95_ms'] * (1 + umbral)
+        regresiones += peor
+        print(f"{nombre:<34} {b['rps']:10.1f} {r['rps']:10.1f} {b['p95_ms']:10.2f} {r['p95_ms']:10.2f}"
+              f"{'  REGRESIÓN' if peor else ''}")
+    return regresiones
+
+
+def esperar_api(url, proceso, espera):
+    limite = time.monotonic() + espera
+    while time.monotonic() < limite:
+        if proceso is not None and proceso.poll() is not None:
+            raise SystemExit(f"La API terminó al arrancar (código {proceso.returncode})")
+        try:
+            if httpx.get(f"{url}/ready", timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise SystemExit(f"La API no está lista tras {espera} s")
+
+
+# Arranca la API en un directorio temporal con la BD local y el S3 local
+@contextmanager
+def api_local(args):
+    directorio = tempfile.mkdtemp(prefix='bench_carga_')
+    shutil.copytree(os.path.join(RAIZ, 'models'), os.path.join(directorio, 'models'),
+                    ignore=shutil.ignore_patterns('trabajos', '*.lock'))
+    bucket = os.path.join(directorio, 's3', 'modelosexe')
+    os.makedirs(bucket)
+    for key in ('model_web.pkl', 'model_web1.pkl'):
+        shutil.copy(os.path.join(RAIZ, 'models', 'model_web.pkl'), os.path.join(bucket, key))
+
+    env = dict(
+        os.environ,
+        PYTHONPATH=RAIZ,
+        DB_HOST=args.host, DB_PORT=str(args.port), DB_USER=args.user,
+        DB_PASSWORD=args.password, DB_DATABASE=args.database,
+        S3_LOCAL_DIR=os.path.join(directorio, 's3'),
+    )
+    env.update(variable.split('=', 1) for variable in args.env)
+
+    url = f"http://127.0.0.1:{args.puerto_api}"
+    if args.workers > 1:
+        comando = [sys.executable, os.path.join(RAIZ, 'servidor.py'), '--host', '127.0.0.1',
+                   '--port', str(args.puerto_api), '--workers', str(args.workers), '--log-level', 'warning']
+    else:
+        comando = [sys.executable, '-m', 'uvicorn', 'api_empleados:app', '--host', '127.0.0.1',
+                   '--port', str(args.puerto_api), '--log-level', 'warning']
+    proceso = subprocess.Popen(comando, cwd=directorio, env=env)
+    try:
+        esperar_api(url, proceso, args.espera_arranque)
+        yield url
+    finally:
+        proceso.terminate()
+        try:
+            proceso.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proceso.kill()
+        shutil.rmtree(directorio, ignore_errors=True)
+
+
+def seleccionar(args):
+    escenarios = [e for e in ESCENARIOS if args.reentrenar or e.nombre not in REENTRENAMIENTO]
+    if args.rutas:
+        prefijos = args.rutas.split(',')
+        escenarios = [e for e in escenarios if any(e.nombre.startswith(p) for p in prefijos)]
+    if args.excluir:
+        prefijos = args.excluir.split(',')
+        escenarios = [e for e in escenarios if not any(e.nombre.startswith(p) for p in prefijos)]
+    return escenarios
+
+
+async def medir(url, args):
+    ctx = descubrir(args)
+    escenarios = seleccionar(args)
+    limites = httpx.Limits(max_connections=args.concurrencia, max_keepalive_connections=args.concurrencia)
+    resultados = {}
+    async with httpx.AsyncClient(base_url=url, limits=limites, timeout=args.timeout) as cliente:
+        await recoger_cursores(cliente, ctx)
+        print(f"{url}: {args.concurrencia} clientes, {args.duracion} s por ruta; candidaturas "
+              f"{ctx.min_candidatura}-{ctx.max_candidatura}, {len(ctx.empleados)} empleados")
+        print(f"{'ruta':<34} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errores':>7}  otros códigos")
+        for i, escenario in enumerate(escenarios):
+            r = (await ejecutar(cliente, [escenario], ctx, args, i))[escenario.nombre]
+            resultados[escenario.nombre] = r
+            informe(escenario.nombre, r)
+
+        if args.mezcla:
+            mezcla = [e for e in escenarios if e.nombre not in REENTRENAMIENTO]
+            por_ruta = await ejecutar(cliente, mezcla, ctx, args, len(escenarios))
+            print(f"\nMezcla de {len(mezcla)} rutas a la vez")
+            for nombre, r in por_ruta.items():
+                resultados[f"mezcla/{nombre}"] = r
+                informe(nombre, r)
+    return resultados
+
+
+def main(args):
+    if args.url:
+        esperar_api(args.url, None, args.espera_arranque)
+        resultados = asyncio.run(medir(args.url, args))
+    else:
+        with api_local(args) as url:
+            resultados = asyncio.run(medir(url, args))
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'argumentos': {k: v for k, v in vars(args).items() if k != 'password'},
+                       'resultados': resultados}, f, indent=2, ensure_ascii=False)
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            base = json.load(f)['resultados']
+        if comparar(base, resultados, args.umbral):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    argumentos(parser)
+    parser.add_argument('--url', default=None, help="API ya arrancada; si no, se arranca una local")
+    parser.add_argument('--workers', type=int, default=1, help="con más de 1 se arranca servidor.py")
+    parser.add_argument('--puerto-api', type=int, default=8765)
+    parser.add_argument('--env', action='append', default=[], help="CLAVE=VALOR extra para la API arrancada")
+    parser.add_argument('--espera-arranque', type=float, default=120)
+    parser.add_argument('--concurrencia', type=int, default=16)
+    parser.add_argument('--duracion', type=float, default=10, help="segundos medidos por ruta")
+    parser.add_argument('--calentamiento', type=float, default=2, help="segundos sin medir antes de cada ruta")
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--rutas', default=None, help="sólo estos escenarios (prefijos separados por comas)")
+    parser.add_argument('--excluir', default=None, help="escenarios a saltar (prefijos separados por comas)")
+    parser.add_argument('--mezcla', action='store_true', help="medir también todas las rutas a la vez")
+    parser.add_argument('--reentrenar', action='store_true', help="medir también /retrain y /retrain/{job_id}")
+    parser.add_argument('--json', default=None, help="guardar los resultados en este fichero")
+    parser.add_argument('--comparar', default=None, help="resultados anteriores (--json) con los que comparar")
+    parser.add_argument('--umbral', type=float, default=0.1, help="empeoramiento relativo que cuenta como regresión")
+    main(parser.parse_args())
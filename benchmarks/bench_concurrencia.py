@@ -0,0 +1,155 @@
+# Benchmark de latencia bajo carga concurrente: consultas bloqueantes dentro de
+# rutas async (antes) frente a la capa AccesoDatos con ejecutor acotado (después).
+#
+# Por defecto se simula MySQL con una conexión falsa que tarda --latencia segundos
+# por consulta, para poder ejecutarlo sin base de datos. Con --mysql se usa la
+# configuración real del .env.
+#
+#   python benchmarks/bench_concurrencia.py --rps 400 --peticiones 2000
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pymysql
+
+from pool_conexiones import PoolConexiones
+from acceso_datos import AccesoDatos
+
+QUERY = "SELECT status FROM candidaturas"
+
+
+class CursorSimulado:
+    def __init__(self, latencia):
+        self.latencia = latencia
+        self.rowcount = 0
+
+    def execute(self, query, params=None):
+        time.sleep(self.latencia)
+        self.rowcount = 1
+
+    def fetchall(self):
+        return [{'status': 'Ofertado'}]
+
+    def fetchone(self):
+        return {'status': 'Ofertado'}
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ConexionSimulada:
+    def __init__(self, latencia):
+        self.latencia = latencia
+        self.open = True
+        self.server_status = 0
+
+    def cursor(self, *args):
+        return CursorSimulado(self.latencia)
+
+    def ping(self, reconnect=False):
+        pass
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.open = False
+
+
+# Patrón anterior: la consulta bloquea el bucle de eventos mientras dura
+async def ruta_bloqueante(pool):
+    with pool.conexion() as db:
+        with db.cursor() as cursor:
+            cursor.execute(QUERY)
+            return cursor.fetchall()
+
+
+async def ruta_asincrona(datos):
+    return await datos.fetchall(QUERY)
+
+
+# Carga en bucle abierto: las peticiones llegan a ritmo fijo (--rps) y la latencia
+# se mide desde el instante previsto de llegada, así cuenta también el tiempo que
+# una petición pasa esperando a que el bucle de eventos quede libre.
+async def medir(ruta, rps, peticiones):
+    latencias = []
+    tareas = []
+    inicio = time.perf_counter()
+
+    async def peticion(llegada):
+        await ruta()
+        latencias.append(time.perf_counter() - llegada)
+
+    for i in range(peticiones):
+        llegada = inicio + i / rps
+        await asyncio.sleep(max(0, llegada - time.perf_counter()))
+        tareas.append(asyncio.create_task(peticion(llegada)))
+
+    await asyncio.gather(*tareas)
+    duracion = time.perf_counter() - inicio
+    return latencias, duracion
+
+
+def percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(round(p / 100 * (len(valores) - 1))))]
+
+
+def informe(nombre, latencias, duracion):
+    print(f"{nombre:<12} p50={percentil(latencias, 50) * 1000:8.2f} ms  "
+          f"p99={percentil(latencias, 99) * 1000:8.2f} ms  "
+          f"media={statistics.mean(latencias) * 1000:8.2f} ms  "
+          f"rps={len(latencias) / duracion:8.1f}")
+
+
+async def main(args):
+    if args.mysql:
+        from dotenv import load_dotenv
+        load_dotenv()
+        config = {
+            'user': os.getenv('DB_USER'),
+            'password': os.getenv('DB_PASSWORD'),
+            'host': os.getenv('DB_HOST'),
+            'port': 3306,
+            'database': os.getenv('DB_DATABASE'),
+            'cursorclass': pymysql.cursors.DictCursor
+        }
+    else:
+        config = {}
+        pymysql.connect = lambda **kwargs: ConexionSimulada(args.latencia)
+
+    pool = PoolConexiones(config, tamano_maximo=args.pool, tiempo_espera=60)
+    datos = AccesoDatos(pool)
+
+    print(f"{args.rps} peticiones/s, {args.peticiones} peticiones, pool={args.pool}")
+    latencias, duracion = await medir(lambda: ruta_bloqueante(pool), args.rps, args.peticiones)
+    informe('antes', latencias, duracion)
+    latencias, duracion = await medir(lambda: ruta_asincrona(datos), args.rps, args.peticiones)
+    informe('despues', latencias, duracion)
+
+    datos.cerrar()
+    pool.cerrar()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rps', type=float, default=400, help="peticiones por segundo que llegan")
+    parser.add_argument('--peticiones', type=int, default=2000)
+    parser.add_argument('--pool', type=int, default=10)
+    parser.add_argument('--latencia', type=float, default=0.01, help="segundos por consulta simulada")
+    parser.add_argument('--mysql', action='store_true', help="usar la base de datos real del .env")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,149 @@
+# Benchmark de las escrituras de empleados: N actualizaciones y N bajas con las
+# rutas de uno en uno (PUT /update_empleado, DELETE /delete_empleado), en serie y
+# con --concurrencia clientes, frente a las rutas por lotes (PUT /update_empleados,
+# DELETE /delete_empleados) con lotes de --lote empleados.
+#
+# Usa la base de datos local de sembrar_bd.py y arranca la API como bench_carga.py
+# (o usa --url). Los empleados que se borran los crea el propio benchmark, cada
+# uno con --candidaturas-por-empleado candidaturas que la baja tiene que reasignar.
+#
+#   python benchmarks/bench_escritura.py --empleados 500 --lote 100
+import argparse
+import asyncio
+import datetime
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import httpx
+
+from bench_carga import api_local, esperar_api
+from sembrar_bd import ROL_DESECHABLE, argumentos, conectar
+
+
+# Crea n empleados desechables con sus candidaturas y devuelve sus ids
+def crear_desechables(args, n):
+    db = conectar(args, args.database)
+    try:
+        with db.cursor() as cursor:
+            cursor.execute("SELECT COALESCE(MAX(id_empleado), 0) AS maximo FROM empleados")
+            primero = cursor.fetchone()['maximo'] + 1
+            ids = list(range(primero, primero + n))
+            cursor.executemany(
+                "INSERT INTO empleados (id_empleado, nombre_empleado, apellidos_empleado, password, rol) "
+                "VALUES (%s, %s, %s, %s, %s)",
+                [(i, 'Baja', f'Benchmark {i}', 'bench-sin-contraseña', ROL_DESECHABLE) for i in ids]
+            )
+            cursor.execute("SELECT MIN(id_candidato) AS id_candidato FROM candidatos")
+            id_candidato = cursor.fetchone()['id_candidato']
+            ahora = datetime.datetime.now().replace(microsecond=0)
+            cursor.executemany(
+                "INSERT INTO candidaturas (id_candidato, id_empleado, status, fecha_candidatura) VALUES (%s, %s, %s, %s)",
+                [(id_candidato, i, 'Recibida', ahora) for i in ids for _ in range(args.candidaturas_por_empleado)]
+            )
+        db.commit()
+    finally:
+        db.close()
+    return ids
+
+
+def empleados_existentes(args, n):
+    db = conectar(args, args.database)
+    try:
+        with db.cursor() as cursor:
+            cursor.execute("SELECT id_empleado FROM empleados WHERE rol <> %s ORDER BY id_empleado LIMIT %s",
+                           (ROL_DESECHABLE, n))
+            return [fila['id_empleado'] for fila in cursor.fetchall()]
+    finally:
+        db.close()
+
+
+# Envía una petición por elemento de `peticiones` con `concurrencia` clientes
+# a la vez y devuelve los segundos totales y las respuestas con error
+async def lanzar(cliente, peticiones, concurrencia):
+    pendientes = iter(peticiones)
+    errores = 0
+
+    async def usuario():
+        nonlocal errores
+        for metodo, ruta, cuerpo in pendientes:
+            respuesta = await cliente.request(metodo, ruta, **cuerpo)
+            errores += respuesta.status_code != 200 or any(
+                r['status_code'] != 200 for r in respuesta.json().get('resultados', [])
+            )
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(usuario() for _ in range(concurrencia)))
+    return time.perf_counter() - inicio, errores
+
+
+def lotes(ids, tamano):
+    return [ids[i:i + tamano] for i in range(0, len(ids), tamano)]
+
+
+def informe(nombre, n, segundos, errores):
+    print(f"{nombre:<40} {segundos * 1000:10.1f} ms  {n / segundos:10.1f} empleados/s  errores={errores}", flush=True)
+
+
+async def medir(url, args):
+    n = args.empleados
+    ids = empleados_existentes(args, n)
+    if len(ids) < n:
+        raise SystemExit(f"La base de datos sólo tiene {len(ids)} empleados; ejecuta sembrar_bd.py con más datos")
+
+    def actualizacion(i, rol):
+        return {'id_empleado': i, 'rol': rol, 'is_logged': i % 2}
+
+    limites = httpx.Limits(max_connections=args.concurrencia)
+    async with httpx.AsyncClient(base_url=url, limits=limites, timeout=120) as cliente:
+        print(f"{url}: {n} empleados, lotes de {args.lote}, {args.concurrencia} clientes")
+
+        casos = [
+            ('update_empleado en serie', 1,
+             [('PUT', '/update_empleado', {'json': actualizacion(i, 'Reclutador')}) for i in ids]),
+            (f'update_empleado x{args.concurrencia} clientes', args.concurrencia,
+             [('PUT', '/update_empleado', {'json': actualizacion(i, 'Coordinador')}) for i in ids]),
+            (f'update_empleados (lotes de {args.lote})', 1,
+             [('PUT', '/update_empleados', {'json': {'empleados': [actualizacion(i, 'Reclutador') for i in lote]}})
+              for lote in lotes(ids, args.lote)]),
+        ]
+        for nombre, concurrencia, peticiones in casos:
+            informe(nombre, n, *await lanzar(cliente, peticiones, concurrencia))
+
+        casos = [
+            ('delete_empleado en serie', 1,
+             lambda ids: [('DELETE', '/delete_empleado', {'params': {'id_empleado': i}}) for i in ids]),
+            (f'delete_empleado x{args.concurrencia} clientes', args.concurrencia,
+             lambda ids: [('DELETE', '/delete_empleado', {'params': {'id_empleado': i}}) for i in ids]),
+            (f'delete_empleados (lotes de {args.lote})', 1,
+             lambda ids: [('DELETE', '/delete_empleados', {'json': {'ids': lote}}) for lote in lotes(ids, args.lote)]),
+        ]
+        for nombre, concurrencia, peticiones in casos:
+            desechables = crear_desechables(args, n)
+            informe(nombre, n, *await lanzar(cliente, peticiones(desechables), concurrencia))
+
+
+def main(args):
+    if args.url:
+        esperar_api(args.url, None, args.espera_arranque)
+        asyncio.run(medir(args.url, args))
+    else:
+        with api_local(args) as url:
+            asyncio.run(medir(url, args))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    argumentos(parser)
+    parser.add_argument('--url', default=None, help="API ya arrancada; si no, se arranca una local")
+    parser.add_argument('--workers', type=int, default=1, help="con más de 1 se arranca servidor.py")
+    parser.add_argument('--puerto-api', type=int, default=8765)
+    parser.add_argument('--env', action='append', default=[], help="CLAVE=VALOR extra para la API arrancada")
+    parser.add_argument('--espera-arranque', type=float, default=120)
+    parser.add_argument('--empleados', type=int, default=500, help="empleados actualizados y eliminados en cada caso")
+    parser.add_argument('--lote', type=int, default=100, help="empleados por petición en las rutas por lotes")
+    parser.add_argument('--concurrencia', type=int, default=16)
+    parser.add_argument('--candidaturas-por-empleado', type=int, default=5)
+    main(parser.parse_args())
@@ -0,0 +1,135 @@
+# Benchmark de /export (exportacion.py): tiempo, filas/s, bytes generados y pico
+# de memoria (tracemalloc) al exportar tablas de distintos tamaños. El pico no
+# debe crecer con el número de filas.
+#
+# Por defecto se simula el cursor de servidor de MySQL, que genera las filas
+# según se le piden, para poder ejecutarlo sin base de datos. Con --mysql se
+# exporta la tabla de la base de datos local de sembrar_bd.py.
+#
+#   python benchmarks/bench_exportacion.py --filas 10000,100000,1000000
+#   python benchmarks/bench_exportacion.py --mysql --tabla competencias
+import argparse
+import datetime
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pymysql
+
+from exportacion import Exportador, GENERADORES_EXPORTACION, parquet_disponible
+from sembrar_bd import argumentos
+
+STATUS = ['Recibida', 'Pendiente', 'Entrevista1', 'Ofertado', 'Descartado']
+
+# Columnas de la tabla simulada, como las devuelve exportacion.QUERY_COLUMNAS
+COLUMNAS_SIMULADAS = [
+    {'columna': 'id_candidatura', 'tipo': 'int', 'precision_': 10, 'escala': 0},
+    {'columna': 'id_candidato', 'tipo': 'int', 'precision_': 10, 'escala': 0},
+    {'columna': 'id_empleado', 'tipo': 'int', 'precision_': 10, 'escala': 0},
+    {'columna': 'status', 'tipo': 'varchar', 'precision_': None, 'escala': None},
+    {'columna': 'fecha_candidatura', 'tipo': 'datetime', 'precision_': None, 'escala': None},
+    {'columna': 'observaciones', 'tipo': 'varchar', 'precision_': None, 'escala': None},
+    {'columna': 'fecha_actualizacion', 'tipo': 'datetime', 'precision_': None, 'escala': None},
+]
+
+
+# Cursor de servidor simulado: las filas se crean en cada fetchmany
+class CursorSimulado:
+    def __init__(self, filas):
+        self.filas = filas
+        self._siguiente = 0
+        self._columnas = []
+
+    def execute(self, query, params=None):
+        self._columnas = COLUMNAS_SIMULADAS if 'information_schema' in query else []
+
+    def fetchall(self):
+        return self._columnas
+
+    def fetchmany(self, n):
+        inicio = self._siguiente
+        fin = min(self.filas, inicio + n)
+        self._siguiente = fin
+        fecha = datetime.datetime(2024, 1, 1)
+        return [{
+            'id_candidatura': i + 1,
+            'id_candidato': i // 2 + 1,
+            'id_empleado': i % 500 + 1,
+            'status': STATUS[i % len(STATUS)],
+            'fecha_candidatura': fecha + datetime.timedelta(minutes=i),
+            'observaciones': None if i % 3 else 'Entrevista telefónica pendiente de confirmar',
+            'fecha_actualizacion': fecha + datetime.timedelta(minutes=i, seconds=30),
+        } for i in range(inicio, fin)]
+
+    def close(self):
+        pass
+
+
+class ConexionSimulada:
+    def __init__(self, filas):
+        self.filas = filas
+
+    def cursor(self):
+        return CursorSimulado(self.filas)
+
+    def close(self):
+        pass
+
+
+def exportar(exportador, tabla, formato):
+    tamano = 0
+    for parte in GENERADORES_EXPORTACION[formato](exportador.abrir(tabla)):
+        tamano += len(parte)
+    return tamano
+
+
+# Una pasada para el tiempo y otra con tracemalloc (mucho más lenta) para el pico de memoria
+def medir(exportador, tabla, formato):
+    inicio = time.perf_counter()
+    tamano = exportar(exportador, tabla, formato)
+    duracion = time.perf_counter() - inicio
+    tracemalloc.start()
+    exportar(exportador, tabla, formato)
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return duracion, tamano, pico
+
+
+def main(args):
+    formatos = ['ndjson', 'csv'] + (['parquet'] if parquet_disponible() else [])
+    print(f"{'filas':>10} {'formato':<8} {'segundos':>9} {'filas/s':>10} {'MB':>9} {'pico MB':>8}")
+
+    if args.mysql:
+        config = {'host': args.host, 'port': args.port, 'user': args.user,
+                  'password': args.password, 'database': args.database}
+        exportador = Exportador(config)
+        conn = pymysql.connect(**config)
+        with conn.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM {args.tabla}")
+            filas = cursor.fetchone()[0]
+        conn.close()
+        for formato in formatos:
+            duracion, tamano, pico = medir(exportador, args.tabla, formato)
+            print(f"{filas:10d} {formato:<8} {duracion:9.2f} {filas / duracion:10.0f} "
+                  f"{tamano / 1e6:9.1f} {pico / 1e6:8.2f}", flush=True)
+        return
+
+    exportador = Exportador({})
+    for filas in [int(n) for n in args.filas.split(',')]:
+        pymysql.connect = lambda **kwargs: ConexionSimulada(filas)
+        for formato in formatos:
+            duracion, tamano, pico = medir(exportador, 'candidaturas', formato)
+            print(f"{filas:10d} {formato:<8} {duracion:9.2f} {filas / duracion:10.0f} "
+                  f"{tamano / 1e6:9.1f} {pico / 1e6:8.2f}", flush=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    argumentos(parser)
+    parser.add_argument('--filas', default='10000,100000,1000000', help="tamaños simulados, separados por comas")
+    parser.add_argument('--mysql', action='store_true', help="exportar de la base de datos local")
+    parser.add_argument('--tabla', default='candidaturas')
+    main(parser.parse_args())
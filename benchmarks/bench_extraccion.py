@@ -0,0 +1,185 @@
+# Benchmark de la extracción del conjunto de entrenamiento de /retrain:
+#   - antes: SELECT * con DictCursor, todo el resultado en memoria y pivote con dicts
+#   - ahora: extraer_datos_entrenamiento (columnas justas, SSCursor por lotes y
+#     volcado directo a una matriz de NumPy)
+# Cada método se ejecuta en un proceso nuevo para que el pico de RSS sea sólo suyo.
+# Antes de medir se comprueba que los dos dan la misma X e y.
+#
+# Por defecto se simula MySQL con una conexión falsa que genera las filas al
+# vuelo; con --mysql se usa la configuración real del .env.
+#
+#   python benchmarks/bench_extraccion.py --candidaturas 100000
+import argparse
+import itertools
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+import pymysql
+
+from inferencia import COMPETENCIAS
+from reentrenamiento import STATUS_ENTRENAMIENTO, STATUS_POSITIVOS, extraer_datos_entrenamiento, pico_rss_mb
+
+
+# Filas sintéticas como tuplas; una de cada diez candidaturas no tiene la primera competencia
+COLUMNAS_CANDIDATURAS = ['id_candidatura', 'id_empleado', 'status', 'fecha_candidatura', 'observaciones']
+COLUMNAS_COMPETENCIAS = ['id_competencia', 'id_candidatura', 'nombre_competencia', 'nota']
+
+
+def filas_candidaturas(n):
+    for k in range(1, n + 1):
+        yield (k, k % 50, STATUS_ENTRENAMIENTO[k % len(STATUS_ENTRENAMIENTO)], '2024-01-01', 'Sin observaciones')
+
+
+def filas_competencias(n):
+    id_competencia = itertools.count(1)
+    for k in range(1, n + 1):
+        for j, nombre in enumerate(COMPETENCIAS):
+            if j == 0 and k % 10 == 0:
+                continue
+            yield (next(id_competencia), k, nombre, (k * 7 + j * 3) % 11)
+
+
+class CursorSimulado:
+    def __init__(self, n, tuplas):
+        self.n = n
+        self.tuplas = tuplas
+        self._filas = iter(())
+
+    def execute(self, query, params=None):
+        if 'FROM competencias' in query:
+            filas, columnas = filas_competencias(self.n), COLUMNAS_COMPETENCIAS
+        else:
+            filas, columnas = filas_candidaturas(self.n), COLUMNAS_CANDIDATURAS
+
+        if not query.strip().startswith('SELECT *'):
+            # Sólo las columnas que pide la consulta, en su orden
+            pedidas = query.split('SELECT', 1)[1].split('FROM', 1)[0]
+            pedidas = [c.strip().split('.')[-1] for c in pedidas.split(',')]
+            posiciones = [columnas.index(c) for c in pedidas]
+            filas = (tuple(fila[p] for p in posiciones) for fila in filas)
+            columnas = pedidas
+
+        # DictCursor crea un dict por fila; SSCursor devuelve la tupla tal cual
+        self._filas = filas if self.tuplas else (dict(zip(columnas, fila)) for fila in filas)
+
+    def fetchall(self):
+        return list(self._filas)
+
+    def fetchmany(self, tamano):
+        return list(itertools.islice(self._filas, tamano))
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ConexionSimulada:
+    def __init__(self, n):
+        self.n = n
+
+    def cursor(self, cursorclass=None):
+        return CursorSimulado(self.n, tuplas=cursorclass is pymysql.cursors.SSCursor)
+
+    def close(self):
+        pass
+
+
+# Camino anterior de /retrain, tal cual
+def extraccion_anterior(db):
+    cursor = db.cursor()
+    cursor.execute("SELECT * FROM competencias")
+    competencias = cursor.fetchall()
+    cursor.execute("""
+        SELECT * FROM candidaturas
+        WHERE status IN ('Entrevista2', 'Ofertado', 'Entrevista1', 'CentroEvaluación', 'Descartado')
+    """)
+    candidaturas = cursor.fetchall()
+
+    competencias_dict = {}
+    for comp in competencias:
+        if comp['id_candidatura'] not in competencias_dict:
+            competencias_dict[comp['id_candidatura']] = {}
+        competencias_dict[comp['id_candidatura']][comp['nombre_competencia']] = comp['nota']
+
+    X = []
+    y = []
+    for cand in candidaturas:
+        if cand['id_candidatura'] in competencias_dict:
+            comp_dict = competencias_dict[cand['id_candidatura']]
+            if all(comp in comp_dict for comp in COMPETENCIAS):
+                X.append([comp_dict[comp] for comp in COMPETENCIAS])
+                y.append(1 if cand['status'] in STATUS_POSITIVOS else 0)
+
+    return np.array(X, dtype=float), np.array(y), len(competencias) + len(candidaturas)
+
+
+def extraccion_nueva(db):
+    X, y, estadisticas = extraer_datos_entrenamiento(db)
+    return X, y, estadisticas['filas_leidas']
+
+
+def conectar(args):
+    if not args.mysql:
+        return ConexionSimulada(args.candidaturas)
+    from dotenv import load_dotenv
+    load_dotenv()
+    return pymysql.connect(
+        user=os.getenv('DB_USER'), password=os.getenv('DB_PASSWORD'),
+        host=os.getenv('DB_HOST'), port=3306, database=os.getenv('DB_DATABASE'),
+        cursorclass=pymysql.cursors.DictCursor
+    )
+
+
+# Se ejecuta en un proceso aparte
+def medir(metodo, args):
+    db = conectar(args)
+    rss_inicial = pico_rss_mb()
+    inicio = time.perf_counter()
+    X, y, filas = METODOS[metodo](db)
+    duracion = time.perf_counter() - inicio
+    db.close()
+    return {
+        'duracion': duracion,
+        'filas': filas,
+        'rss_inicial': rss_inicial,
+        'pico_rss': pico_rss_mb(),
+        'huella': (X.shape, float(X.sum()), int(y.sum())),
+    }
+
+
+METODOS = {'antes': extraccion_anterior, 'ahora': extraccion_nueva}
+
+
+def main(args):
+    contexto = multiprocessing.get_context('spawn')
+    resultados = {}
+    for metodo in METODOS:
+        with contexto.Pool(1) as proceso:
+            resultados[metodo] = proceso.apply(medir, (metodo, args))
+
+    if resultados['antes']['huella'] != resultados['ahora']['huella']:
+        raise SystemExit(f"Los métodos no coinciden: {resultados}")
+
+    origen = 'MySQL' if args.mysql else f"simulado, {args.candidaturas} candidaturas"
+    print(f"Extracción del conjunto de entrenamiento ({origen}); X = {resultados['ahora']['huella'][0]}")
+    print(f"{'método':<8}{'filas':>10}{'segundos':>10}{'filas/s':>12}{'pico RSS MB':>14}{'RSS inicial MB':>16}")
+    for metodo, r in resultados.items():
+        print(f"{metodo:<8}{r['filas']:>10}{r['duracion']:>10.2f}{r['filas'] / r['duracion']:>12.0f}"
+              f"{r['pico_rss'] or float('nan'):>14.1f}{r['rss_inicial'] or float('nan'):>16.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--candidaturas', type=int, default=100000, help="candidaturas simuladas")
+    parser.add_argument('--mysql', action='store_true', help="usar la base de datos real del .env")
+    main(parser.parse_args())
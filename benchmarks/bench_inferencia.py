@@ -0,0 +1,85 @@
+# Micro-benchmark de una predicción individual de /predict:
+#   - pandas: camino anterior (dict + DataFrame con nombres de columna + model.predict)
+#   - numpy: PredictorRapido con sklearn sobre un vector de NumPy
+#   - aplanado: PredictorRapido con el bosque aplanado (por defecto en la API)
+# Antes de medir se comprueba que los tres caminos dan la misma predicción para
+# todas las filas de data_modelo/candidatos_prueba.csv.
+#
+#   python benchmarks/bench_inferencia.py --repeticiones 2000
+import argparse
+import os
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from inferencia import COMPETENCIAS, PredictorRapido, vector_competencias
+
+RAIZ = os.path.join(os.path.dirname(__file__), '..')
+
+
+def camino_pandas(model, competencias):
+    competencias_dict = {comp['nombre_competencia']: comp['nota'] for comp in competencias}
+    for comp in COMPETENCIAS:
+        if comp not in competencias_dict:
+            competencias_dict[comp] = 0
+    input_data = pd.DataFrame([[competencias_dict[comp] for comp in COMPETENCIAS]], columns=COMPETENCIAS)
+    return model.predict(input_data)[0]
+
+
+def camino_predictor(predictor, competencias):
+    return predictor.predecir(vector_competencias(competencias))
+
+
+def medir(funcion, casos, repeticiones):
+    tiempos = []
+    for i in range(repeticiones):
+        caso = casos[i % len(casos)]
+        inicio = time.perf_counter()
+        funcion(caso)
+        tiempos.append(time.perf_counter() - inicio)
+    tiempos.sort()
+    return tiempos[len(tiempos) // 2], tiempos[int(len(tiempos) * 0.99)]
+
+
+def main(args):
+    warnings.filterwarnings('ignore', category=UserWarning)
+    model = joblib.load(args.modelo)
+    numpy_predictor = PredictorRapido(model)
+    aplanado = PredictorRapido(model, aplanar=True)
+
+    df = pd.read_csv(os.path.join(RAIZ, 'data_modelo', 'candidatos_prueba.csv'))
+    casos = [
+        [{'nombre_competencia': comp, 'nota': int(nota)} for comp, nota in zip(COMPETENCIAS, fila)]
+        for fila in df[COMPETENCIAS].values
+    ]
+
+    referencia = model.predict(df[COMPETENCIAS])
+    for nombre, predictor in (('numpy', numpy_predictor), ('aplanado', aplanado)):
+        matriz = np.array([vector_competencias(caso) for caso in casos])
+        if not np.array_equal(predictor.predecir(matriz), referencia):
+            raise SystemExit(f"El camino {nombre} no coincide con el modelo original")
+
+    caminos = [
+        ('pandas', lambda caso: camino_pandas(model, caso)),
+        ('numpy', lambda caso: camino_predictor(numpy_predictor, caso)),
+        ('aplanado', lambda caso: camino_predictor(aplanado, caso)),
+    ]
+    print(f"{len(casos)} casos, {args.repeticiones} repeticiones por camino")
+    base = None
+    for nombre, funcion in caminos:
+        p50, p99 = medir(funcion, casos, args.repeticiones)
+        base = base or p50
+        print(f"{nombre:<10} p50={p50 * 1e6:9.1f} us  p99={p99 * 1e6:9.1f} us  x{base / p50:5.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--modelo', default=os.path.join(RAIZ, 'models', 'model_web.pkl'))
+    parser.add_argument('--repeticiones', type=int, default=2000)
+    main(parser.parse_args())
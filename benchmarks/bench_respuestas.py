@@ -0,0 +1,226 @@
+# Benchmark de la capa de respuestas (respuestas.py): bytes enviados y CPU por
+# petición de las rutas de lectura.
+# 1. Serialización: jsonable_encoder + json (lo que hacía FastAPI por defecto)
+#    frente a RespuestaJSON (orjson) con el mismo contenido.
+# 2. Petición completa a la API (ASGI, sin red ni cliente HTTP): sin comprimir,
+#    gzip, brotli si está instalado, respuesta desde la caché y 304.
+#
+# La BD se simula con una conexión falsa que devuelve filas con el mismo tamaño
+# y tipos (datetime, Decimal) que las reales, así que no hace falta MySQL.
+#
+#   python benchmarks/bench_respuestas.py --peticiones 2000
+import argparse
+import asyncio
+import datetime
+import decimal
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pymysql
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import JSONResponse
+
+from estadisticas import resumen_desde_filas
+
+CARRERAS = ['Magisterio Primaria', 'Magisterio Infantil', 'Matemáticas', 'Física', 'Filología Inglesa',
+            'Historia', 'Biología', 'Química', 'Ingeniería Informática', 'Psicología']
+
+
+def filas_empleados(n):
+    return [{
+        'id_empleado': i,
+        'nombre_empleado': f"Empleado {i}",
+        'apellidos_empleado': 'García Fernández',
+        'rol': 'Técnico de selección',
+        'is_logged': i % 2,
+        'last_logged_date': datetime.datetime(2024, 5, 1, 9, 30) + datetime.timedelta(hours=i),
+        'num_candidaturas': 500 - i,
+    } for i in range(1, n + 1)]
+
+
+def filas_resumen():
+    filas = [{'dimension': 'carrera', 'clave': c, 'count': 100 + i, 'average': decimal.Decimal('7.1234') + i}
+             for i, c in enumerate(CARRERAS)]
+    filas += [{'dimension': 'ingles', 'clave': n, 'count': 50 + i, 'average': None}
+              for i, n in enumerate(['A1', 'A2', 'B1', 'B2', 'C1', 'C2'])]
+    filas += [{'dimension': 'edad', 'clave': r, 'count': 30 + i, 'average': None}
+              for i, r in enumerate(['19-24', '25-29', '30-34', '35-39', '40-44', '45-49', '50-54', '55-59', '60+'])]
+    return filas
+
+
+def filas_candidatos(n=1000):
+    return [{
+        'id_candidato': i,
+        'carrera': CARRERAS[i % len(CARRERAS)],
+        'nivel_ingles': ['A1', 'A2', 'B1', 'B2', 'C1', 'C2'][i % 6],
+        'nota_media': decimal.Decimal('5.00') + decimal.Decimal(i % 500) / 100,
+        'edad': 19 + i % 45,
+    } for i in range(1, n + 1)]
+
+
+FILAS_STATUS = [{'status': s, 'count': decimal.Decimal(100 * (i + 1))}
+                for i, s in enumerate(['Recibida', 'Pendiente', 'Entrevista1', 'Entrevista2', 'Ofertado', 'Contratado', 'Descartado'])]
+
+
+class CursorSimulado:
+    def __init__(self):
+        self.rowcount = 0
+        self._filas = []
+
+    def execute(self, query, params=None):
+        if 'NOW()' in query:
+            self._filas = [{'ahora': datetime.datetime.now()}]
+        elif 'COUNT(*) AS total' in query and 'FROM candidatos' in query:
+            self._filas = [{'total': 1000, 'suma_ids': 1000 * 1001 // 2}]
+        elif 'FROM candidatos' in query:
+            self._filas = filas_candidatos()
+        elif 'FROM empleados' in query:
+            self._filas = filas_empleados(params[-1] if params else 50)
+        elif 'status' in query:
+            self._filas = FILAS_STATUS
+        else:
+            self._filas = []
+        self.rowcount = len(self._filas)
+
+    def fetchall(self):
+        return self._filas
+
+    def fetchone(self):
+        return self._filas[0] if self._filas else None
+
+    def fetchmany(self, n):
+        filas, self._filas = self._filas[:n], self._filas[n:]
+        return filas
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ConexionSimulada:
+    open = True
+    server_status = 0
+
+    def cursor(self, *args):
+        return CursorSimulado()
+
+    def ping(self, reconnect=False):
+        pass
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.open = False
+
+
+# Mide `veces` llamadas a funcion(): CPU del proceso en microsegundos por llamada
+def cpu_por_llamada(funcion, veces):
+    inicio = time.process_time()
+    for _ in range(veces):
+        funcion()
+    return (time.process_time() - inicio) / veces * 1e6
+
+
+def serializacion(veces):
+    from respuestas import RespuestaJSON, orjson
+    contenidos = {
+        '/all_empleados (50 filas)': {'empleados': filas_empleados(50), 'next_cursor': 'eyJ2IjogNDUwLCAiaWQiOiA1MH0'},
+        '/estadisticas/resumen': resumen_desde_filas(filas_resumen()),
+        '/candidaturas_status': {fila['status']: int(fila['count']) for fila in FILAS_STATUS},
+    }
+    print(f"Serialización ({'orjson' if orjson is not None else 'json, orjson no instalado'})")
+    print(f"{'contenido':<28} {'antes µs':>9} {'ahora µs':>9} {'bytes antes':>12} {'bytes ahora':>12}")
+    for nombre, contenido in contenidos.items():
+        antes = cpu_por_llamada(lambda: JSONResponse(jsonable_encoder(contenido)), veces)
+        ahora = cpu_por_llamada(lambda: RespuestaJSON(contenido), veces)
+        print(f"{nombre:<28} {antes:9.1f} {ahora:9.1f} {len(JSONResponse(jsonable_encoder(contenido)).body):12d} "
+              f"{len(RespuestaJSON(contenido).body):12d}")
+
+
+# Una petición GET directa a la aplicación ASGI; devuelve (status, cabeceras, bytes del cuerpo)
+async def peticion(app, ruta, cabeceras):
+    path, _, query = ruta.partition('?')
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(),
+        'root_path': '', 'headers': [(k.encode(), v.encode()) for k, v in cabeceras.items()],
+        'client': ('127.0.0.1', 50000), 'server': ('127.0.0.1', 8000),
+    }
+    mensajes = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(mensaje):
+        mensajes.append(mensaje)
+
+    await app(scope, receive, send)
+    inicio = mensajes[0]
+    cuerpo = b''.join(m.get('body', b'') for m in mensajes[1:])
+    return inicio['status'], {k.decode(): v.decode() for k, v in inicio['headers']}, len(cuerpo)
+
+
+async def peticiones_completas(veces):
+    pymysql.connect = lambda **kwargs: ConexionSimulada()
+    import api_empleados
+    from pool_conexiones import PoolConexiones
+    from acceso_datos import AccesoDatos
+    from respuestas import brotli
+
+    pool = PoolConexiones({}, tamano_maximo=4)
+    api_empleados.app.state.pool = pool
+    api_empleados.app.state.datos = AccesoDatos(pool)
+    app = api_empleados.app
+    cache = api_empleados.cache_respuestas
+    ttl = cache.ttl
+
+    modos = [('sin comprimir', {}, 0), ('gzip', {'accept-encoding': 'gzip'}, 0)]
+    if brotli is not None:
+        modos.append(('br', {'accept-encoding': 'br, gzip'}, 0))
+    modos.append(('gzip + caché', {'accept-encoding': 'gzip'}, 3600))
+    modos.append(('304', {'accept-encoding': 'gzip', 'if-none-match': None}, 3600))
+
+    rutas = ['/all_empleados?limit=50', '/estadisticas/resumen', '/estadisticas/carrera', '/candidaturas_status']
+    print(f"\nPeticiones completas ({veces} por caso; CPU de todo el proceso, incluidos los hilos de la BD)")
+    print(f"{'ruta':<26} {'modo':<14} {'status':>6} {'bytes':>7} {'CPU µs':>9}")
+    for ruta in rutas:
+        for nombre, cabeceras, ttl_modo in modos:
+            cache.ttl = ttl_modo
+            cache.invalidar()
+            if 'if-none-match' in cabeceras:
+                _, respuesta, _ = await peticion(app, ruta, {'accept-encoding': 'gzip'})
+                cabeceras = {**cabeceras, 'if-none-match': respuesta['etag']}
+            else:
+                await peticion(app, ruta, cabeceras)
+            inicio = time.process_time()
+            for _ in range(veces):
+                status, _, tamano = await peticion(app, ruta, cabeceras)
+            cpu = (time.process_time() - inicio) / veces * 1e6
+            print(f"{ruta:<26} {nombre:<14} {status:6d} {tamano:7d} {cpu:9.1f}")
+    cache.ttl = ttl
+    api_empleados.app.state.datos.cerrar()
+    pool.cerrar()
+
+
+def main(args):
+    serializacion(args.serializaciones)
+    asyncio.run(peticiones_completas(args.peticiones))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--peticiones', type=int, default=2000, help="peticiones por ruta y modo")
+    parser.add_argument('--serializaciones', type=int, default=5000)
+    main(parser.parse_args())
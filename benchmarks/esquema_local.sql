@@ -0,0 +1,42 @@
+-- Esquema base de la base de datos local de los benchmarks (ver sembrar_bd.py).
+-- Sólo las columnas que usa la API; sembrar_bd.py aplica después las
+-- migraciones de sql/ igual que en producción.
+
+CREATE TABLE empleados (
+    id_empleado INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    nombre_empleado VARCHAR(100) NOT NULL,
+    apellidos_empleado VARCHAR(150) NOT NULL,
+    password VARCHAR(255) NOT NULL,
+    rol VARCHAR(50) NOT NULL,
+    is_logged TINYINT(1) NOT NULL DEFAULT 0,
+    last_logged_date DATETIME NULL,
+    num_candidaturas INT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE candidatos (
+    id_candidato INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    nombre_candidato VARCHAR(150) NOT NULL,
+    carrera VARCHAR(100) NOT NULL,
+    nivel_ingles VARCHAR(10) NOT NULL,
+    nota_media DECIMAL(4, 2) NOT NULL,
+    edad INT NOT NULL
+);
+
+CREATE TABLE candidaturas (
+    id_candidatura INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    id_candidato INT NOT NULL,
+    id_empleado INT NOT NULL,
+    status VARCHAR(50) NOT NULL,
+    fecha_candidatura DATETIME NOT NULL,
+    observaciones VARCHAR(255) NULL,
+    KEY idx_candidaturas_empleado (id_empleado),
+    KEY idx_candidaturas_candidato (id_candidato)
+);
+
+CREATE TABLE competencias (
+    id_competencia INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    id_candidatura INT NOT NULL,
+    nombre_competencia VARCHAR(50) NOT NULL,
+    nota INT NOT NULL,
+    KEY idx_competencias_candidatura (id_candidatura)
+);
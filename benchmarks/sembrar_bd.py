@@ -0,0 +1,243 @@
+# Crea y llena una base de datos MySQL/MariaDB local para los benchmarks de la API
+# (ver bench_carga.py), con el esquema de esquema_local.sql y las migraciones de sql/.
+#
+# Los datos son sintéticos pero siguen data_modelo/candidatos_prueba.csv: cada
+# candidatura toma las notas de competencias y el resultado de una fila del CSV
+# elegida al azar (las notas a 0 son competencias sin registrar) y el resultado
+# decide el status. Con la misma --semilla se generan siempre los mismos datos.
+#
+#   docker run -d --name mysql-bench -e MYSQL_ALLOW_EMPTY_PASSWORD=1 -p 3306:3306 mysql:8
+#   python benchmarks/sembrar_bd.py --candidaturas 100000 --reiniciar
+#
+# Escala: --candidaturas de 10.000 a 10.000.000 (unas 6 filas de competencias por candidatura).
+import argparse
+import datetime
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+import pymysql
+
+from inferencia import COMPETENCIAS
+from reentrenamiento import STATUS_POSITIVOS
+
+RAIZ = os.path.join(os.path.dirname(__file__), '..')
+CSV = os.path.join(RAIZ, 'data_modelo', 'candidatos_prueba.csv')
+ESQUEMA = os.path.join(os.path.dirname(__file__), 'esquema_local.sql')
+
+# Migraciones de sql/ en el orden en que se aplican, después de cargar los datos
+MIGRACIONES = ['fecha_actualizacion.sql', 'fecha_actualizacion_empleados.sql', 'fecha_actualizacion_candidatos.sql',
+               'indices_empleados.sql', 'resumen_candidaturas_status.sql']
+
+# Empleados sin candidaturas que bench_carga.py usa para DELETE /delete_empleado
+ROL_DESECHABLE = 'bench_desechable'
+
+ROLES = ['Reclutador', 'Técnico de selección', 'Coordinador', 'Administrador']
+NOMBRES = ['Lucía', 'Hugo', 'Martina', 'Mateo', 'Sofía', 'Martín', 'María', 'Pablo', 'Julia', 'Álvaro',
+           'Paula', 'Daniel', 'Valeria', 'Adrián', 'Emma', 'Diego', 'Noa', 'Manuel', 'Carmen', 'Javier']
+APELLIDOS = ['García', 'Rodríguez', 'González', 'Fernández', 'López', 'Martínez', 'Sánchez', 'Pérez',
+             'Gómez', 'Martín', 'Jiménez', 'Ruiz', 'Hernández', 'Díaz', 'Moreno', 'Muñoz', 'Álvarez', 'Núñez']
+CARRERAS = ['Magisterio Primaria', 'Magisterio Infantil', 'Matemáticas', 'Física', 'Filología Inglesa',
+            'Historia', 'Biología', 'Química', 'Ingeniería Informática', 'Psicología']
+NIVELES_INGLES = ['A1', 'A2', 'B1', 'B2', 'C1', 'C2']
+PESOS_INGLES = [0.05, 0.1, 0.25, 0.3, 0.2, 0.1]
+
+# Status de las filas del CSV que no son admitido ni rechazado
+STATUS_EN_PROCESO = 'Pendiente'
+STATUS_SIN_RESULTADO = 'Recibida'
+
+# Rango de fechas de las candidaturas
+DIAS_HISTORICO = 3 * 365
+
+
+# Divide un script SQL en sentencias, respetando los bloques DELIMITER de los triggers
+def sentencias(texto):
+    delimitador = ';'
+    actual = []
+    for linea in texto.splitlines():
+        limpia = linea.strip()
+        if limpia.upper().startswith('DELIMITER '):
+            delimitador = limpia.split()[1]
+            continue
+        if limpia.startswith('--') or (not limpia and not actual):
+            continue
+        actual.append(linea)
+        if limpia.endswith(delimitador):
+            sentencia = '\n'.join(actual).strip()[:-len(delimitador)].strip()
+            actual = []
+            if sentencia:
+                yield sentencia
+
+
+def ejecutar_script(db, ruta):
+    with open(ruta, encoding='utf-8') as f:
+        texto = f.read()
+    with db.cursor() as cursor:
+        for sentencia in sentencias(texto):
+            cursor.execute(sentencia)
+    db.commit()
+
+
+def leer_csv():
+    datos = np.genfromtxt(CSV, delimiter=',', names=True, dtype=np.int64)
+    notas = np.column_stack([datos[c] for c in COMPETENCIAS])
+    return notas, datos['admitido'], datos['rechazado'], datos['en_proceso']
+
+
+def insertar(db, tabla, columnas, filas):
+    query = f"INSERT INTO {tabla} ({', '.join(columnas)}) VALUES ({', '.join(['%s'] * len(columnas))})"
+    with db.cursor() as cursor:
+        # pymysql agrupa un executemany de INSERT ... VALUES en sentencias de varias filas
+        cursor.executemany(query, filas)
+    db.commit()
+
+
+def sembrar_empleados(db, rng, n, desechables):
+    filas = []
+    for i in range(n + desechables):
+        ultimo = datetime.datetime(2024, 1, 1) + datetime.timedelta(minutes=int(rng.integers(0, 600000)))
+        filas.append((
+            i + 1,
+            NOMBRES[rng.integers(len(NOMBRES))],
+            f"{APELLIDOS[rng.integers(len(APELLIDOS))]} {APELLIDOS[rng.integers(len(APELLIDOS))]}",
+            'bench-sin-contraseña',
+            ROL_DESECHABLE if i >= n else ROLES[rng.integers(len(ROLES))],
+            int(rng.random() < 0.2),
+            ultimo,
+        ))
+    insertar(db, 'empleados', ['id_empleado', 'nombre_empleado', 'apellidos_empleado', 'password',
+                               'rol', 'is_logged', 'last_logged_date'], filas)
+
+
+def sembrar_candidatos(db, rng, n, lote):
+    for inicio in range(0, n, lote):
+        k = min(lote, n - inicio)
+        carreras = rng.integers(len(CARRERAS), size=k)
+        ingles = rng.choice(len(NIVELES_INGLES), size=k, p=PESOS_INGLES)
+        notas = np.clip(rng.normal(7.0, 1.1, size=k), 5.0, 10.0).round(2)
+        edades = np.clip(rng.gamma(4.0, 2.5, size=k) + 19, 19, 70).astype(int)
+        filas = [
+            (inicio + j + 1, f"Candidato {inicio + j + 1}", CARRERAS[carreras[j]],
+             NIVELES_INGLES[ingles[j]], float(notas[j]), int(edades[j]))
+            for j in range(k)
+        ]
+        insertar(db, 'candidatos', ['id_candidato', 'nombre_candidato', 'carrera', 'nivel_ingles',
+                                    'nota_media', 'edad'], filas)
+
+
+def sembrar_candidaturas(db, rng, n, candidatos, empleados, lote):
+    notas_csv, admitido, rechazado, en_proceso = leer_csv()
+    hoy = datetime.datetime.now().replace(microsecond=0)
+    id_competencia = 1
+    for inicio in range(0, n, lote):
+        k = min(lote, n - inicio)
+        ids = np.arange(inicio + 1, inicio + k + 1)
+        fila_csv = rng.integers(len(notas_csv), size=k)
+        positivo = rng.integers(len(STATUS_POSITIVOS), size=k)
+        segundos = rng.integers(0, DIAS_HISTORICO * 86400, size=k)
+        id_candidato = rng.integers(1, candidatos + 1, size=k)
+        # Unos pocos empleados llevan la mayoría de candidaturas
+        id_empleado = np.minimum(rng.zipf(1.6, size=k), empleados)
+
+        candidaturas = []
+        competencias = []
+        for j in range(k):
+            f = fila_csv[j]
+            if admitido[f]:
+                status = STATUS_POSITIVOS[positivo[j]]
+            elif rechazado[f]:
+                status = 'Descartado'
+            elif en_proceso[f]:
+                status = STATUS_EN_PROCESO
+            else:
+                status = STATUS_SIN_RESULTADO
+            candidaturas.append((int(ids[j]), int(id_candidato[j]), int(id_empleado[j]), status,
+                                 hoy - datetime.timedelta(seconds=int(segundos[j])), None))
+            for c, nombre in enumerate(COMPETENCIAS):
+                if notas_csv[f, c]:
+                    competencias.append((id_competencia, int(ids[j]), nombre, int(notas_csv[f, c])))
+                    id_competencia += 1
+
+        insertar(db, 'candidaturas', ['id_candidatura', 'id_candidato', 'id_empleado', 'status',
+                                      'fecha_candidatura', 'observaciones'], candidaturas)
+        insertar(db, 'competencias', ['id_competencia', 'id_candidatura', 'nombre_competencia', 'nota'], competencias)
+    return id_competencia - 1
+
+
+def conectar(args, database=None):
+    return pymysql.connect(
+        host=args.host, port=args.port, user=args.user, password=args.password,
+        database=database, cursorclass=pymysql.cursors.DictCursor, charset='utf8mb4'
+    )
+
+
+def main(args):
+    rng = np.random.default_rng(args.semilla)
+    empleados = args.empleados or max(10, args.candidaturas // 100)
+    candidatos = args.candidatos or max(1, int(args.candidaturas * 0.8))
+
+    db = conectar(args)
+    with db.cursor() as cursor:
+        cursor.execute("SHOW DATABASES LIKE %s", (args.database,))
+        if cursor.fetchone() is not None:
+            if not args.reiniciar:
+                raise SystemExit(f"La base de datos {args.database} ya existe; usa --reiniciar para borrarla")
+            cursor.execute(f"DROP DATABASE `{args.database}`")
+        cursor.execute(f"CREATE DATABASE `{args.database}` CHARACTER SET utf8mb4")
+    db.close()
+
+    db = conectar(args, args.database)
+    ejecutar_script(db, ESQUEMA)
+    with db.cursor() as cursor:
+        cursor.execute("SET unique_checks = 0")
+
+    inicio = time.perf_counter()
+    sembrar_empleados(db, rng, empleados, args.desechables)
+    sembrar_candidatos(db, rng, candidatos, args.lote)
+    n_competencias = sembrar_candidaturas(db, rng, args.candidaturas, candidatos, empleados, args.lote)
+    carga = time.perf_counter() - inicio
+
+    with db.cursor() as cursor:
+        cursor.execute("""
+            UPDATE empleados e
+            JOIN (SELECT id_empleado, COUNT(*) AS n FROM candidaturas GROUP BY id_empleado) c
+                ON c.id_empleado = e.id_empleado
+            SET e.num_candidaturas = c.n
+        """)
+    db.commit()
+
+    inicio = time.perf_counter()
+    for migracion in MIGRACIONES:
+        ejecutar_script(db, os.path.join(RAIZ, 'sql', migracion))
+    migraciones = time.perf_counter() - inicio
+    db.close()
+
+    filas = empleados + args.desechables + candidatos + args.candidaturas + n_competencias
+    print(f"Base de datos {args.database} en {args.host}:{args.port}")
+    print(f"  empleados: {empleados} (+{args.desechables} desechables), candidatos: {candidatos}, "
+          f"candidaturas: {args.candidaturas}, competencias: {n_competencias}")
+    print(f"  carga: {carga:.1f} s ({filas / carga:.0f} filas/s), migraciones: {migraciones:.1f} s")
+
+
+def argumentos(parser):
+    parser.add_argument('--host', default=os.getenv('BENCH_DB_HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('BENCH_DB_PORT', '3306')))
+    parser.add_argument('--user', default=os.getenv('BENCH_DB_USER', 'root'))
+    parser.add_argument('--password', default=os.getenv('BENCH_DB_PASSWORD', ''))
+    parser.add_argument('--database', default=os.getenv('BENCH_DB_DATABASE', 'bench_empleados'))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    argumentos(parser)
+    parser.add_argument('--candidaturas', type=int, default=10000)
+    parser.add_argument('--empleados', type=int, default=None, help="por defecto una centésima parte de las candidaturas")
+    parser.add_argument('--candidatos', type=int, default=None, help="por defecto el 80%% de las candidaturas")
+    parser.add_argument('--desechables', type=int, default=1000, help="empleados para los DELETE del benchmark")
+    parser.add_argument('--lote', type=int, default=10000, help="candidaturas por lote de inserción")
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--reiniciar', action='store_true', help="borrar la base de datos si ya existe")
+    main(parser.parse_args())
@@ -0,0 +1,148 @@
+import heapq
+import threading
+import time
+import unicodedata
+
+
+# Campos indexados de cada empleado y su peso en la puntuación
+CAMPOS_BUSQUEDA = {'nombre_empleado': 1.0, 'apellidos_empleado': 0.9, 'rol': 0.5}
+
+# Separa los campos dentro del texto indexado para que una búsqueda nunca
+# coincida a caballo entre dos campos
+_SEPARADOR = '\x00'
+
+
+# Minúsculas y sin tildes ni diéresis: "José Núñez" -> "jose nunez"
+def normalizar(texto):
+    texto = unicodedata.normalize('NFKD', str(texto or ''))
+    return ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+
+
+def _ngramas(texto, n):
+    return {texto[i:i + n] for i in range(len(texto) - n + 1) if _SEPARADOR not in texto[i:i + n]}
+
+
+# Índice invertido de n-gramas (1, 2 y 3 caracteres) sobre nombre, apellidos y rol.
+# Cada palabra de la búsqueda debe aparecer como subcadena en algún campo (como el
+# LIKE '%...%' anterior, pero sin distinguir tildes). Los candidatos salen de
+# intersecar las listas de n-gramas, así el coste depende del número de
+# coincidencias y no del tamaño de la tabla.
+class IndiceEmpleados:
+    def __init__(self):
+        self._campos = {}  # id_empleado -> {campo: texto normalizado}
+        self._textos = {}  # id_empleado -> campos unidos con _SEPARADOR
+        self._postings = {}  # n-grama -> set(id_empleado)
+        self._lock = threading.Lock()
+        self.construido_en = None
+
+    def reconstruir(self, filas):
+        campos, textos, postings = {}, {}, {}
+        for fila in filas:
+            id_empleado = fila['id_empleado']
+            campos[id_empleado] = {campo: normalizar(fila.get(campo)) for campo in CAMPOS_BUSQUEDA}
+            textos[id_empleado] = _SEPARADOR.join(campos[id_empleado].values())
+            for ngrama in _ngramas_texto(textos[id_empleado]):
+                postings.setdefault(ngrama, set()).add(id_empleado)
+
+        with self._lock:
+            self._campos, self._textos, self._postings = campos, textos, postings
+            self.construido_en = time.monotonic()
+
+    def caducado(self, ttl):
+        return self.construido_en is None or time.monotonic() - self.construido_en > ttl
+
+    # Marca el índice para reconstruirlo en la siguiente búsqueda
+    def caducar(self):
+        self.construido_en = None
+
+    # Actualiza los campos no nulos de un empleado. Devuelve False si el empleado
+    # no estaba en el índice (y por tanto faltan campos para indexarlo).
+    def actualizar(self, id_empleado, **valores):
+        with self._lock:
+            if id_empleado not in self._campos:
+                return False
+            self._quitar(id_empleado)
+            campos = dict(self._campos[id_empleado])
+            for campo, valor in valores.items():
+                if campo in CAMPOS_BUSQUEDA and valor is not None:
+                    campos[campo] = normalizar(valor)
+            self._campos[id_empleado] = campos
+            self._textos[id_empleado] = _SEPARADOR.join(campos.values())
+            for ngrama in _ngramas_texto(self._textos[id_empleado]):
+                self._postings.setdefault(ngrama, set()).add(id_empleado)
+            return True
+
+    def eliminar(self, id_empleado):
+        with self._lock:
+            if id_empleado in self._campos:
+                self._quitar(id_empleado)
+                del self._campos[id_empleado]
+
+    # Devuelve [(id_empleado, puntuacion)] ordenados de mayor a menor relevancia
+    def buscar(self, texto, limite=None):
+        palabras = normalizar(texto).split()
+        if not palabras:
+            return []
+
+        with self._lock:
+            candidatos = None
+            for palabra in sorted(palabras, key=len, reverse=True):
+                ids = self._candidatos(palabra)
+                candidatos = ids if candidatos is None else candidatos & ids
+                if not candidatos:
+                    return []
+
+            resultados = []
+            for id_empleado in candidatos:
+                campos = self._campos[id_empleado]
+                puntuacion = sum(_puntuar(palabra, campos) for palabra in palabras)
+                if puntuacion > 0:
+                    resultados.append((id_empleado, round(puntuacion / len(palabras), 4)))
+
+        orden = lambda r: (-r[1], r[0])
+        return heapq.nsmallest(limite, resultados, key=orden) if limite else sorted(resultados, key=orden)
+
+    def __len__(self):
+        return len(self._campos)
+
+    def _candidatos(self, palabra):
+        # Palabras de hasta 3 letras están indexadas tal cual; las más largas se
+        # filtran con todos sus trigramas y se comprueba la subcadena completa
+        if len(palabra) <= 3:
+            return set(self._postings.get(palabra, ()))
+
+        listas = sorted((self._postings.get(t, set()) for t in _ngramas(palabra, 3)), key=len)
+        if not listas[0]:
+            return set()
+        ids = set(listas[0]).intersection(*listas[1:])
+        return {id_empleado for id_empleado in ids if palabra in self._textos[id_empleado]}
+
+    def _quitar(self, id_empleado):
+        for ngrama in _ngramas_texto(self._textos.pop(id_empleado)):
+            ids = self._postings.get(ngrama)
+            if ids is not None:
+                ids.discard(id_empleado)
+                if not ids:
+                    del self._postings[ngrama]
+
+
+def _ngramas_texto(texto):
+    return _ngramas(texto, 1) | _ngramas(texto, 2) | _ngramas(texto, 3)
+
+
+# Puntuación de una palabra en un empleado: coincidencia exacta del campo (3),
+# inicio de alguna palabra del campo (2) o subcadena (1), por el peso del campo
+def _puntuar(palabra, campos):
+    mejor = 0.0
+    for campo, peso in CAMPOS_BUSQUEDA.items():
+        valor = campos[campo]
+        if palabra not in valor:
+            continue
+        if valor == palabra:
+            nivel = 3
+        elif any(p.startswith(palabra) for p in valor.split()):
+            nivel = 2
+        else:
+            nivel = 1
+        mejor = max(mejor, nivel * peso)
+    return mejor
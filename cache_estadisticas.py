@@ -0,0 +1,80 @@
+import asyncio
+import time
+
+
+# Caché en memoria para resultados caros de calcular (las consultas de /estadisticas).
+# - Cada clave se recalcula como mucho una vez cada `ttl` segundos.
+# - Si varias peticiones encuentran la misma clave caducada a la vez, sólo una
+#   ejecuta la consulta y el resto espera a ese mismo resultado (single-flight).
+# - invalidar() descarta valores ya calculados y también los refrescos que
+#   estuvieran en curso, para que no se guarde un resultado anterior a la invalidación.
+class CacheEstadisticas:
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._valores = {}  # clave -> (valor, calculado_en)
+        self._en_curso = {}  # clave -> tarea que está recalculando la clave
+        self._generacion = 0
+        self._stats = {
+            'aciertos': 0,
+            'fallos': 0,
+            'refrescos': 0,
+            'esperas_compartidas': 0,
+            'errores': 0,
+            'invalidaciones': 0,
+        }
+
+    async def obtener(self, clave, calcular):
+        entrada = self._valores.get(clave)
+        if entrada is not None and time.monotonic() - entrada[1] <= self.ttl:
+            self._stats['aciertos'] += 1
+            return entrada[0]
+
+        self._stats['fallos'] += 1
+        tarea = self._en_curso.get(clave)
+        if tarea is None:
+            tarea = asyncio.ensure_future(self._refrescar(clave, calcular, self._generacion))
+            self._en_curso[clave] = tarea
+        else:
+            self._stats['esperas_compartidas'] += 1
+
+        # shield: si el cliente que lanzó el refresco se desconecta, el resto
+        # de peticiones que esperan el mismo resultado no se cancelan
+        return await asyncio.shield(tarea)
+
+    def invalidar(self, clave=None):
+        self._generacion += 1
+        self._stats['invalidaciones'] += 1
+        if clave is None:
+            self._valores.clear()
+            self._en_curso.clear()
+        else:
+            self._valores.pop(clave, None)
+            self._en_curso.pop(clave, None)
+
+    def estadisticas(self):
+        ahora = time.monotonic()
+        consultas = self._stats['aciertos'] + self._stats['fallos']
+        return {
+            'ttl': self.ttl,
+            **self._stats,
+            'tasa_aciertos': round(self._stats['aciertos'] / consultas, 4) if consultas else None,
+            'claves': {
+                clave: {'antiguedad': round(ahora - calculado_en, 2)}
+                for clave, (_, calculado_en) in self._valores.items()
+            },
+        }
+
+    async def _refrescar(self, clave, calcular, generacion):
+        try:
+            valor = await calcular()
+        except Exception:
+            self._stats['errores'] += 1
+            raise
+        finally:
+            if self._en_curso.get(clave) is asyncio.current_task():
+                del self._en_curso[clave]
+
+        self._stats['refrescos'] += 1
+        if generacion == self._generacion:
+            self._valores[clave] = (valor, time.monotonic())
+        return valor
@@ -0,0 +1,89 @@
+import time
+from collections import OrderedDict
+
+
+# Caché de dos niveles para /predict y /predict_bucket.
+# - Nivel 1 (vectores): id_candidatura -> vector de competencias, para no
+#   consultar la BD cada vez. Las competencias se modifican fuera de esta API,
+#   así que cada vector caduca a los `ttl_vectores` segundos; invalidar() lo
+#   descarta antes.
+# - Nivel 2 (predicciones): (modelo, vector) -> predicción. El modelo es su
+#   versión (p. ej. ('local', ModeloCargado.version)): tras un swap las claves
+#   nuevas no coinciden con las viejas, que salen solas por LRU. Muchas
+#   candidaturas comparten vector (notas enteras pequeñas), así que el nivel 2
+#   acierta aunque el id no se haya pedido nunca.
+# Los dos niveles son LRU con un máximo de entradas. Se usa sólo desde el bucle
+# de eventos, así que no necesita locks.
+class CachePredicciones:
+    def __init__(self, max_vectores=100000, ttl_vectores=60, max_predicciones=50000):
+        self.max_vectores = max_vectores
+        self.ttl_vectores = ttl_vectores
+        self.max_predicciones = max_predicciones
+        self._vectores = OrderedDict()  # id_candidatura -> (vector, guardado_en)
+        self._predicciones = OrderedDict()  # (modelo, bytes del vector) -> predicción
+        self._stats = {
+            'aciertos_vectores': 0,
+            'fallos_vectores': 0,
+            'aciertos_predicciones': 0,
+            'fallos_predicciones': 0,
+            'invalidaciones': 0,
+        }
+
+    def vector(self, id_candidatura):
+        entrada = self._vectores.get(id_candidatura)
+        if entrada is None or time.monotonic() - entrada[1] > self.ttl_vectores:
+            self._stats['fallos_vectores'] += 1
+            return None
+        self._vectores.move_to_end(id_candidatura)
+        self._stats['aciertos_vectores'] += 1
+        return entrada[0]
+
+    def guardar_vector(self, id_candidatura, vector):
+        # Copia de sólo lectura: quien la reciba no puede modificar la caché
+        vector = vector.copy()
+        vector.flags.writeable = False
+        self._vectores[id_candidatura] = (vector, time.monotonic())
+        self._vectores.move_to_end(id_candidatura)
+        if len(self._vectores) > self.max_vectores:
+            self._vectores.popitem(last=False)
+
+    # Devuelve la predicción de `modelo` para `vector`, calculándola con
+    # `predecir(vector)` si no está en la caché
+    def prediccion(self, modelo, vector, predecir):
+        clave = (modelo, vector.tobytes())
+        if clave in self._predicciones:
+            self._predicciones.move_to_end(clave)
+            self._stats['aciertos_predicciones'] += 1
+            return self._predicciones[clave]
+
+        self._stats['fallos_predicciones'] += 1
+        resultado = predecir(vector)
+        self._predicciones[clave] = resultado
+        if len(self._predicciones) > self.max_predicciones:
+            self._predicciones.popitem(last=False)
+        return resultado
+
+    # Sin id se vacían los dos niveles; con id sólo el vector de esa candidatura
+    def invalidar(self, id_candidatura=None):
+        self._stats['invalidaciones'] += 1
+        if id_candidatura is None:
+            self._vectores.clear()
+            self._predicciones.clear()
+        else:
+            self._vectores.pop(id_candidatura, None)
+
+    def estadisticas(self):
+        return {
+            'ttl_vectores': self.ttl_vectores,
+            'vectores': len(self._vectores),
+            'max_vectores': self.max_vectores,
+            'predicciones': len(self._predicciones),
+            'max_predicciones': self.max_predicciones,
+            **self._stats,
+            'tasa_aciertos_vectores': _tasa(self._stats['aciertos_vectores'], self._stats['fallos_vectores']),
+            'tasa_aciertos_predicciones': _tasa(self._stats['aciertos_predicciones'], self._stats['fallos_predicciones']),
+        }
+
+
+def _tasa(aciertos, fallos):
+    return round(aciertos / (aciertos + fallos), 4) if aciertos + fallos else None
@@ -0,0 +1,126 @@
+import datetime
+import os
+
+
+# Columna con la fecha de cada candidatura, usada para los filtros desde/hasta.
+# Vacía desactiva esos filtros. La API comprueba al arrancar que existe
+# (comprobar_columna_fecha) y sql/resumen_candidaturas_status.sql tiene que usar
+# la misma columna.
+COLUMNA_FECHA = os.getenv('CANDIDATURAS_COLUMNA_FECHA', 'fecha_candidatura') or None
+
+QUERY_COLUMNA_FECHA = """
+    SELECT 1 AS existe
+    FROM information_schema.columns
+    WHERE table_schema = DATABASE() AND table_name = 'candidaturas' AND column_name = %s
+"""
+
+# Tabla mantenida por triggers (ver sql/resumen_candidaturas_status.sql). Guarda
+# los id_empleado y status nulos como 0 y '' (forman parte de la clave primaria);
+# al leerla se devuelven otra vez como NULL, igual que al agrupar candidaturas.
+TABLA_RESUMEN = 'resumen_candidaturas_status'
+COLUMNAS_RESUMEN = {'id_empleado': 'NULLIF(id_empleado, 0) AS id_empleado', 'status': "NULLIF(status, '') AS status"}
+COLUMNAS_CANDIDATURAS = {'id_empleado': 'id_empleado', 'status': 'status'}
+
+
+class ColumnaFechaInexistente(Exception):
+    pass
+
+
+# Falla al arrancar si CANDIDATURAS_COLUMNA_FECHA no es una columna de
+# candidaturas, en lugar de con cada consulta que filtre por fecha
+def comprobar_columna_fecha(db):
+    if COLUMNA_FECHA is None:
+        return
+    with db.cursor() as cursor:
+        cursor.execute(QUERY_COLUMNA_FECHA, (COLUMNA_FECHA,))
+        if cursor.fetchone() is None:
+            raise ColumnaFechaInexistente(
+                f"La tabla candidaturas no tiene la columna '{COLUMNA_FECHA}'. Define CANDIDATURAS_COLUMNA_FECHA "
+                f"con su columna de fecha (o vacía para desactivar los filtros desde/hasta)."
+            )
+
+
+# Tabla, columnas, expresión de conteo y condiciones WHERE comunes a las
+# consultas de conteo. `ids_empleado` es un id o una lista de ids; `desde` y
+# `hasta` son fechas inclusivas.
+def _filtros(ids_empleado, desde, hasta, resumen):
+    condiciones = []
+    parameters = []
+
+    if isinstance(ids_empleado, int):
+        condiciones.append('id_empleado = %s')
+        parameters.append(ids_empleado)
+    elif ids_empleado is not None:
+        condiciones.append(f"id_empleado IN ({', '.join(['%s'] * len(ids_empleado))})")
+        parameters.extend(ids_empleado)
+
+    if resumen:
+        tabla, columnas, conteo = TABLA_RESUMEN, COLUMNAS_RESUMEN, 'SUM(total)'
+        if desde is not None:
+            condiciones.append('fecha >= %s')
+            parameters.append(desde)
+        if hasta is not None:
+            condiciones.append('fecha <= %s')
+            parameters.append(hasta)
+    else:
+        tabla, columnas, conteo = 'candidaturas', COLUMNAS_CANDIDATURAS, 'COUNT(*)'
+        if desde is not None:
+            condiciones.append(f'{COLUMNA_FECHA} >= %s')
+            parameters.append(desde)
+        if hasta is not None:
+            condiciones.append(f'{COLUMNA_FECHA} < %s')
+            parameters.append(hasta + datetime.timedelta(days=1))
+
+    return tabla, columnas, conteo, ' AND '.join(condiciones) or 'TRUE', parameters
+
+
+# Construye la consulta que cuenta candidaturas por status con filtros opcionales.
+# Con resumen=True se agrega sobre la tabla resumen, cuyo tamaño no depende del
+# número de candidaturas; con resumen=False se hace el GROUP BY sobre candidaturas.
+def consulta_conteo_por_status(id_empleado=None, desde=None, hasta=None, resumen=True):
+    tabla, columnas, conteo, where, parameters = _filtros(id_empleado, desde, hasta, resumen)
+    query = f"""
+        SELECT {columnas['status']}, {conteo} as count
+        FROM {tabla}
+        WHERE {where}
+        GROUP BY status
+        HAVING count > 0
+        ORDER BY count DESC
+        """
+    return query, parameters
+
+
+# Lo mismo por empleado y status para todos los empleados (o los de `ids_empleado`)
+# en una sola consulta
+def consulta_matriz_por_status(ids_empleado=None, desde=None, hasta=None, resumen=True):
+    tabla, columnas, conteo, where, parameters = _filtros(ids_empleado, desde, hasta, resumen)
+    query = f"""
+        SELECT {columnas['id_empleado']}, {columnas['status']}, {conteo} as count
+        FROM {tabla}
+        WHERE {where}
+        GROUP BY id_empleado, status
+        HAVING count > 0
+        """
+    return query, parameters
+
+
+# Convierte las filas de consulta_matriz_por_status en una matriz empleado x status:
+# los status ordenados por total de candidaturas (como /candidaturas_status), los
+# empleados por id y conteos[i][j] el número de candidaturas del empleado i en el
+# status j. Los empleados sin candidaturas no aparecen.
+def matriz_desde_filas(filas):
+    totales = {}
+    por_empleado = {}
+    for row in filas:
+        count = int(row['count'])
+        totales[row['status']] = totales.get(row['status'], 0) + count
+        por_empleado.setdefault(row['id_empleado'], {})[row['status']] = count
+
+    status = sorted(totales, key=lambda s: (-totales[s], s))
+    empleados = sorted(por_empleado)
+    return {
+        'status': status,
+        'totales': [totales[s] for s in status],
+        'empleados': empleados,
+        'conteos': [[por_empleado[e].get(s, 0) for s in status] for e in empleados],
+    }
@@ -10,6 +10,9 @@ import re
 import joblib
 from sklearn.ensemble import RandomForestClassifier
 import boto3
+from starlette.concurrency import run_in_threadpool
+from registro_modelos import RegistroModelos, FuenteS3
+from s3_local import S3Local
 
 # Cargar variables de entorno desde el archivo .env
 load_dotenv()
@@ -45,17 +48,26 @@ app.add_middleware(
     allow_headers=["*"],  # Allow all headers
 )
 
-#Conectar con S3
-
-s3_client = boto3.client(
-    's3',
-    aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
-    aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
-    region_name=os.getenv('AWS_REGION')
-)
+#Conectar con S3 (o con un directorio local si se define S3_LOCAL_DIR)
+
+if os.getenv('S3_LOCAL_DIR'):
+    s3_client = S3Local(os.getenv('S3_LOCAL_DIR'))
+else:
+    s3_client = boto3.client(
+        's3',
+        aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
+        aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
+        region_name=os.getenv('AWS_REGION')
+    )
 s3_bucket_name = 'modelosexe'
 s3_model_key = 'model_web.pkl'
 
+# Modelo del bucket en memoria; se comprueba si hay versión nueva cada MODELO_BUCKET_TTL segundos
+registro_bucket = RegistroModelos(
+    FuenteS3(s3_client, s3_bucket_name, 'model_web1.pkl'),
+    ttl=float(os.getenv('MODELO_BUCKET_TTL', '60'))
+)
+
 
 @app.get("/predict_bucket")
 async def predict_bucket(id_candidatura: int):
@@ -99,19 +111,18 @@ async def predict_bucket(id_candidatura: int):
             'Profesionalidad', 'Dominio', 'Resiliencia', 'HabilidadesSociales', 'Liderazgo', 'Colaboracion', 'Compromiso', 'Iniciativa'
         ])
 
-        # Descargar y cargar el modelo desde S3
-        model_path = 'models/model_web1.pkl'  # Ruta temporal en el sistema de archivos local
-        s3_client.download_file(s3_bucket_name, 'model_web1.pkl', model_path)
-
-        with open(model_path, 'rb') as f:
-            model = joblib.load(f)
+        # Obtener el modelo del bucket (sólo se descarga si hay una versión nueva)
+        modelo_bucket = await run_in_threadpool(registro_bucket.obtener)
 
         # Realizar la predicción
-        prediction = model.predict(input_data)
+        prediction = modelo_bucket.modelo.predict(input_data)
         result = 'Admitido' if prediction == 1 else 'Rechazado'
 
         return {"prediction": result}
 
+    except HTTPException:
+        raise
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {e}")
 
@@ -122,6 +133,17 @@ async def predict_bucket(id_candidatura: int):
 
 
 
+@app.post("/predict_bucket/reload")
+async def reload_predict_bucket():
+    try:
+        actualizado = await run_in_threadpool(registro_bucket.recargar)
+        modelo_bucket = registro_bucket.obtener()
+        return {"version": modelo_bucket.version, "actualizado": actualizado}
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al recargar el modelo desde S3: {e}")
+
+
 # Código para ejecutar el servidor Uvicorn si el script se ejecuta directamente
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,293 @@
+# Entrenamiento del modelo de /predict: lo que hacía training_modelweb.ipynb,
+# como módulo que usan tanto /retrain como la línea de comandos.
+#
+# Pipeline StandardScaler + RandomForestClassifier con búsqueda de
+# hiperparámetros por validación cruzada:
+#   - grid: todas las combinaciones de ESPACIO_PARAMETROS (lo del notebook)
+#   - random: `n_iter` combinaciones al azar de ESPACIO_PARAMETROS
+#   - halving: successive halving con el número de árboles como recurso; todas
+#     las combinaciones se evalúan con pocos árboles y sólo la mejor tercera
+#     parte pasa a la siguiente ronda, con el triple de árboles
+#   - ninguna: se entrena con PARAMETROS_POR_DEFECTO sin buscar
+# Los ajustes de cada (combinación, fold) se reparten entre procesos con joblib
+# y su puntuación se guarda en `cache_dir`: una búsqueda repetida sobre los
+# mismos datos sólo ajusta lo que no estaba ya evaluado.
+#
+#   python entrenamiento.py --metodo halving --salida models/model_web.pkl
+import argparse
+import hashlib
+import json
+import math
+import os
+import time
+from datetime import datetime, timezone
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from joblib import Parallel, delayed
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score, classification_report
+from sklearn.model_selection import ParameterGrid, ParameterSampler, StratifiedKFold, train_test_split
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+import modelo_compacto
+from inferencia import COMPETENCIAS
+
+
+METODOS_BUSQUEDA = ('halving', 'grid', 'random', 'ninguna')
+
+# Espacio de búsqueda del notebook (2 x 3 x 3 x 3 = 54 combinaciones)
+ESPACIO_PARAMETROS = {
+    'classifier__n_estimators': [100, 200],
+    'classifier__max_depth': [10, 20, None],
+    'classifier__min_samples_split': [2, 5, 10],
+    'classifier__min_samples_leaf': [1, 2, 4],
+}
+
+PARAMETROS_POR_DEFECTO = {
+    'classifier__n_estimators': 100,
+    'classifier__max_depth': None,
+    'classifier__min_samples_split': 2,
+    'classifier__min_samples_leaf': 1,
+}
+
+FOLDS = 5
+SEMILLA = 42
+
+# Successive halving: cuántas combinaciones se descartan por ronda y con
+# cuántos árboles se empieza como mínimo
+FACTOR_HALVING = 3
+MIN_ARBOLES_HALVING = 10
+
+
+def construir_pipeline(n_jobs=1):
+    return Pipeline([
+        ('scaler', StandardScaler()),
+        ('classifier', RandomForestClassifier(random_state=SEMILLA, n_jobs=n_jobs))
+    ])
+
+
+# Lee un CSV con el formato de data_modelo/candidatos_prueba.csv
+def cargar_csv(ruta):
+    df = pd.read_csv(ruta)
+    return df[COMPETENCIAS].to_numpy(dtype=float), df['admitido'].to_numpy()
+
+
+# Busca los mejores hiperparámetros y devuelve (modelo entrenado con todos los
+# datos, metadatos de la búsqueda)
+def entrenar(X, y, metodo='halving', n_jobs=-1, n_iter=20, cache_dir=None):
+    if metodo not in METODOS_BUSQUEDA:
+        raise ValueError(f"Método de búsqueda desconocido: {metodo}")
+
+    inicio = time.perf_counter()
+    X = pd.DataFrame(np.asarray(X, dtype=float), columns=COMPETENCIAS)
+    y = np.asarray(y)
+
+    # Con menos ejemplos de una clase que folds no se puede validar: sin búsqueda
+    if metodo != 'ninguna' and np.unique(y, return_counts=True)[1].min() < FOLDS:
+        metodo = 'ninguna'
+
+    busqueda = {'metodo': metodo, 'ajustes': 0, 'ajustes_en_cache': 0, 'candidatos': 1, 'puntuacion_cv': None}
+    if metodo == 'ninguna':
+        parametros = dict(PARAMETROS_POR_DEFECTO)
+    else:
+        evaluador = _Evaluador(X, y, n_jobs, cache_dir)
+        if metodo == 'grid':
+            candidatos = list(ParameterGrid(ESPACIO_PARAMETROS))
+            puntuaciones = evaluador.puntuar(candidatos)
+        elif metodo == 'random':
+            candidatos = _sin_repetir(ParameterSampler(ESPACIO_PARAMETROS, n_iter, random_state=SEMILLA))
+            puntuaciones = evaluador.puntuar(candidatos)
+        else:
+            candidatos, puntuaciones = _successive_halving(evaluador)
+
+        mejor = int(np.argmax(puntuaciones))
+        parametros = candidatos[mejor]
+        busqueda.update(
+            ajustes=evaluador.ajustes,
+            ajustes_en_cache=evaluador.en_cache,
+            candidatos=evaluador.candidatos,
+            puntuacion_cv=round(float(puntuaciones[mejor]), 4),
+        )
+    tiempo_busqueda = time.perf_counter() - inicio
+
+    modelo = construir_pipeline(n_jobs=n_jobs).set_params(**parametros)
+    modelo.fit(X, y)
+    # El modelo servido predice de uno en uno: sin procesos de joblib por llamada
+    modelo.set_params(classifier__n_jobs=None)
+
+    metadatos = {
+        'parametros': _parametros_json(parametros),
+        **busqueda,
+        'muestras': int(len(y)),
+        'positivos': int(np.sum(y)),
+        'tiempo_busqueda': round(tiempo_busqueda, 3),
+        'tiempo_total': round(time.perf_counter() - inicio, 3),
+        'entrenado_en': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'sklearn': sklearn.__version__,
+    }
+    return modelo, metadatos
+
+
+# Guarda el modelo y, al lado, su versión en formato compacto (model_web.bosque,
+# ver modelo_compacto.py) y un JSON con sus metadatos (model_web.json). Todos se
+# sustituyen con os.replace para que nunca se lean a medias.
+def guardar_modelo(modelo, ruta, metadatos):
+    try:
+        modelo_compacto.exportar(modelo, modelo_compacto.ruta_compacta(ruta))
+    except ValueError:
+        # Modelo sin formato compacto: que no quede uno anterior desfasado
+        if os.path.exists(modelo_compacto.ruta_compacta(ruta)):
+            os.remove(modelo_compacto.ruta_compacta(ruta))
+
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    joblib.dump(modelo, temporal)
+    os.replace(temporal, ruta)
+
+    ruta_metadatos = ruta_de_metadatos(ruta)
+    temporal = f"{ruta_metadatos}.{os.getpid()}.tmp"
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(metadatos, f, ensure_ascii=False, indent=2)
+    os.replace(temporal, ruta_metadatos)
+
+
+def ruta_de_metadatos(ruta):
+    return os.path.splitext(ruta)[0] + '.json'
+
+
+# Rondas de successive halving sobre el resto de parámetros de ESPACIO_PARAMETROS.
+# En la última ronda se usa el número máximo de árboles del espacio.
+# Devuelve las combinaciones de la última ronda y sus puntuaciones.
+def _successive_halving(evaluador):
+    espacio = dict(ESPACIO_PARAMETROS)
+    max_arboles = max(espacio.pop('classifier__n_estimators'))
+    candidatos = list(ParameterGrid(espacio))
+
+    rondas = max(1, math.ceil(math.log(len(candidatos), FACTOR_HALVING)))
+    for ronda in range(rondas):
+        arboles = max(MIN_ARBOLES_HALVING, max_arboles // FACTOR_HALVING ** (rondas - 1 - ronda))
+        candidatos = [{**c, 'classifier__n_estimators': arboles} for c in candidatos]
+        puntuaciones = evaluador.puntuar(candidatos)
+        if ronda == rondas - 1:
+            break
+        seguir = max(1, math.ceil(len(candidatos) / FACTOR_HALVING))
+        mejores = np.argsort(-np.asarray(puntuaciones), kind='stable')[:seguir]
+        candidatos = [candidatos[i] for i in mejores]
+    return candidatos, puntuaciones
+
+
+# Puntúa combinaciones por validación cruzada, repartiendo los ajustes entre
+# procesos y guardando la puntuación de cada (combinación, fold). Los folds son
+# siempre los mismos para unos datos dados, así que la caché vale entre métodos.
+class _Evaluador:
+    def __init__(self, X, y, n_jobs, cache_dir):
+        self.X = X
+        self.y = y
+        self.n_jobs = n_jobs
+        self.folds = list(StratifiedKFold(FOLDS, shuffle=True, random_state=SEMILLA).split(X, y))
+        self.ajustes = 0
+        self.en_cache = 0
+        self.candidatos = 0
+
+        self._ruta_cache = None
+        self._cache = {}
+        if cache_dir:
+            huella = hashlib.sha1()
+            huella.update(np.ascontiguousarray(X.to_numpy()).tobytes())
+            huella.update(np.ascontiguousarray(y).tobytes())
+            huella.update(f"{FOLDS}-{SEMILLA}-{sklearn.__version__}".encode())
+            os.makedirs(cache_dir, exist_ok=True)
+            self._ruta_cache = os.path.join(cache_dir, f"{huella.hexdigest()}.json")
+            try:
+                with open(self._ruta_cache, encoding='utf-8') as f:
+                    self._cache = json.load(f)
+            except (OSError, ValueError):
+                self._cache = {}
+
+    # Puntuación media de cada combinación
+    def puntuar(self, candidatos):
+        self.candidatos += len(candidatos)
+        tareas = [
+            (clave, parametros, fold)
+            for parametros in candidatos
+            for fold in range(len(self.folds))
+            if (clave := self._clave(parametros, fold)) not in self._cache
+        ]
+        self.en_cache += len(candidatos) * len(self.folds) - len(tareas)
+        self.ajustes += len(tareas)
+
+        if tareas:
+            puntuaciones = Parallel(n_jobs=self.n_jobs, backend='loky')(
+                delayed(_ajustar_fold)(parametros, self.X, self.y, *self.folds[fold])
+                for _, parametros, fold in tareas
+            )
+            self._cache.update({clave: p for (clave, _, _), p in zip(tareas, puntuaciones)})
+            self._guardar_cache()
+
+        return [
+            float(np.mean([self._cache[self._clave(parametros, fold)] for fold in range(len(self.folds))]))
+            for parametros in candidatos
+        ]
+
+    def _clave(self, parametros, fold):
+        return json.dumps([_parametros_json(parametros), fold], sort_keys=True)
+
+    def _guardar_cache(self):
+        if self._ruta_cache is None:
+            return
+        temporal = f"{self._ruta_cache}.{os.getpid()}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(self._cache, f)
+        os.replace(temporal, self._ruta_cache)
+
+
+def _ajustar_fold(parametros, X, y, entrenamiento, validacion):
+    modelo = construir_pipeline().set_params(**parametros)
+    modelo.fit(X.iloc[entrenamiento], y[entrenamiento])
+    return float(accuracy_score(y[validacion], modelo.predict(X.iloc[validacion])))
+
+
+def _sin_repetir(parametros):
+    vistos = {}
+    for p in parametros:
+        vistos.setdefault(json.dumps(_parametros_json(p), sort_keys=True), p)
+    return list(vistos.values())
+
+
+def _parametros_json(parametros):
+    return {k: (v.item() if isinstance(v, np.generic) else v) for k, v in sorted(parametros.items())}
+
+
+def main(args):
+    X, y = cargar_csv(args.datos)
+
+    # Como en el notebook se aparta un 20% para evaluar, salvo con --test 0
+    if args.test > 0:
+        X, X_test, y, y_test = train_test_split(X, y, test_size=args.test, stratify=y, random_state=SEMILLA)
+
+    modelo, metadatos = entrenar(X, y, metodo=args.metodo, n_jobs=args.n_jobs, n_iter=args.n_iter, cache_dir=args.cache)
+
+    if args.test > 0:
+        y_pred = modelo.predict(pd.DataFrame(X_test, columns=COMPETENCIAS))
+        metadatos['accuracy_test'] = round(float(accuracy_score(y_test, y_pred)), 4)
+        print("Reporte de clasificación:")
+        print(classification_report(y_test, y_pred))
+
+    guardar_modelo(modelo, args.salida, metadatos)
+    print(json.dumps(metadatos, ensure_ascii=False, indent=2))
+    print(f"Modelo guardado como {args.salida}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Entrena el modelo de /predict con búsqueda de hiperparámetros")
+    parser.add_argument('--datos', default='data_modelo/candidatos_prueba.csv', help="CSV con las competencias y la columna 'admitido'")
+    parser.add_argument('--salida', default='models/model_web.pkl')
+    parser.add_argument('--metodo', choices=METODOS_BUSQUEDA, default='halving')
+    parser.add_argument('--n-iter', type=int, default=20, help="combinaciones a probar con --metodo random")
+    parser.add_argument('--n-jobs', type=int, default=-1)
+    parser.add_argument('--test', type=float, default=0.2, help="fracción de los datos que se aparta para evaluar")
+    parser.add_argument('--cache', default='.cache_entrenamiento', help="directorio de la caché de folds ('' para no usarla)")
+    main(parser.parse_args())
@@ -0,0 +1,98 @@
+import pymysql
+
+
+# Columnas de empleados que se pueden modificar; un valor None deja la columna como está
+CAMPOS_ACTUALIZABLES = ['nombre_empleado', 'apellidos_empleado', 'password', 'rol', 'is_logged']
+
+# Empleado que hereda las candidaturas de los empleados eliminados
+ID_EMPLEADO_REASIGNACION = 1
+
+
+# Une los cambios pedidos por empleado conservando el orden de aparición. Si un
+# id se repite, los valores no nulos posteriores sustituyen a los anteriores
+# (en SQL un UPDATE con JOIN sólo aplicaría una de las filas, sin orden fijo).
+def combinar_cambios(empleados):
+    cambios = {}
+    for empleado in empleados:
+        valores = cambios.setdefault(empleado['id_empleado'], {})
+        for campo in CAMPOS_ACTUALIZABLES:
+            if empleado.get(campo) is not None:
+                valores[campo] = empleado[campo]
+    return cambios
+
+
+# Id entero recibido en JSON. bool es subclase de int, pero true/false no son
+# ids (se escribiría en los empleados 1 y 0)
+def es_id(valor):
+    return isinstance(valor, int) and not isinstance(valor, bool)
+
+
+def _marcadores(n):
+    return ', '.join(['%s'] * n)
+
+
+# Bloquea las filas de empleados que existen entre `ids` y las devuelve como set.
+# Con FOR UPDATE nadie puede borrarlas entre esta consulta y el commit. Las
+# conexiones del pool usan autocommit, así que antes hay que abrir la transacción
+# con db.begin(): si no, cada sentencia se confirmaría por separado y ni el
+# bloqueo ni el rollback servirían de nada.
+def _bloquear_existentes(cursor, ids):
+    cursor.execute(
+        f"SELECT id_empleado FROM empleados WHERE id_empleado IN ({_marcadores(len(ids))}) FOR UPDATE",
+        list(ids)
+    )
+    return {fila['id_empleado'] for fila in cursor.fetchall()}
+
+
+# Aplica `cambios` (id_empleado -> {campo: valor}) en una sola transacción y
+# con una sola sentencia: UPDATE con JOIN sobre una tabla derivada con una fila
+# por empleado, con COALESCE como PUT /update_empleado. Devuelve los ids que
+# existían; los demás no se tocan.
+def actualizar_empleados(db, cambios):
+    try:
+        db.begin()
+        with db.cursor() as cursor:
+            existentes = _bloquear_existentes(cursor, cambios)
+            filas = [(id_empleado, valores) for id_empleado, valores in cambios.items()
+                     if id_empleado in existentes and valores]
+            if filas:
+                primera = 'SELECT %s AS id_empleado, ' + ', '.join(f'%s AS {campo}' for campo in CAMPOS_ACTUALIZABLES)
+                siguiente = f'SELECT {_marcadores(len(CAMPOS_ACTUALIZABLES) + 1)}'
+                derivada = '\n                    UNION ALL '.join([primera] + [siguiente] * (len(filas) - 1))
+                asignaciones = ',\n                    '.join(f'e.{campo} = COALESCE(c.{campo}, e.{campo})' for campo in CAMPOS_ACTUALIZABLES)
+                parameters = []
+                for id_empleado, valores in filas:
+                    parameters.append(id_empleado)
+                    parameters.extend(valores.get(campo) for campo in CAMPOS_ACTUALIZABLES)
+                cursor.execute(f"""
+                UPDATE empleados e
+                JOIN ({derivada}) c ON c.id_empleado = e.id_empleado
+                SET {asignaciones}
+                """, parameters)
+        db.commit()
+        return existentes
+    except pymysql.MySQLError:
+        db.rollback()
+        raise
+
+
+# Elimina los empleados de `ids` que existen en una sola transacción: sus
+# candidaturas pasan a ID_EMPLEADO_REASIGNACION con un UPDATE y se borran con un
+# DELETE, sea cual sea el número de empleados. Devuelve los ids eliminados.
+def eliminar_empleados(db, ids):
+    try:
+        db.begin()
+        with db.cursor() as cursor:
+            existentes = _bloquear_existentes(cursor, ids)
+            if existentes:
+                marcadores = _marcadores(len(existentes))
+                cursor.execute(
+                    f"UPDATE candidaturas SET id_empleado = %s WHERE id_empleado IN ({marcadores})",
+                    [ID_EMPLEADO_REASIGNACION, *existentes]
+                )
+                cursor.execute(f"DELETE FROM empleados WHERE id_empleado IN ({marcadores})", list(existentes))
+        db.commit()
+        return existentes
+    except pymysql.MySQLError:
+        db.rollback()
+        raise
@@ -0,0 +1,97 @@
+import re
+
+import numpy as np
+
+
+# Rangos de edad en el orden en que se devuelven
+RANGOS_EDAD = ['19-24', '25-29', '30-34', '35-39', '40-44', '45-49', '50-54', '55-59', '60+']
+
+CASE_RANGO_EDAD = """
+            CASE
+                WHEN edad BETWEEN 19 AND 24 THEN '19-24'
+                WHEN edad BETWEEN 25 AND 29 THEN '25-29'
+                WHEN edad BETWEEN 30 AND 34 THEN '30-34'
+                WHEN edad BETWEEN 35 AND 39 THEN '35-39'
+                WHEN edad BETWEEN 40 AND 44 THEN '40-44'
+                WHEN edad BETWEEN 45 AND 49 THEN '45-49'
+                WHEN edad BETWEEN 50 AND 54 THEN '50-54'
+                WHEN edad BETWEEN 55 AND 59 THEN '55-59'
+                ELSE '60+'
+            END"""
+
+# Todos los agregados de /estadisticas/* en una sola ida y vuelta a MySQL.
+# El total de candidatos es la suma de los conteos por carrera.
+QUERY_RESUMEN = f"""
+        SELECT 'carrera' AS dimension, carrera AS clave, COUNT(*) AS count, AVG(nota_media) AS average
+        FROM candidatos
+        GROUP BY carrera
+        UNION ALL
+        SELECT 'ingles' AS dimension, nivel_ingles AS clave, COUNT(*) AS count, NULL AS average
+        FROM candidatos
+        GROUP BY nivel_ingles
+        UNION ALL
+        SELECT 'edad' AS dimension, {CASE_RANGO_EDAD} AS clave, COUNT(*) AS count, NULL AS average
+        FROM candidatos
+        GROUP BY clave
+        """
+
+SIN_DATOS = {"message": "No hay datos disponibles"}
+
+
+def formatear_carrera(carrera):
+    return re.sub(r'\s+', '_', carrera).lower()
+
+
+# Las funciones siguientes reciben filas {clave, count[, average]} y devuelven
+# exactamente lo que responde cada ruta de /estadisticas
+
+def porcentajes_carrera(filas, total):
+    if total == 0:
+        return SIN_DATOS
+    return {
+        formatear_carrera(row['clave']): round((row['count'] / total) * 100, 2)
+        for row in filas
+    }
+
+
+def notas_por_carrera(filas):
+    # Redondear la nota media a 2 decimales si no es None
+    return {
+        formatear_carrera(row['clave']): round(row['average'], 2) if row['average'] is not None else None
+        for row in filas
+    }
+
+
+def porcentajes_ingles(filas, total):
+    if total == 0:
+        return SIN_DATOS
+    return {
+        row['clave']: round((row['count'] / total) * 100, 2)
+        for row in filas
+    }
+
+
+def porcentajes_edad(filas, total):
+    if total == 0:
+        return SIN_DATOS
+    # Mismo redondeo que pandas (np.round) y mismo orden que el ORDER BY original
+    filas = sorted(filas, key=lambda row: RANGOS_EDAD.index(row['clave']))
+    return {
+        row['clave']: float(np.round((row['count'] / total) * 100, 2))
+        for row in filas
+    }
+
+
+# Convierte el resultado de QUERY_RESUMEN en las respuestas de las cuatro rutas
+def resumen_desde_filas(filas):
+    por_dimension = {'carrera': [], 'ingles': [], 'edad': []}
+    for row in filas:
+        por_dimension[row['dimension']].append(row)
+
+    total = sum(row['count'] for row in por_dimension['carrera'])
+    return {
+        'carrera': porcentajes_carrera(por_dimension['carrera'], total),
+        'notas': notas_por_carrera(por_dimension['carrera']),
+        'ingles': porcentajes_ingles(por_dimension['ingles'], total),
+        'edad': porcentajes_edad(por_dimension['edad'], total),
+    }
@@ -0,0 +1,276 @@
+import csv
+import io
+import threading
+from collections import namedtuple
+
+import pymysql
+
+from metricas import metricas
+from respuestas import serializar
+
+
+metricas.contador('export_filas_total', "Filas enviadas por /export")
+
+# Tablas exportables y columnas que no se exportan nunca. Las columnas de cada
+# exportación y su tipo se leen de information_schema al abrirla, así siguen a la
+# tabla real (fecha_actualizacion, p. ej., sólo existe si se han aplicado las
+# migraciones de sql/).
+TABLAS_EXPORTACION = ('empleados', 'candidaturas', 'competencias')
+COLUMNAS_EXCLUIDAS = {'empleados': {'password'}}
+
+# Columna que filtra updated_since
+COLUMNA_FECHA_EXPORTACION = 'fecha_actualizacion'
+
+# Formato -> tipo de contenido
+FORMATOS_EXPORTACION = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+# Filas por lectura del cursor y filas por row group de Parquet: la memoria de
+# una exportación depende de estos dos valores y no del tamaño de la tabla
+FILAS_LOTE = 5000
+FILAS_GRUPO_PARQUET = 100000
+
+# Segundos que MySQL espera a que el cliente lea antes de cortar la conexión:
+# con un cursor de servidor el ritmo lo marca quien descarga la exportación
+ESPERA_ESCRITURA_MYSQL = 600
+
+
+class ExportacionesAgotadas(Exception):
+    pass
+
+
+def parquet_disponible():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+QUERY_COLUMNAS = """
+    SELECT column_name AS columna, data_type AS tipo, numeric_precision AS precision_, numeric_scale AS escala
+    FROM information_schema.columns
+    WHERE table_schema = DATABASE() AND table_name = %s
+    ORDER BY ordinal_position
+"""
+
+
+# Columna exportable: nombre y tipo de MySQL (data_type, precisión y escala)
+Columna = namedtuple('Columna', ['nombre', 'tipo', 'precision', 'escala'])
+
+
+# Columnas exportables de `tabla` en la base de datos, en su orden
+def leer_columnas(cursor, tabla):
+    cursor.execute(QUERY_COLUMNAS, (tabla,))
+    excluidas = COLUMNAS_EXCLUIDAS.get(tabla, set())
+    return [Columna(f['columna'], f['tipo'].lower(), f['precision_'], f['escala'])
+            for f in cursor.fetchall() if f['columna'] not in excluidas]
+
+
+# Columnas pedidas (texto separado por comas) validadas contra las de la tabla;
+# todas si no se indica. ValueError si alguna no existe o si se filtra por fecha
+# y la tabla no tiene COLUMNA_FECHA_EXPORTACION.
+def columnas_exportacion(tabla, disponibles, columnas=None, desde=None):
+    if not disponibles:
+        raise ValueError(f"La tabla {tabla} no existe en la base de datos")
+    por_nombre = {c.nombre: c for c in disponibles}
+    if desde is not None and COLUMNA_FECHA_EXPORTACION not in por_nombre:
+        raise ValueError(f"{tabla} no tiene la columna {COLUMNA_FECHA_EXPORTACION} para updated_since "
+                         f"(falta aplicar las migraciones de sql/)")
+    if not columnas:
+        return list(disponibles)
+    pedidas = list(dict.fromkeys(c.strip() for c in columnas.split(',') if c.strip()))
+    desconocidas = [c for c in pedidas if c not in por_nombre]
+    if desconocidas or not pedidas:
+        raise ValueError(f"Columnas no válidas para {tabla}: {', '.join(desconocidas) or columnas}. "
+                         f"Disponibles: {', '.join(por_nombre)}")
+    return [por_nombre[c] for c in pedidas]
+
+
+def consulta_exportacion(tabla, columnas, desde=None):
+    query = f"SELECT {', '.join(c.nombre for c in columnas)} FROM {tabla}"
+    parameters = []
+    if desde is not None:
+        query += f" WHERE {COLUMNA_FECHA_EXPORTACION} >= %s"
+        parameters.append(desde)
+    return query, parameters
+
+
+# Abre exportaciones en streaming. Cada una usa su propia conexión (fuera del
+# pool, para no dejar sin conexiones a las demás rutas mientras dura) con un
+# cursor de servidor (SSDictCursor): MySQL envía las filas según se leen y
+# nunca hay más de FILAS_LOTE en memoria. Como mucho hay `max_concurrentes`
+# abiertas a la vez.
+class Exportador:
+    def __init__(self, config, max_concurrentes=2, filas_lote=FILAS_LOTE):
+        self.config = config
+        self.filas_lote = filas_lote
+        self._huecos = threading.BoundedSemaphore(max_concurrentes)
+
+    # Lee las columnas de la tabla, valida las pedidas (`columnas`, texto separado
+    # por comas) y ejecuta la consulta. Devuelve la Exportacion ya lista para leer,
+    # así los errores (ValueError o de MySQL) salen antes de empezar a responder.
+    # Bloqueante: se llama desde un hilo.
+    def abrir(self, tabla, columnas=None, desde=None):
+        if not self._huecos.acquire(blocking=False):
+            raise ExportacionesAgotadas("Demasiadas exportaciones en curso")
+        db = None
+        try:
+            db = pymysql.connect(**{**self.config, 'cursorclass': pymysql.cursors.SSDictCursor})
+            cursor = db.cursor()
+            cursor.execute("SET SESSION net_write_timeout = %s", (ESPERA_ESCRITURA_MYSQL,))
+            columnas = columnas_exportacion(tabla, leer_columnas(cursor, tabla), columnas, desde)
+            cursor.execute(*consulta_exportacion(tabla, columnas, desde))
+        except BaseException:
+            if db is not None:
+                db.close()
+            self._huecos.release()
+            raise
+        return Exportacion(db, cursor, tabla, columnas, self.filas_lote, self._huecos.release)
+
+
+# Iterador de lotes de filas de una exportación abierta. Se cierra al llegar
+# al final, con cerrar() o al destruirse (p. ej. si el cliente se desconecta y
+# la respuesta se abandona sin llegar a leerla).
+class Exportacion:
+    def __init__(self, db, cursor, tabla, columnas, filas_lote, al_cerrar):
+        self.tabla = tabla
+        self.columnas = columnas  # [Columna]
+        self._db = db
+        self._cursor = cursor
+        self._filas_lote = filas_lote
+        self._al_cerrar = al_cerrar
+        self._terminada = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._db is None:
+            raise StopIteration
+        filas = self._cursor.fetchmany(self._filas_lote)
+        if not filas:
+            self._terminada = True
+            self.cerrar()
+            raise StopIteration
+        metricas.incrementar('export_filas_total', len(filas), tabla=self.tabla)
+        return filas
+
+    def cerrar(self):
+        db, self._db = self._db, None
+        if db is None:
+            return
+        try:
+            # Cerrar el cursor de servidor a medias leería todas las filas
+            # pendientes; cerrando la conexión MySQL deja de enviarlas
+            if self._terminada:
+                self._cursor.close()
+            db.close()
+        except pymysql.MySQLError:
+            pass
+        finally:
+            self._al_cerrar()
+
+    def __del__(self):
+        self.cerrar()
+
+
+def ndjson(exportacion):
+    try:
+        for filas in exportacion:
+            yield b''.join(serializar(fila) + b'\n' for fila in filas)
+    finally:
+        exportacion.cerrar()
+
+
+def csv_(exportacion):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, lineterminator='\n')
+    nombres = [c.nombre for c in exportacion.columnas]
+    escritor.writerow(nombres)
+    try:
+        for filas in exportacion:
+            escritor.writerows([fila[c] for c in nombres] for fila in filas)
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode('utf-8')
+    finally:
+        exportacion.cerrar()
+
+
+# Destino de ParquetWriter que guarda lo escrito hasta que se entrega
+class _Sumidero(io.RawIOBase):
+    def __init__(self):
+        self._partes = []
+        self._posicion = 0
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        self._posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self._posicion
+
+    def vaciar(self):
+        datos, self._partes = b''.join(self._partes), []
+        return datos
+
+
+# Tipo de Arrow para una columna según su tipo en MySQL: DECIMAL conserva su
+# precisión y escala (hasta 65 dígitos en MySQL, 38 en decimal128); los tipos
+# que no aparecen aquí se exportan como texto
+def tipo_arrow(pa, columna):
+    if columna.tipo in ('tinyint', 'smallint', 'mediumint', 'int', 'integer', 'bigint', 'year'):
+        return pa.int64()
+    if columna.tipo == 'decimal':
+        decimal = pa.decimal128 if columna.precision <= 38 else pa.decimal256
+        return decimal(columna.precision, columna.escala)
+    if columna.tipo in ('float', 'double', 'real'):
+        return pa.float64()
+    if columna.tipo in ('datetime', 'timestamp'):
+        return pa.timestamp('us')
+    if columna.tipo == 'date':
+        return pa.date32()
+    if columna.tipo == 'time':
+        return pa.duration('us')
+    if columna.tipo in ('binary', 'varbinary', 'tinyblob', 'blob', 'mediumblob', 'longblob', 'bit'):
+        return pa.binary()
+    return pa.string()
+
+
+# Parquet por row groups de FILAS_GRUPO_PARQUET filas: cada uno se entrega en
+# cuanto se escribe. Necesita pyarrow (ver parquet_disponible()).
+def parquet(exportacion, filas_grupo=FILAS_GRUPO_PARQUET):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    esquema = pa.schema([(c.nombre, tipo_arrow(pa, c)) for c in exportacion.columnas])
+
+    sumidero = _Sumidero()
+    escritor = pq.ParquetWriter(sumidero, esquema, compression='snappy')
+    pendientes = []
+    try:
+        for filas in exportacion:
+            pendientes.extend(filas)
+            if len(pendientes) >= filas_grupo:
+                escritor.write_table(pa.Table.from_pylist(pendientes, schema=esquema))
+                pendientes = []
+                yield sumidero.vaciar()
+        if pendientes:
+            escritor.write_table(pa.Table.from_pylist(pendientes, schema=esquema))
+        escritor.close()
+        yield sumidero.vaciar()
+    finally:
+        exportacion.cerrar()
+
+
+GENERADORES_EXPORTACION = {'ndjson': ndjson, 'csv': csv_, 'parquet': parquet}
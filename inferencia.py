@@ -0,0 +1,159 @@
+import numpy as np
+
+
+# Competencias en el orden de columnas con el que se entrena el modelo
+COMPETENCIAS = ['Profesionalidad', 'Dominio', 'Resiliencia', 'HabilidadesSociales', 'Liderazgo', 'Colaboracion', 'Compromiso', 'Iniciativa']
+_POSICION = {nombre: i for i, nombre in enumerate(COMPETENCIAS)}
+
+
+# Pivota filas de competencias (id_candidatura, nombre_competencia, nota) a una
+# matriz con una fila por id en el orden de `ids`. Las competencias que faltan
+# quedan a 0, igual que en /predict. Devuelve también qué ids tenían alguna fila.
+def matriz_competencias(filas, ids):
+    fila_de = {id_candidatura: i for i, id_candidatura in enumerate(ids)}
+    matriz = np.zeros((len(ids), len(COMPETENCIAS)))
+    encontrados = np.zeros(len(ids), dtype=bool)
+
+    for fila in filas:
+        i = fila_de.get(fila['id_candidatura'])
+        if i is None:
+            continue
+        encontrados[i] = True
+        j = _POSICION.get(fila['nombre_competencia'])
+        if j is not None:
+            matriz[i, j] = fila['nota']
+
+    return matriz, encontrados
+
+
+# Vector de entrada para una candidatura a partir de sus filas de competencias
+# (nombre_competencia, nota), en el orden de COMPETENCIAS y con 0 si falta alguna
+def vector_competencias(filas):
+    vector = np.zeros(len(COMPETENCIAS))
+    for fila in filas:
+        j = _POSICION.get(fila['nombre_competencia'])
+        if j is not None:
+            vector[j] = fila['nota']
+    return vector
+
+
+# Camino rápido de inferencia para el modelo cargado.
+# Todo lo que sklearn revisaría en cada llamada (orden de columnas, pasos del
+# pipeline) se comprueba una sola vez aquí; después se predice directamente sobre
+# arrays de NumPy, sin construir DataFrames.
+# Con aplanar=True el bosque se evalúa con BosqueAplanado en lugar de sklearn.
+class PredictorRapido:
+    def __init__(self, modelo, aplanar=False):
+        nombres = getattr(modelo, 'feature_names_in_', None)
+        if nombres is not None and list(nombres) != COMPETENCIAS:
+            raise ValueError(f"El modelo espera las columnas {list(nombres)} y no {COMPETENCIAS}")
+
+        pasos = getattr(modelo, 'steps', None)
+        final = pasos[-1][1] if pasos else modelo
+
+        # Sólo se sabe reproducir un StandardScaler; con cualquier otro paso
+        # previo se usa el modelo completo de sklearn
+        self._media = None
+        self._escala = None
+        self._modelo_completo = None
+        previos = [paso for _, paso in pasos[:-1]] if pasos else []
+        if len(previos) == 1 and type(previos[0]).__name__ == 'StandardScaler':
+            escalador = previos[0]
+            self._media = escalador.mean_ if escalador.with_mean else np.zeros(len(COMPETENCIAS))
+            self._escala = escalador.scale_ if escalador.with_std else np.ones(len(COMPETENCIAS))
+        elif previos:
+            self._modelo_completo = modelo
+
+        self.classes_ = final.classes_
+        self._final = final
+        self._con_nombres = getattr(final, 'feature_names_in_', None) is not None
+        self._bosque = None
+        if aplanar and self._modelo_completo is None and hasattr(final, 'estimators_'):
+            self._bosque = BosqueAplanado.desde_bosque(final)
+
+    def predecir_proba(self, X):
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+
+        if self._modelo_completo is not None:
+            import pandas as pd
+            return self._modelo_completo.predict_proba(pd.DataFrame(X, columns=COMPETENCIAS))
+
+        if self._media is not None:
+            X = (X - self._media) / self._escala
+
+        if self._bosque is not None:
+            return self._bosque.predecir_proba(X)
+
+        if self._con_nombres:
+            # El orden de columnas ya se validó al cargar el modelo
+            import warnings
+            with warnings.catch_warnings():
+                warnings.filterwarnings('ignore', message='X does not have valid feature names')
+                return self._final.predict_proba(X)
+        return self._final.predict_proba(X)
+
+    # Devuelve la clase predicha: un escalar si X es un único vector, un array si es una matriz
+    def predecir(self, X):
+        prediccion = self.classes_[self.predecir_proba(X).argmax(axis=1)]
+        return prediccion[0] if np.ndim(X) == 1 else prediccion
+
+
+# Bosque de árboles de decisión aplanado en arrays contiguos.
+# Los nodos de todos los árboles se concatenan y los índices de hijos se
+# desplazan, así se recorren todos los árboles a la vez con operaciones
+# vectorizadas (una por nivel de profundidad) en lugar de un bucle por árbol.
+class BosqueAplanado:
+    def __init__(self, izquierda, derecha, caracteristica, umbral, valores, raices, clases):
+        self.izquierda = izquierda
+        self.derecha = derecha
+        self.caracteristica = caracteristica
+        self.umbral = umbral
+        self.valores = valores
+        self.raices = raices
+        self.classes_ = clases
+
+    @classmethod
+    def desde_bosque(cls, bosque):
+        izquierda, derecha, caracteristica, umbral, valores, raices = [], [], [], [], [], []
+        desplazamiento = 0
+        for arbol in bosque.estimators_:
+            t = arbol.tree_
+            hoja = t.children_left == -1
+            izquierda.append(np.where(hoja, -1, t.children_left + desplazamiento))
+            derecha.append(np.where(hoja, -1, t.children_right + desplazamiento))
+            caracteristica.append(np.where(hoja, 0, t.feature))
+            umbral.append(t.threshold)
+            # Proporción de cada clase en el nodo (igual que DecisionTreeClassifier.predict_proba)
+            valor = t.value[:, 0, :]
+            valores.append(valor / valor.sum(axis=1, keepdims=True))
+            raices.append(desplazamiento)
+            desplazamiento += t.node_count
+
+        return cls(
+            np.concatenate(izquierda).astype(np.int32),
+            np.concatenate(derecha).astype(np.int32),
+            np.concatenate(caracteristica).astype(np.int32),
+            np.concatenate(umbral).astype(np.float64),
+            np.concatenate(valores).astype(np.float64),
+            np.asarray(raices, dtype=np.int32),
+            bosque.classes_,
+        )
+
+    def predecir_proba(self, X):
+        # sklearn compara en float32, así que se redondea igual para obtener los mismos cortes
+        X = np.atleast_2d(np.asarray(X, dtype=np.float32))
+        filas = np.arange(len(X))[:, None]
+        nodos = np.repeat(self.raices[None, :], len(X), axis=0)
+
+        while True:
+            izquierda = self.izquierda[nodos]
+            internos = izquierda != -1
+            if not internos.any():
+                break
+            va_izquierda = X[filas, self.caracteristica[nodos]] <= self.umbral[nodos]
+            nodos = np.where(internos, np.where(va_izquierda, izquierda, self.derecha[nodos]), nodos)
+
+        return self.valores[nodos].mean(axis=1)
+
+    def predecir(self, X):
+        return self.classes_[self.predecir_proba(X).argmax(axis=1)]
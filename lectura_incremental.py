@@ -0,0 +1,35 @@
+from datetime import timedelta
+
+import numpy as np
+
+
+# Piezas comunes de las copias en memoria que se refrescan leyendo sólo las filas
+# cambiadas desde una marca (reentrenamiento.extraer_incremental y
+# analitica.leer_candidatos)
+
+# Se vuelve a leer lo modificado en los segundos anteriores a la marca, por si
+# alguna transacción que empezó antes se confirmó después de tomarla
+MARGEN_MARCA = timedelta(seconds=60)
+
+
+# Hora de la BD hasta la que queda al día lo que se lea a continuación
+def marca_bd(db):
+    with db.cursor() as cursor:
+        cursor.execute("SELECT NOW() AS ahora")
+        return cursor.fetchone()['ahora']
+
+
+# Número de filas y suma de los ids de `tabla`. La lectura incremental no ve los
+# borrados: se detectan comparando los dos valores con la copia fusionada, aunque
+# se hayan compensado con inserciones que tampoco vio (el COUNT solo no cambiaría).
+def query_totales(tabla, columna_id, where='TRUE'):
+    return f"SELECT COUNT(*) AS total, COALESCE(SUM({columna_id}), 0) AS suma_ids FROM {tabla} WHERE {where}"
+
+
+# True si la tabla tiene las mismas filas que `ids` (array de NumPy) según una
+# consulta de query_totales; si no, hay que hacer una lectura completa
+def mismas_filas(db, query, params, ids):
+    with db.cursor() as cursor:
+        cursor.execute(query, params)
+        totales = cursor.fetchone()
+    return totales['total'] == len(ids) and int(totales['suma_ids']) == int(ids.sum(dtype=np.int64))
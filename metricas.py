@@ -0,0 +1,203 @@
+import cProfile
+import io
+import pstats
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+
+
+# Límites (segundos) de los buckets de los histogramas de latencia
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Longitud máxima del texto de una consulta SQL usado como etiqueta
+LONGITUD_MAXIMA_SQL = 200
+
+_LISTA_MARCADORES = re.compile(r'\(\s*%s(?:\s*,\s*%s)+\s*\)')
+_UNION_MARCADORES = re.compile(r'(?:\s+UNION ALL SELECT %s(?:\s*,\s*%s)*)+')
+
+
+# Métricas en memoria del proceso con salida en el formato de texto de
+# Prometheus. Hay contadores e histogramas, cada uno con etiquetas.
+# observar() e incrementar() se llaman desde los hilos de la BD, así que todo
+# pasa por un lock (una operación muy corta por observación).
+class RegistroMetricas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._definiciones = {}  # nombre -> (tipo, ayuda, buckets)
+        self._series = {}  # nombre -> {etiquetas: valor o [cuentas por bucket, suma, total]}
+
+    def histograma(self, nombre, ayuda, buckets=BUCKETS):
+        self._definir(nombre, 'histogram', ayuda, tuple(buckets))
+
+    def contador(self, nombre, ayuda):
+        self._definir(nombre, 'counter', ayuda, None)
+
+    def observar(self, nombre, valor, **etiquetas):
+        buckets = self._definiciones[nombre][2]
+        clave = tuple(sorted(etiquetas.items()))
+        with self._lock:
+            serie = self._series[nombre].get(clave)
+            if serie is None:
+                serie = self._series[nombre][clave] = [[0] * (len(buckets) + 1), 0.0, 0]
+            serie[0][bisect_left(buckets, valor)] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def incrementar(self, nombre, valor=1, **etiquetas):
+        clave = tuple(sorted(etiquetas.items()))
+        with self._lock:
+            series = self._series[nombre]
+            series[clave] = series.get(clave, 0) + valor
+
+    # Observa en el histograma `nombre` lo que tarda el bloque
+    @contextmanager
+    def medir(self, nombre, **etiquetas):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(nombre, time.perf_counter() - inicio, **etiquetas)
+
+    def exportar(self):
+        lineas = []
+        with self._lock:
+            for nombre, (tipo, ayuda, buckets) in self._definiciones.items():
+                lineas.append(f"# HELP {nombre} {ayuda}")
+                lineas.append(f"# TYPE {nombre} {tipo}")
+                for clave, serie in self._series[nombre].items():
+                    if tipo == 'counter':
+                        lineas.append(f"{nombre}{_etiquetas(clave)} {_numero(serie)}")
+                        continue
+                    cuentas, suma, total = serie
+                    acumulado = 0
+                    for limite, cuenta in zip(buckets + (float('inf'),), cuentas):
+                        acumulado += cuenta
+                        le = '+Inf' if limite == float('inf') else _numero(limite)
+                        lineas.append(f"{nombre}_bucket{_etiquetas(clave + (('le', le),))} {acumulado}")
+                    lineas.append(f"{nombre}_sum{_etiquetas(clave)} {_numero(suma)}")
+                    lineas.append(f"{nombre}_count{_etiquetas(clave)} {total}")
+        return '\n'.join(lineas) + '\n'
+
+    def _definir(self, nombre, tipo, ayuda, buckets):
+        with self._lock:
+            if nombre not in self._definiciones:
+                self._definiciones[nombre] = (tipo, ayuda, buckets)
+                self._series[nombre] = {}
+
+
+def _etiquetas(clave):
+    if not clave:
+        return ''
+    pares = ','.join(f'{nombre}="{_escapar(valor)}"' for nombre, valor in clave)
+    return '{' + pares + '}'
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+# Texto de una consulta SQL para usarlo como etiqueta: espacios colapsados y
+# las listas IN (%s, %s, ...) y las filas UNION ALL SELECT %s, ... de longitud
+# variable reducidas a una sola forma
+def normalizar_sql(query):
+    texto = ' '.join(query.split())
+    texto = _LISTA_MARCADORES.sub('(%s, ...)', texto)
+    texto = _UNION_MARCADORES.sub(' UNION ALL SELECT ...', texto)
+    return texto[:LONGITUD_MAXIMA_SQL]
+
+
+# Registro del proceso, compartido por todos los módulos (como el REGISTRY de prometheus_client)
+metricas = RegistroMetricas()
+
+
+# Perfilado por muestreo: una de cada `cada` peticiones se ejecuta con cProfile
+# (0 lo desactiva) y se guardan las `guardar` últimas, con las `lineas`
+# funciones de más tiempo acumulado. Como cProfile sólo admite un perfil activo
+# por hilo, si ya hay una petición perfilándose la siguiente muestra se salta.
+# El perfil cubre el hilo del bucle de eventos: las consultas a la BD aparecen
+# como espera (su tiempo está en db_consulta_segundos).
+class PerfiladoMuestreado:
+    def __init__(self, cada=0, guardar=20, lineas=30):
+        self.cada = cada
+        self.lineas = lineas
+        self._perfiles = deque(maxlen=guardar)
+        self._contador = 0
+        self._activo = False
+
+    def configurar(self, cada):
+        self.cada = max(0, int(cada))
+        self._contador = 0
+
+    def iniciar(self):
+        if not self.cada or self._activo:
+            return None
+        self._contador += 1
+        if self._contador < self.cada:
+            return None
+        self._contador = 0
+        perfil = cProfile.Profile()
+        try:
+            perfil.enable()
+        except ValueError:
+            # Otro perfilador activo en este hilo
+            return None
+        self._activo = True
+        return perfil
+
+    def terminar(self, perfil, peticion, duracion):
+        perfil.disable()
+        self._activo = False
+        salida = io.StringIO()
+        pstats.Stats(perfil, stream=salida).sort_stats('cumulative').print_stats(self.lineas)
+        self._perfiles.append({
+            'peticion': peticion,
+            'duracion': round(duracion, 6),
+            'en': time.time(),
+            'perfil': salida.getvalue(),
+        })
+
+    def perfiles(self):
+        return list(self._perfiles)
+
+
+metricas.histograma('http_peticion_segundos', "Duración de las peticiones HTTP por ruta")
+
+
+# Middleware ASGI que mide cada petición HTTP por método, plantilla de ruta
+# (/retrain/{job_id}, no el id concreto) y código de respuesta, y aplica el
+# perfilado por muestreo. Es ASGI puro para no alterar las respuestas en streaming.
+class MiddlewareMetricas:
+    def __init__(self, app, perfilado=None):
+        self.app = app
+        self.perfilado = perfilado
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def enviar(mensaje):
+            nonlocal status
+            if mensaje['type'] == 'http.response.start':
+                status = mensaje['status']
+            await send(mensaje)
+
+        perfil = self.perfilado.iniciar() if self.perfilado is not None else None
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            duracion = time.perf_counter() - inicio
+            ruta = getattr(scope.get('route'), 'path', None) or 'sin_ruta'
+            metricas.observar('http_peticion_segundos', duracion, metodo=scope['method'], ruta=ruta, status=status)
+            if perfil is not None:
+                self.perfilado.terminar(perfil, f"{scope['method']} {scope['path']}", duracion)
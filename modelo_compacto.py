@@ -0,0 +1,149 @@
+import json
+import os
+
+import numpy as np
+
+from inferencia import COMPETENCIAS, BosqueAplanado
+
+
+# Formato compacto del modelo de /predict: el bosque aplanado (ver
+# BosqueAplanado) y el StandardScaler como arrays de NumPy en un único fichero
+# que se abre con mmap. Cargar no deserializa objetos de sklearn y los
+# procesos que abren el mismo fichero comparten sus páginas en memoria.
+#
+# Estructura del fichero:
+#   MAGIA | longitud de la cabecera (uint64 little endian) | cabecera JSON |
+#   arrays, cada uno alineado a ALINEACION bytes
+# La cabecera guarda dtype, forma y posición de cada array (contada desde el
+# primer múltiplo de ALINEACION tras la cabecera), las clases y las columnas de entrada.
+MAGIA = b'BOSQUE01'
+ALINEACION = 64
+EXTENSION = '.bosque'
+
+
+# Ruta del fichero compacto que acompaña a un modelo (model_web.pkl -> model_web.bosque)
+def ruta_compacta(ruta_modelo):
+    return os.path.splitext(ruta_modelo)[0] + EXTENSION
+
+
+# Devuelve la ruta del fichero compacto de un modelo guardado con joblib y lo
+# (re)genera si no existe o es más antiguo que el modelo
+def asegurar(ruta_modelo):
+    ruta = ruta_compacta(ruta_modelo)
+    if not os.path.exists(ruta) or os.path.getmtime(ruta) < os.path.getmtime(ruta_modelo):
+        import joblib
+        exportar(joblib.load(ruta_modelo), ruta)
+    return ruta
+
+
+# Escribe el modelo (RandomForestClassifier o Pipeline StandardScaler +
+# RandomForestClassifier) en formato compacto. Como los demás artefactos, se
+# escribe con otro nombre y se sustituye con os.replace.
+def exportar(modelo, ruta):
+    pasos = getattr(modelo, 'steps', None)
+    bosque = pasos[-1][1] if pasos else modelo
+    previos = [paso for _, paso in pasos[:-1]] if pasos else []
+    if not hasattr(bosque, 'estimators_') or not hasattr(bosque, 'classes_'):
+        raise ValueError("Sólo se pueden exportar bosques de clasificación")
+    if len(previos) > 1 or (previos and type(previos[0]).__name__ != 'StandardScaler'):
+        raise ValueError("Sólo se puede exportar un StandardScaler antes del bosque")
+
+    nombres = getattr(modelo, 'feature_names_in_', None)
+    if nombres is not None and list(nombres) != COMPETENCIAS:
+        raise ValueError(f"El modelo espera las columnas {list(nombres)} y no {COMPETENCIAS}")
+
+    aplanado = BosqueAplanado.desde_bosque(bosque)
+    arrays = {
+        'izquierda': aplanado.izquierda,
+        'derecha': aplanado.derecha,
+        'caracteristica': aplanado.caracteristica.astype(np.uint8 if len(COMPETENCIAS) < 256 else np.int32),
+        'umbral': _umbral_float32(aplanado.umbral),
+        'valores': aplanado.valores,
+        'raices': aplanado.raices,
+    }
+    if previos:
+        escalador = previos[0]
+        arrays['media'] = np.asarray(escalador.mean_ if escalador.with_mean else np.zeros(len(COMPETENCIAS)), dtype=np.float64)
+        arrays['escala'] = np.asarray(escalador.scale_ if escalador.with_std else np.ones(len(COMPETENCIAS)), dtype=np.float64)
+
+    cabecera = {
+        'competencias': COMPETENCIAS,
+        'clases': np.asarray(bosque.classes_).tolist(),
+        'arrays': {},
+    }
+    posicion = 0
+    for nombre, a in arrays.items():
+        cabecera['arrays'][nombre] = {'dtype': a.dtype.str, 'forma': list(a.shape), 'posicion': posicion}
+        posicion = _alinear(posicion + a.nbytes)
+    texto = json.dumps(cabecera).encode()
+    inicio_datos = _alinear(len(MAGIA) + 8 + len(texto))
+
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, 'wb') as f:
+        f.write(MAGIA)
+        f.write(len(texto).to_bytes(8, 'little'))
+        f.write(texto)
+        for nombre, a in arrays.items():
+            f.write(b'\0' * (inicio_datos + cabecera['arrays'][nombre]['posicion'] - f.tell()))
+            f.write(np.ascontiguousarray(a).tobytes())
+    os.replace(temporal, ruta)
+
+
+# Abre un modelo compacto. `origen` es una ruta o un fichero abierto en binario.
+def cargar(origen):
+    mapa = np.memmap(origen, dtype=np.uint8, mode='r')
+    if bytes(mapa[:len(MAGIA)]) != MAGIA:
+        raise ValueError("El fichero no es un modelo compacto")
+
+    longitud = int.from_bytes(bytes(mapa[len(MAGIA):len(MAGIA) + 8]), 'little')
+    inicio = len(MAGIA) + 8
+    cabecera = json.loads(bytes(mapa[inicio:inicio + longitud]))
+    inicio_datos = _alinear(inicio + longitud)
+    if cabecera['competencias'] != COMPETENCIAS:
+        raise ValueError(f"El modelo espera las columnas {cabecera['competencias']} y no {COMPETENCIAS}")
+
+    arrays = {}
+    for nombre, info in cabecera['arrays'].items():
+        dtype = np.dtype(info['dtype'])
+        posicion = inicio_datos + info['posicion']
+        tamano = int(np.prod(info['forma'])) * dtype.itemsize
+        arrays[nombre] = mapa[posicion:posicion + tamano].view(dtype).reshape(info['forma'])
+
+    return ModeloCompacto(arrays, np.asarray(cabecera['clases']))
+
+
+# Modelo cargado desde el formato compacto. Tiene la misma interfaz que
+# PredictorRapido (predecir_proba, predecir, classes_) y da los mismos resultados
+# que el modelo de sklearn del que se exportó.
+class ModeloCompacto:
+    def __init__(self, arrays, clases):
+        self.classes_ = clases
+        self._media = arrays.get('media')
+        self._escala = arrays.get('escala')
+        self._bosque = BosqueAplanado(
+            arrays['izquierda'], arrays['derecha'], arrays['caracteristica'],
+            arrays['umbral'], arrays['valores'], arrays['raices'], clases
+        )
+
+    def predecir_proba(self, X):
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        if self._media is not None:
+            X = (X - self._media) / self._escala
+        return self._bosque.predecir_proba(X)
+
+    def predecir(self, X):
+        prediccion = self.classes_[self.predecir_proba(X).argmax(axis=1)]
+        return prediccion[0] if np.ndim(X) == 1 else prediccion
+
+
+# Umbrales en float32 sin cambiar ningún corte: las entradas se comparan en
+# float32, y para un x float32 "x <= t" equivale a "x <= mayor float32 <= t"
+def _umbral_float32(umbral):
+    umbral32 = umbral.astype(np.float32)
+    por_encima = umbral32.astype(np.float64) > umbral
+    umbral32[por_encima] = np.nextafter(umbral32[por_encima], np.float32(-np.inf))
+    return umbral32
+
+
+def _alinear(posicion):
+    return -(-posicion // ALINEACION) * ALINEACION
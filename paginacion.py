@@ -0,0 +1,26 @@
+import base64
+import json
+
+
+# Cursor opaco para la paginación por keyset de /all_empleados.
+# Guarda la ordenación con la que se generó y la clave de la última fila
+# devuelta (valor de la columna de orden + id_empleado como desempate).
+def codificar_cursor(sort_by, sort_order, valor, id_empleado):
+    contenido = json.dumps([sort_by, sort_order, valor, id_empleado], separators=(',', ':'))
+    return base64.urlsafe_b64encode(contenido.encode()).decode().rstrip('=')
+
+
+# Devuelve (valor, id_empleado) o lanza ValueError si el cursor no es válido
+# o se generó con otra ordenación
+def decodificar_cursor(cursor, sort_by, sort_order):
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        cursor_sort_by, cursor_sort_order, valor, id_empleado = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+    except (ValueError, TypeError):
+        raise ValueError("Cursor no válido")
+
+    if (cursor_sort_by, cursor_sort_order) != (sort_by, sort_order):
+        raise ValueError("El cursor no corresponde a la ordenación solicitada")
+    if not isinstance(id_empleado, int):
+        raise ValueError("Cursor no válido")
+    return valor, id_empleado
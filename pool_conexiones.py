@@ -0,0 +1,164 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import pymysql
+from pymysql.constants import SERVER_STATUS
+
+from metricas import metricas
+
+
+metricas.histograma('db_conexion_segundos', "Tiempo en abrir una conexión nueva a MySQL")
+
+
+# Error que se lanza cuando no hay conexiones libres tras esperar el tiempo máximo
+class PoolAgotado(Exception):
+    pass
+
+
+# Pool de conexiones pymysql compartido por todos los endpoints.
+# - tamano_maximo: número máximo de conexiones abiertas a la vez
+# - tiempo_vida: segundos tras los que una conexión se cierra y se vuelve a crear
+# - tiempo_espera: segundos que se espera por una conexión libre antes de fallar
+# - intervalo_ping: si una conexión lleva más de estos segundos sin usarse se
+#   comprueba con ping antes de reutilizarla
+class PoolConexiones:
+    def __init__(self, config, tamano_maximo=10, tiempo_vida=1800, tiempo_espera=5.0, intervalo_ping=5.0):
+        # autocommit evita que una conexión reutilizada se quede con una
+        # instantánea antigua de la transacción anterior (REPEATABLE READ)
+        self.config = {'autocommit': True, **config}
+        self.tamano_maximo = tamano_maximo
+        self.tiempo_vida = tiempo_vida
+        self.tiempo_espera = tiempo_espera
+        self.intervalo_ping = intervalo_ping
+
+        self._lock = threading.Lock()
+        self._semaforo = threading.BoundedSemaphore(tamano_maximo)
+        self._inactivas = deque()  # (conexion, ultimo_uso)
+        self._creada_en = {}  # id(conexion) -> instante de creación
+        self._cerrado = False
+
+        self._stats = {
+            'creadas': 0,
+            'reutilizadas': 0,
+            'recicladas': 0,
+            'descartadas': 0,
+            'esperas_agotadas': 0,
+            'tiempo_espera_total': 0.0,
+        }
+
+    # tiempo_espera permite acortar la espera cuando parte del plazo ya se
+    # consumió antes de llegar aquí (p. ej. en la cola del ejecutor)
+    def adquirir(self, tiempo_espera=None):
+        inicio = time.monotonic()
+        espera = self.tiempo_espera if tiempo_espera is None else tiempo_espera
+        if espera <= 0 or not self._semaforo.acquire(timeout=espera):
+            with self._lock:
+                self._stats['esperas_agotadas'] += 1
+            raise PoolAgotado(f"No hay conexiones libres tras esperar {max(espera, 0):.3g}s")
+
+        try:
+            conn = self._conexion_sana()
+        except BaseException:
+            self._semaforo.release()
+            raise
+
+        with self._lock:
+            self._stats['tiempo_espera_total'] += time.monotonic() - inicio
+        return conn
+
+    def liberar(self, conn, descartar=False):
+        try:
+            ahora = time.monotonic()
+            caducada = ahora - self._creada_en.get(id(conn), ahora) > self.tiempo_vida
+
+            if not descartar and conn.open and conn.server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS:
+                # Transacción sin cerrar (p. ej. por una excepción): deshacerla
+                try:
+                    conn.rollback()
+                except pymysql.MySQLError:
+                    descartar = True
+
+            if descartar or caducada or self._cerrado or not conn.open:
+                self._cerrar(conn)
+                with self._lock:
+                    self._stats['recicladas' if caducada and not descartar else 'descartadas'] += 1
+            else:
+                with self._lock:
+                    self._inactivas.append((conn, ahora))
+        finally:
+            self._semaforo.release()
+
+    @contextmanager
+    def conexion(self):
+        conn = self.adquirir()
+        try:
+            yield conn
+        finally:
+            self.liberar(conn)
+
+    def cerrar(self):
+        with self._lock:
+            self._cerrado = True
+            inactivas = list(self._inactivas)
+            self._inactivas.clear()
+        for conn, _ in inactivas:
+            self._cerrar(conn)
+
+    def estadisticas(self):
+        with self._lock:
+            abiertas = len(self._creada_en)
+            inactivas = len(self._inactivas)
+            return {
+                'tamano_maximo': self.tamano_maximo,
+                'abiertas': abiertas,
+                'en_uso': abiertas - inactivas,
+                'inactivas': inactivas,
+                **self._stats,
+                'tiempo_espera_total': round(self._stats['tiempo_espera_total'], 4),
+            }
+
+    def _conexion_sana(self):
+        while True:
+            with self._lock:
+                conn, ultimo_uso = self._inactivas.pop() if self._inactivas else (None, None)
+
+            if conn is None:
+                return self._nueva()
+
+            ahora = time.monotonic()
+            if ahora - self._creada_en[id(conn)] > self.tiempo_vida:
+                self._cerrar(conn)
+                with self._lock:
+                    self._stats['recicladas'] += 1
+                continue
+
+            if ahora - ultimo_uso > self.intervalo_ping:
+                try:
+                    conn.ping(reconnect=False)
+                except pymysql.MySQLError:
+                    self._cerrar(conn)
+                    with self._lock:
+                        self._stats['descartadas'] += 1
+                    continue
+
+            with self._lock:
+                self._stats['reutilizadas'] += 1
+            return conn
+
+    def _nueva(self):
+        with metricas.medir('db_conexion_segundos'):
+            conn = pymysql.connect(**self.config)
+        with self._lock:
+            self._creada_en[id(conn)] = time.monotonic()
+            self._stats['creadas'] += 1
+        return conn
+
+    def _cerrar(self, conn):
+        with self._lock:
+            self._creada_en.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
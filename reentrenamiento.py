@@ -0,0 +1,530 @@
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import re
+import sys
+import time
+import uuid
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+import pymysql
+from pymysql.constants import ER
+
+from inferencia import COMPETENCIAS, _POSICION
+from lectura_incremental import MARGEN_MARCA, marca_bd, mismas_filas, query_totales
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+# Status con los que se entrena el modelo; los positivos son los que cuentan como admitido
+STATUS_POSITIVOS = ['Entrevista2', 'Ofertado', 'Entrevista1', 'CentroEvaluación']
+STATUS_ENTRENAMIENTO = STATUS_POSITIVOS + ['Descartado']
+
+_MARCADORES_STATUS = ', '.join(['%s'] * len(STATUS_ENTRENAMIENTO))
+
+# Ordenadas por id para poder localizar la fila de cada competencia con searchsorted
+QUERY_CANDIDATURAS = f"""
+    SELECT id_candidatura, status
+    FROM candidaturas
+    WHERE status IN ({_MARCADORES_STATUS})
+    ORDER BY id_candidatura
+"""
+
+# Sólo las competencias de las candidaturas que entran en el entrenamiento
+QUERY_COMPETENCIAS = f"""
+    SELECT cp.id_candidatura, cp.nombre_competencia, cp.nota
+    FROM competencias cp
+    JOIN candidaturas c ON c.id_candidatura = cp.id_candidatura
+    WHERE c.status IN ({_MARCADORES_STATUS})
+"""
+
+# Estados de un trabajo de reentrenamiento
+EN_COLA = 'en_cola'
+EN_CURSO = 'en_curso'
+COMPLETADO = 'completado'
+FALLIDO = 'fallido'
+
+
+# Error de un trabajo que se muestra tal cual en /retrain/{job_id}
+class ErrorReentrenamiento(Exception):
+    pass
+
+
+# Filas que se piden al servidor de cada vez al leer con cursor de servidor
+TAMANO_LOTE_EXTRACCION = 10000
+
+# Candidaturas con cambios en ellas o en sus competencias desde una marca
+# (columna fecha_actualizacion, ver sql/fecha_actualizacion.sql). Se leen entren
+# o no en el entrenamiento: si una cambia a otro status tiene que salir del conjunto.
+_CAMBIADAS_DESDE = """
+    SELECT id_candidatura FROM candidaturas WHERE fecha_actualizacion >= %s
+    UNION
+    SELECT id_candidatura FROM competencias WHERE fecha_actualizacion >= %s
+"""
+
+QUERY_CANDIDATURAS_CAMBIADAS = f"""
+    SELECT c.id_candidatura, c.status
+    FROM candidaturas c
+    JOIN ({_CAMBIADAS_DESDE}) cambios ON cambios.id_candidatura = c.id_candidatura
+    ORDER BY c.id_candidatura
+"""
+
+QUERY_COMPETENCIAS_CAMBIADAS = f"""
+    SELECT cp.id_candidatura, cp.nombre_competencia, cp.nota
+    FROM competencias cp
+    JOIN ({_CAMBIADAS_DESDE}) cambios ON cambios.id_candidatura = cp.id_candidatura
+"""
+
+QUERY_TOTAL_CANDIDATURAS = query_totales('candidaturas', 'id_candidatura', f'status IN ({_MARCADORES_STATUS})')
+
+
+# Conjunto de entrenamiento pivotado: una fila por candidatura, ordenadas por id.
+# `presentes` indica qué competencias tiene cada una (sólo entrenan las que
+# tienen las 8) y `entrena` si su status entra en el entrenamiento.
+Conjunto = namedtuple('Conjunto', ['ids', 'X', 'presentes', 'y', 'entrena'])
+
+# Conjunto guardado junto al modelo, con la marca de la BD hasta la que está al
+# día y el instante (time.time) de la última lectura completa
+Instantanea = namedtuple('Instantanea', ['conjunto', 'marca', 'completa_en'])
+
+
+# Lee de la BD las candidaturas y sus competencias y devuelve (X, y, estadisticas).
+# Igual que antes, sólo entran las candidaturas con las 8 competencias.
+def extraer_datos_entrenamiento(db, tamano_lote=TAMANO_LOTE_EXTRACCION):
+    inicio = time.perf_counter()
+    conjunto, filas = _leer_conjunto(db, QUERY_CANDIDATURAS, QUERY_COMPETENCIAS, STATUS_ENTRENAMIENTO, tamano_lote)
+    X, y = _completas(conjunto)
+    return X, y, _estadisticas_extraccion(filas, inicio)
+
+
+# Como extraer_datos_entrenamiento, pero partiendo de la instantánea anterior:
+# sólo se leen las candidaturas cambiadas desde su marca y se sustituyen en el
+# conjunto. Se hace una lectura completa si no hay instantánea, si la última
+# completa tiene más de `completo_cada` segundos, si falta la columna
+# fecha_actualizacion o si el número de candidaturas o la suma de sus ids no
+# cuadran (hubo DELETE).
+# Devuelve (X, y, estadisticas, instantanea nueva); la instantánea se guarda
+# aparte, cuando el modelo entrenado con ella ya está publicado.
+def extraer_incremental(db, anterior, completo_cada=86400, tamano_lote=TAMANO_LOTE_EXTRACCION):
+    inicio = time.perf_counter()
+    marca = marca_bd(db)
+
+    conjunto = None
+    cambios = None
+    filas = 0
+    if anterior is not None and time.time() - anterior.completa_en < completo_cada:
+        desde = anterior.marca - MARGEN_MARCA
+        try:
+            cambios, filas = _leer_conjunto(
+                db, QUERY_CANDIDATURAS_CAMBIADAS, QUERY_COMPETENCIAS_CAMBIADAS, (desde, desde), tamano_lote
+            )
+        except pymysql.MySQLError as e:
+            if e.args[0] != ER.BAD_FIELD_ERROR:
+                raise
+        if cambios is not None:
+            conjunto = _fusionar(anterior.conjunto, cambios)
+            if not mismas_filas(db, QUERY_TOTAL_CANDIDATURAS, STATUS_ENTRENAMIENTO, conjunto.ids):
+                conjunto = None
+
+    incremental = conjunto is not None
+    if incremental:
+        instantanea = Instantanea(conjunto, marca, anterior.completa_en)
+    else:
+        conjunto, filas_completas = _leer_conjunto(
+            db, QUERY_CANDIDATURAS, QUERY_COMPETENCIAS, STATUS_ENTRENAMIENTO, tamano_lote
+        )
+        filas += filas_completas
+        instantanea = Instantanea(conjunto, marca, time.time())
+
+    X, y = _completas(conjunto)
+    estadisticas = _estadisticas_extraccion(filas, inicio)
+    estadisticas['tipo'] = 'incremental' if incremental else 'completa'
+    estadisticas['cambios'] = len(cambios.ids) if incremental else None
+    return X, y, estadisticas, instantanea
+
+
+def cargar_instantanea(ruta):
+    try:
+        with np.load(ruta) as f:
+            ids = f['ids']
+            conjunto = Conjunto(ids, f['X'], f['presentes'], f['y'], np.ones(len(ids), dtype=bool))
+            return Instantanea(conjunto, datetime.fromisoformat(str(f['marca'])), float(f['completa_en']))
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def guardar_instantanea(ruta, instantanea):
+    conjunto = instantanea.conjunto
+    # np.savez añade .npz si el nombre no lo lleva
+    temporal = f"{ruta}.{os.getpid()}.tmp.npz"
+    np.savez_compressed(
+        temporal,
+        ids=conjunto.ids, X=conjunto.X, presentes=conjunto.presentes, y=conjunto.y,
+        marca=np.array(instantanea.marca.isoformat()), completa_en=np.array(instantanea.completa_en)
+    )
+    os.replace(temporal, ruta)
+
+
+# Las filas se leen por lotes con un cursor de servidor (SSCursor) y como tuplas,
+# así nunca está todo el resultado en memoria ni se crea un dict por fila: cada
+# lote se vuelca directamente en la matriz X, reservada de antemano.
+# Devuelve el Conjunto y el número de filas leídas.
+def _leer_conjunto(db, query_candidaturas, query_competencias, params, tamano_lote):
+    ids = []
+    y = []
+    entrena = []
+    with db.cursor(pymysql.cursors.SSCursor) as cursor:
+        cursor.execute(query_candidaturas, params)
+        for lote in _lotes(cursor, tamano_lote):
+            ids.extend([fila[0] for fila in lote])
+            y.extend([fila[1] in STATUS_POSITIVOS for fila in lote])
+            entrena.extend([fila[1] in STATUS_ENTRENAMIENTO for fila in lote])
+
+    ids = np.array(ids, dtype=np.int64)
+    X = np.zeros((len(ids), len(COMPETENCIAS)))
+    presentes = np.zeros(X.shape, dtype=bool)
+    conjunto = Conjunto(ids, X, presentes, np.array(y, dtype=np.int64), np.array(entrena, dtype=bool))
+    if not len(ids):
+        return conjunto, 0
+
+    filas_competencias = 0
+    with db.cursor(pymysql.cursors.SSCursor) as cursor:
+        cursor.execute(query_competencias, params)
+        for lote in _lotes(cursor, tamano_lote):
+            filas_competencias += len(lote)
+            id_lote = np.array([fila[0] for fila in lote], dtype=np.int64)
+            j = np.array([_POSICION.get(fila[1], -1) for fila in lote], dtype=np.intp)
+            notas = np.array([fila[2] for fila in lote], dtype=float)
+
+            # Fila de cada competencia; las de candidaturas que no están se descartan
+            i = np.minimum(np.searchsorted(ids, id_lote), len(ids) - 1)
+            validas = (j >= 0) & (ids[i] == id_lote)
+
+            X[i[validas], j[validas]] = notas[validas]
+            presentes[i[validas], j[validas]] = True
+
+    return conjunto, len(ids) + filas_competencias
+
+
+# Sustituye en `base` las candidaturas de `cambios`; las que ya no entrenan se quitan
+def _fusionar(base, cambios):
+    conservar = ~np.isin(base.ids, cambios.ids)
+    nuevas = cambios.entrena
+    ids = np.concatenate([base.ids[conservar], cambios.ids[nuevas]])
+    orden = np.argsort(ids, kind='stable')
+    return Conjunto(*(np.concatenate([a[conservar], b[nuevas]])[orden] for a, b in zip(base, cambios)))
+
+
+def _completas(conjunto):
+    if not len(conjunto.ids) or not conjunto.presentes.any():
+        raise ErrorReentrenamiento("No se encontraron suficientes datos para reentrenar el modelo.")
+
+    completas = conjunto.presentes.all(axis=1)
+    if not completas.any():
+        raise ErrorReentrenamiento("No se encontraron suficientes datos válidos para reentrenar el modelo.")
+
+    return conjunto.X[completas], conjunto.y[completas]
+
+
+def _estadisticas_extraccion(filas, inicio):
+    duracion = time.perf_counter() - inicio
+    return {
+        'filas_leidas': filas,
+        'filas_por_segundo': round(filas / duracion) if duracion > 0 else None,
+        'tiempo_extraccion': round(duracion, 3),
+        'pico_rss_mb': pico_rss_mb(),
+    }
+
+
+def _lotes(cursor, tamano_lote):
+    while True:
+        lote = cursor.fetchmany(tamano_lote)
+        if not lote:
+            return
+        yield lote
+
+
+# Pico de memoria residente del proceso en MB (None si el sistema no lo da)
+def pico_rss_mb():
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo da en KB y macOS en bytes
+    return round(pico / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+# Máximo de árboles al que se deja crecer el bosque con warm_start
+MAX_ARBOLES = 300
+
+
+# Árboles que se añaden con warm_start: proporcionales a la parte del conjunto que cambió
+def arboles_extra(cambios, muestras, arboles_base=100):
+    return max(10, math.ceil(arboles_base * cambios / max(muestras, 1)))
+
+
+# Entrena el modelo y lo deja en `ruta`, con sus metadatos al lado (ver
+# entrenamiento.guardar_modelo). Se ejecuta en un proceso aparte, así que sólo
+# recibe y devuelve datos serializables.
+# Con `extra` > 0 se amplía el bosque que ya hay en `ruta` con ese número de
+# árboles nuevos (warm_start) en lugar de entrenarlo entero; si no se puede
+# (no hay bosque o superaría MAX_ARBOLES) se entrena de cero con la búsqueda
+# de hiperparámetros `busqueda`.
+# sklearn, pandas y entrenamiento se importan aquí y no al principio del módulo:
+# sólo hacen falta en el proceso que entrena, no en la API que encola el trabajo.
+def entrenar_modelo(X, y, ruta, n_jobs=-1, extra=0, busqueda='halving', cache_dir=None):
+    import entrenamiento
+    metadatos = _ampliar_bosque(X, y, ruta, extra, n_jobs) if extra else None
+    if metadatos is None:
+        modelo, metadatos = entrenamiento.entrenar(X, y, metodo=busqueda, n_jobs=n_jobs, cache_dir=cache_dir)
+        metadatos = {'modo': 'completo', 'arboles': len(modelo.steps[-1][1].estimators_), **metadatos}
+        entrenamiento.guardar_modelo(modelo, ruta, metadatos)
+    return metadatos
+
+
+def _ampliar_bosque(X, y, ruta, extra, n_jobs):
+    import joblib
+    import pandas as pd
+    from sklearn.ensemble import RandomForestClassifier
+
+    import entrenamiento
+
+    inicio = time.perf_counter()
+    try:
+        modelo = joblib.load(ruta)
+    except (OSError, ValueError, EOFError):
+        return None
+
+    pasos = getattr(modelo, 'steps', None)
+    bosque = pasos[-1][1] if pasos else modelo
+    if type(bosque) is not RandomForestClassifier or len(bosque.estimators_) + extra > MAX_ARBOLES:
+        return None
+
+    # Los pasos previos (el StandardScaler) no se vuelven a ajustar: los árboles
+    # que ya hay tienen sus umbrales en la escala con la que se entrenaron
+    entrada = pd.DataFrame(X, columns=COMPETENCIAS)
+    for _, paso in (pasos or [])[:-1]:
+        entrada = paso.transform(entrada)
+
+    # Sin OOB: los árboles antiguos se entrenaron con otro conjunto y su
+    # estimación out-of-bag ya no sería válida
+    bosque.set_params(warm_start=True, n_estimators=len(bosque.estimators_) + extra, n_jobs=n_jobs, oob_score=False)
+    bosque.fit(entrada, y)
+    bosque.set_params(warm_start=False, n_jobs=None)
+
+    try:
+        with open(entrenamiento.ruta_de_metadatos(ruta), encoding='utf-8') as f:
+            anteriores = json.load(f)
+    except (OSError, ValueError):
+        anteriores = {}
+    metadatos = {
+        **anteriores,
+        'modo': 'ampliado',
+        'arboles': len(bosque.estimators_),
+        'muestras': int(len(y)),
+        'positivos': int(np.sum(y)),
+        'tiempo_total': round(time.perf_counter() - inicio, 3),
+        'entrenado_en': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+    }
+    entrenamiento.guardar_modelo(modelo, ruta, metadatos)
+    return metadatos
+
+
+# Cola de reentrenamientos.
+# Cada solicitud devuelve enseguida un trabajo; los trabajos se ejecutan de uno
+# en uno: la extracción en el pool de la BD y el entrenamiento en un proceso
+# aparte, para no bloquear el bucle de eventos ni competir con él por el GIL.
+# Las solicitudes que llegan mientras un trabajo espera turno se unen a ese
+# trabajo en lugar de crear otro: como todavía no ha leído los datos, el
+# resultado es el mismo. Si llegan durante un entrenamiento se crea como mucho
+# un trabajo más, que leerá los datos cuando termine el actual.
+# `al_publicar(ruta)` se llama en un hilo cuando el modelo nuevo ya está en
+# `ruta` (p. ej. para recargarlo y subirlo a S3).
+# Con `ruta_instantanea` el conjunto de entrenamiento se guarda en disco y cada
+# trabajo sólo lee de la BD lo que cambió (ver extraer_incremental). Si no cambió
+# nada no se entrena. `modo` decide qué se hace con los cambios: 'refit' entrena
+# de cero sobre el conjunto completo y 'warm_start' añade árboles nuevos al
+# bosque actual, tantos como pida la proporción de candidaturas cambiadas.
+# `busqueda` y `cache_dir` se pasan a entrenamiento.entrenar.
+# Con varios workers (servidor.py) cada uno tiene su cola: `directorio_trabajos`
+# guarda el estado de cada trabajo en un JSON para que cualquier worker pueda
+# responder por él, y `ruta_bloqueo` es un fichero con flock que garantiza que
+# sólo un worker entrena a la vez.
+class ColaReentrenamiento:
+    def __init__(self, ruta_modelo, n_jobs=-1, al_publicar=None, historial=50,
+                 ruta_instantanea=None, modo='refit', completo_cada=86400,
+                 busqueda='halving', cache_dir=None, directorio_trabajos=None,
+                 ruta_bloqueo=None):
+        if modo not in ('refit', 'warm_start'):
+            raise ValueError(f"Modo de reentrenamiento desconocido: {modo}")
+        self.ruta_modelo = ruta_modelo
+        self.n_jobs = n_jobs
+        self.al_publicar = al_publicar
+        self.historial = historial
+        self.ruta_instantanea = ruta_instantanea
+        self.modo = modo
+        self.completo_cada = completo_cada
+        self.busqueda = busqueda
+        self.cache_dir = cache_dir
+        self.directorio_trabajos = directorio_trabajos
+        self.ruta_bloqueo = ruta_bloqueo
+        if directorio_trabajos is not None:
+            os.makedirs(directorio_trabajos, exist_ok=True)
+
+        self._trabajos = OrderedDict()  # job_id -> dict con el estado del trabajo
+        self._en_cola = None
+        self._turno = asyncio.Lock()
+        self._procesos = None
+
+    def solicitar(self, datos):
+        if self._en_cola is not None:
+            self._en_cola['solicitudes'] += 1
+            self._guardar_estado(self._en_cola)
+            return dict(self._en_cola)
+
+        trabajo = {
+            'job_id': uuid.uuid4().hex,
+            'estado': EN_COLA,
+            'fase': None,
+            'solicitudes': 1,
+            'creado_en': time.time(),
+            'iniciado_en': None,
+            'terminado_en': None,
+            'extraccion': None,
+            'metricas': None,
+            'error': None,
+        }
+        self._en_cola = trabajo
+        self._trabajos[trabajo['job_id']] = trabajo
+        self._guardar_estado(trabajo)
+        self._limpiar_historial()
+        asyncio.get_running_loop().create_task(self._ejecutar(trabajo, datos))
+        return dict(trabajo)
+
+    def obtener(self, job_id):
+        trabajo = self._trabajos.get(job_id)
+        if trabajo is not None:
+            return dict(trabajo)
+        if self.directorio_trabajos is None or not _ID_TRABAJO.fullmatch(job_id):
+            return None
+        # Trabajo de otro worker
+        try:
+            with open(self._ruta_trabajo(job_id), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def cerrar(self):
+        if self._procesos is not None:
+            self._procesos.shutdown(wait=False, cancel_futures=True)
+            self._procesos = None
+
+    async def _ejecutar(self, trabajo, datos):
+        async with self._turno:
+            if self._en_cola is trabajo:
+                self._en_cola = None
+            trabajo.update(estado=EN_CURSO, iniciado_en=time.time())
+            loop = asyncio.get_running_loop()
+            bloqueo = None
+            try:
+                if self.ruta_bloqueo is not None:
+                    self._fase(trabajo, 'esperando')
+                    bloqueo = await loop.run_in_executor(None, _bloquear, self.ruta_bloqueo)
+
+                self._fase(trabajo, 'extrayendo')
+                instantanea = None
+                if self.ruta_instantanea is None:
+                    X, y, extraccion = await datos.ejecutar(extraer_datos_entrenamiento)
+                else:
+                    anterior = await loop.run_in_executor(None, cargar_instantanea, self.ruta_instantanea)
+                    X, y, extraccion, instantanea = await datos.ejecutar(
+                        extraer_incremental, anterior, self.completo_cada
+                    )
+                trabajo['extraccion'] = extraccion
+
+                cambios = extraccion.get('cambios')
+                if cambios == 0 and os.path.exists(self.ruta_modelo):
+                    trabajo['metricas'] = {'modo': 'sin_cambios', 'muestras': int(len(y))}
+                else:
+                    extra = arboles_extra(cambios, len(y)) if cambios and self.modo == 'warm_start' else 0
+                    self._fase(trabajo, 'entrenando')
+                    trabajo['metricas'] = await loop.run_in_executor(
+                        self._pool_procesos(), entrenar_modelo, X, y, self.ruta_modelo,
+                        self.n_jobs, extra, self.busqueda, self.cache_dir
+                    )
+
+                    self._fase(trabajo, 'publicando')
+                    if self.al_publicar is not None:
+                        await loop.run_in_executor(None, self.al_publicar, self.ruta_modelo)
+
+                # La marca sólo avanza cuando el modelo con esos datos ya está publicado
+                if instantanea is not None:
+                    await loop.run_in_executor(None, guardar_instantanea, self.ruta_instantanea, instantanea)
+
+                trabajo.update(estado=COMPLETADO, fase=None)
+            except ErrorReentrenamiento as e:
+                trabajo.update(estado=FALLIDO, error=str(e))
+            except pymysql.MySQLError as e:
+                trabajo.update(estado=FALLIDO, error=f"Error de base de datos: {e}")
+            except Exception as e:
+                trabajo.update(estado=FALLIDO, error=f"Error en la fase '{trabajo['fase']}': {e}")
+            finally:
+                if bloqueo is not None:
+                    bloqueo.close()
+                trabajo['terminado_en'] = time.time()
+                self._guardar_estado(trabajo)
+
+    def _pool_procesos(self):
+        # spawn: el proceso hijo no hereda los hilos ni las conexiones del servidor
+        if self._procesos is None:
+            self._procesos = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'))
+        return self._procesos
+
+    def _limpiar_historial(self):
+        terminados = [job_id for job_id, t in self._trabajos.items() if t['estado'] in (COMPLETADO, FALLIDO)]
+        for job_id in terminados[:max(0, len(self._trabajos) - self.historial)]:
+            del self._trabajos[job_id]
+            if self.directorio_trabajos is not None:
+                try:
+                    os.remove(self._ruta_trabajo(job_id))
+                except OSError:
+                    pass
+
+    def _fase(self, trabajo, fase):
+        trabajo['fase'] = fase
+        self._guardar_estado(trabajo)
+
+    def _guardar_estado(self, trabajo):
+        if self.directorio_trabajos is None:
+            return
+        ruta = self._ruta_trabajo(trabajo['job_id'])
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(trabajo, f, default=str)
+        os.replace(temporal, ruta)
+
+    def _ruta_trabajo(self, job_id):
+        return os.path.join(self.directorio_trabajos, f"{job_id}.json")
+
+
+# Los job_id son uuid4().hex; se comprueba antes de usarlos como nombre de fichero
+_ID_TRABAJO = re.compile(r'[0-9a-f]{32}')
+
+
+# Bloqueo exclusivo entre procesos sobre `ruta` (flock). Se libera al cerrar el fichero.
+def _bloquear(ruta):
+    import fcntl
+    f = open(ruta, 'a')
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX)
+    except BaseException:
+        f.close()
+        raise
+    return f
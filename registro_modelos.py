@@ -0,0 +1,135 @@
+import io
+import os
+import threading
+import time
+from collections import namedtuple
+
+from metricas import metricas
+
+
+metricas.histograma('modelo_carga_segundos', "Descarga y deserialización de un modelo (joblib.load, S3, formato compacto)")
+
+
+# Modelo deserializado junto con la versión de la que procede.
+# Es inmutable: para cambiar de modelo se sustituye la tupla entera, así una
+# predicción en curso sigue usando la instancia que obtuvo aunque se haga un swap.
+# `predictor` es lo que devuelva la función `preparar` del registro (p. ej. un PredictorRapido).
+ModeloCargado = namedtuple('ModeloCargado', ['modelo', 'version', 'cargado_en', 'predictor'])
+
+
+# Fuente de modelos en un bucket S3. La versión es el VersionId del objeto si el
+# bucket tiene versionado y, si no, su ETag.
+class FuenteS3:
+    def __init__(self, s3_client, bucket, key):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+
+    def version(self):
+        respuesta = self.s3_client.head_object(Bucket=self.bucket, Key=self.key)
+        return _version_s3(respuesta)
+
+    def cargar(self):
+        # Se lee el objeto en memoria: nada se escribe en disco, así que dos
+        # descargas simultáneas no pueden pisarse el fichero
+        respuesta = self.s3_client.get_object(Bucket=self.bucket, Key=self.key)
+        modelo = cargar_joblib(io.BytesIO(respuesta['Body'].read()))
+        return modelo, _version_s3(respuesta)
+
+
+def _version_s3(respuesta):
+    return respuesta.get('VersionId') or respuesta['ETag']
+
+
+# Fuente de modelos en un fichero local. La versión es el instante de
+# modificación y el tamaño: quien publique un modelo nuevo debe sustituir el
+# fichero de forma atómica (os.replace) para que nunca se lea a medio escribir.
+# `cargador` recibe el fichero abierto en binario (p. ej. modelo_compacto.cargar).
+class FuenteArchivo:
+    def __init__(self, ruta, cargador=None):
+        self.ruta = ruta
+        self.cargador = cargador or cargar_joblib
+
+    def version(self):
+        return _version_archivo(os.stat(self.ruta))
+
+    def cargar(self):
+        with open(self.ruta, 'rb') as f:
+            version = _version_archivo(os.fstat(f.fileno()))
+            return self.cargador(f), version
+
+
+def _version_archivo(stat):
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+# joblib (y sklearn al deserializar) se importan con el primer modelo, no al
+# importar el módulo, para que la API arranque sin esperarlos
+def cargar_joblib(f):
+    import joblib
+    return joblib.load(f)
+
+
+# Mantiene en memoria el modelo de una fuente y lo cambia cuando aparece una
+# versión nueva. La versión se comprueba como mucho una vez cada `ttl` segundos
+# (o al llamar a recargar). Mientras un hilo comprueba o descarga, el resto sigue
+# sirviendo el modelo anterior en lugar de esperar.
+# `preparar(modelo)` se ejecuta una vez por cada modelo nuevo, antes del swap.
+class RegistroModelos:
+    def __init__(self, fuente, ttl=60, preparar=None):
+        self.fuente = fuente
+        self.ttl = ttl
+        self.preparar = preparar
+        self._actual = None
+        self._comprobado_en = 0.0
+        self._lock = threading.Lock()
+
+    def obtener(self):
+        actual = self._actual
+        if actual is not None and time.monotonic() - self._comprobado_en <= self.ttl:
+            return actual
+
+        # Sólo se bloquea si todavía no hay ningún modelo que servir
+        if not self._lock.acquire(blocking=actual is None):
+            return actual
+        try:
+            if self._actual is not None and time.monotonic() - self._comprobado_en <= self.ttl:
+                return self._actual
+            try:
+                self._actualizar()
+            except Exception:
+                if self._actual is None:
+                    raise
+                # Si S3 falla se sigue con el modelo que ya hay hasta el siguiente TTL
+                self._comprobado_en = time.monotonic()
+            return self._actual
+        finally:
+            self._lock.release()
+
+    # Modelo en memoria sin comprobar la versión ni esperar a que se cargue; None
+    # si todavía no hay ninguno (p. ej. mientras se carga el primero en segundo plano)
+    @property
+    def actual(self):
+        return self._actual
+
+    # True si ya pasó el TTL y la próxima llamada a obtener() comprobará la versión
+    def caducado(self):
+        return time.monotonic() - self._comprobado_en > self.ttl
+
+    # Comprueba la versión ahora mismo, sin esperar al TTL. Devuelve True si cambió el modelo.
+    def recargar(self):
+        with self._lock:
+            anterior = self._actual
+            self._actualizar()
+            return anterior is None or anterior.version != self._actual.version
+
+    def _actualizar(self):
+        if self._actual is not None and self.fuente.version() == self._actual.version:
+            self._comprobado_en = time.monotonic()
+            return
+
+        with metricas.medir('modelo_carga_segundos', fuente=type(self.fuente).__name__):
+            modelo, version = self.fuente.cargar()
+        predictor = self.preparar(modelo) if self.preparar else None
+        self._actual = ModeloCargado(modelo, version, time.time(), predictor)
+        self._comprobado_en = time.monotonic()
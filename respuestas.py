@@ -0,0 +1,294 @@
+import datetime
+import decimal
+import gzip
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import parse_qsl, urlencode
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+
+# orjson y brotli son opcionales: sin orjson se serializa con json y sin brotli
+# sólo se ofrece gzip
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Nivel de gzip y calidad de brotli: compresión cercana a la máxima con un coste
+# de CPU muy inferior (brotli a calidad 11 es decenas de veces más lento)
+NIVEL_GZIP = 6
+CALIDAD_BROTLI = 5
+
+# Tipos de contenido que merece la pena comprimir
+TIPOS_COMPRIMIBLES = ('application/json', 'text/')
+
+
+# Lo que jsonable_encoder convierte y orjson no sabe serializar
+def _por_defecto(valor):
+    if isinstance(valor, decimal.Decimal):
+        return int(valor) if valor.as_tuple().exponent >= 0 else float(valor)
+    if isinstance(valor, (datetime.date, datetime.time)):
+        return valor.isoformat()
+    if isinstance(valor, (set, frozenset)):
+        return list(valor)
+    if hasattr(valor, 'tolist'):
+        return valor.tolist()
+    raise TypeError(f"Tipo no serializable a JSON: {type(valor).__name__}")
+
+
+# JSON compacto en bytes con orjson (fechas, Decimal y arrays de NumPy incluidos)
+def serializar(contenido):
+    if orjson is not None:
+        return orjson.dumps(contenido, default=_por_defecto,
+                            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(contenido, ensure_ascii=False, allow_nan=False, separators=(',', ':'),
+                      default=_por_defecto).encode('utf-8')
+
+
+# Respuesta JSON serializada con serializar(). Las rutas que la devuelven
+# directamente se saltan además el jsonable_encoder de FastAPI, que recorre
+# todo el contenido en Python.
+class RespuestaJSON(JSONResponse):
+    def render(self, content):
+        return serializar(content)
+
+
+# Mejor codificación aceptada por el cliente según Accept-Encoding: 'br' si está
+# brotli, 'gzip', o None para enviar sin comprimir
+def elegir_codificacion(accept_encoding):
+    aceptadas = {}
+    for parte in accept_encoding.lower().split(','):
+        nombre, _, parametros = parte.strip().partition(';')
+        calidad = 1.0
+        parametros = parametros.strip()
+        if parametros.startswith('q='):
+            try:
+                calidad = float(parametros[2:])
+            except ValueError:
+                calidad = 0.0
+        aceptadas[nombre.strip()] = calidad
+    if brotli is not None and aceptadas.get('br', 0) > 0:
+        return 'br'
+    if aceptadas.get('gzip', 0) > 0:
+        return 'gzip'
+    return None
+
+
+def comprimir(cuerpo, codificacion):
+    if codificacion == 'br':
+        return brotli.compress(cuerpo, quality=CALIDAD_BROTLI)
+    return gzip.compress(cuerpo, compresslevel=NIVEL_GZIP, mtime=0)
+
+
+# Una respuesta guardada: el cuerpo sin comprimir, sus validadores y las
+# versiones comprimidas que se han ido pidiendo
+class Representacion:
+    def __init__(self, cuerpo, cabeceras, ruta, ultima_modificacion):
+        self.cuerpo = cuerpo
+        self.cabeceras = cabeceras  # [(nombre, valor)] en bytes, sin content-length
+        self.ruta = ruta
+        self.etag = 'W/"' + hashlib.blake2b(cuerpo, digest_size=12).hexdigest() + '"'
+        self.ultima_modificacion = ultima_modificacion
+        self.guardada_en = time.monotonic()
+        self.comprimidos = {}  # codificación -> cuerpo comprimido
+
+    def version(self, codificacion):
+        if codificacion not in self.comprimidos:
+            self.comprimidos[codificacion] = comprimir(self.cuerpo, codificacion)
+        return self.comprimidos[codificacion]
+
+
+# Caché de las respuestas de las rutas de lectura (GET), por ruta y parámetros.
+# Cada representación vale `ttl` segundos: mientras tanto las peticiones se
+# responden sin ejecutar la ruta (y sin consultar la BD), con un 304 si el cliente
+# ya la tiene (If-None-Match / If-Modified-Since). Las escrituras de esta API
+# invalidan las rutas afectadas; los cambios hechos fuera se ven como mucho
+# `ttl` segundos después. Con ttl=0 no se guarda nada, pero las respuestas siguen
+# llevando ETag y se contesta 304 después de ejecutar la ruta.
+# Una respuesta que empezó a calcularse antes de una invalidación no se guarda.
+# Se usa sólo desde el bucle de eventos, así que no necesita locks.
+class CacheRespuestas:
+    def __init__(self, ttl=5, max_entradas=1000):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()  # (ruta, query) -> Representacion
+        self.generacion = 0
+        self._stats = {
+            'aciertos': 0,
+            'fallos': 0,
+            'no_modificadas': 0,
+            'invalidaciones': 0,
+        }
+
+    def obtener(self, clave):
+        representacion = self._entradas.get(clave)
+        if representacion is None or time.monotonic() - representacion.guardada_en > self.ttl:
+            self._stats['fallos'] += 1
+            return None
+        self._entradas.move_to_end(clave)
+        self._stats['aciertos'] += 1
+        return representacion
+
+    # Guarda la respuesta recién generada. Si el contenido no ha cambiado desde
+    # la representación anterior se conserva su Last-Modified.
+    def guardar(self, clave, cuerpo, cabeceras, ruta, generacion):
+        anterior = self._entradas.get(clave)
+        representacion = Representacion(cuerpo, cabeceras, ruta, time.time())
+        if anterior is not None and anterior.etag == representacion.etag:
+            representacion.ultima_modificacion = anterior.ultima_modificacion
+            representacion.comprimidos = anterior.comprimidos
+        if self.ttl > 0 and generacion == self.generacion:
+            self._entradas[clave] = representacion
+            self._entradas.move_to_end(clave)
+            if len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+        return representacion
+
+    def contar_no_modificada(self):
+        self._stats['no_modificadas'] += 1
+
+    # Descarta las respuestas de las rutas que empiezan por alguno de `prefijos`
+    # (todas si no se indica ninguno)
+    def invalidar(self, *prefijos):
+        self._stats['invalidaciones'] += 1
+        self.generacion += 1
+        if not prefijos:
+            self._entradas.clear()
+            return
+        for clave in [clave for clave in self._entradas if clave[0].startswith(prefijos)]:
+            del self._entradas[clave]
+
+    def estadisticas(self):
+        consultas = self._stats['aciertos'] + self._stats['fallos']
+        return {
+            'ttl': self.ttl,
+            'entradas': len(self._entradas),
+            'max_entradas': self.max_entradas,
+            **self._stats,
+            'tasa_aciertos': round(self._stats['aciertos'] / consultas, 4) if consultas else None,
+        }
+
+
+def _fecha_http(instante):
+    return formatdate(instante, usegmt=True)
+
+
+# True si la petición condicional coincide con la representación (se responde 304)
+def no_modificada(cabeceras, representacion):
+    if_none_match = cabeceras.get('if-none-match')
+    if if_none_match is not None:
+        # Comparación débil: W/"x" y "x" son la misma versión
+        etiquetas = {etiqueta.strip().removeprefix('W/') for etiqueta in if_none_match.split(',')}
+        return '*' in etiquetas or representacion.etag.removeprefix('W/') in etiquetas
+    if_modified_since = cabeceras.get('if-modified-since')
+    if if_modified_since is not None:
+        try:
+            desde = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(representacion.ultima_modificacion) <= desde
+    return False
+
+
+# Middleware ASGI de la capa de respuestas:
+# - las rutas de `rutas` (GET) pasan por `cache` y llevan ETag y Last-Modified;
+# - las respuestas de más de `comprimir_min` bytes (0 = nunca) se comprimen con
+#   brotli o gzip según Accept-Encoding.
+# Las respuestas en streaming (varios mensajes de cuerpo) pasan sin tocar.
+# Tiene que ser el middleware más interno, para que CORS y las métricas también
+# vean las respuestas que salen de la caché.
+class MiddlewareRespuestas:
+    def __init__(self, app, cache, rutas=(), comprimir_min=1024):
+        self.app = app
+        self.cache = cache
+        self.rutas = frozenset(rutas)
+        self.comprimir_min = comprimir_min
+
+    async def __call__(self, scope, receive, send):
+        # HEAD no lleva cuerpo: su content-length es el del GET y no se puede recalcular
+        if scope['type'] != 'http' or scope['method'] == 'HEAD':
+            await self.app(scope, receive, send)
+            return
+
+        cabeceras = Headers(scope=scope)
+        codificacion = elegir_codificacion(cabeceras.get('accept-encoding', '')) if self.comprimir_min else None
+
+        clave = None
+        if scope['method'] == 'GET' and scope['path'] in self.rutas:
+            query = urlencode(sorted(parse_qsl(scope['query_string'].decode('latin-1'), keep_blank_values=True)))
+            clave = (scope['path'], query)
+            representacion = self.cache.obtener(clave)
+            if representacion is not None:
+                # La ruta no se ejecuta; se anota para que las métricas la etiqueten igual
+                scope['route'] = representacion.ruta
+                await self._enviar_representacion(send, cabeceras, representacion, codificacion)
+                return
+
+        inicio = None
+        generacion = self.cache.generacion
+
+        async def enviar(mensaje):
+            nonlocal inicio
+            if mensaje['type'] == 'http.response.start':
+                inicio = mensaje
+                return
+            if mensaje['type'] != 'http.response.body' or inicio is None:
+                await send(mensaje)
+                return
+            if mensaje.get('more_body', False):
+                # Streaming: se envía tal cual
+                await send(inicio)
+                inicio = None
+                await send(mensaje)
+                return
+
+            cuerpo = mensaje.get('body', b'')
+            respuesta, inicio = inicio, None
+            if clave is not None and respuesta['status'] == 200:
+                guardadas = [(nombre, valor) for nombre, valor in respuesta['headers'] if nombre.lower() != b'content-length']
+                representacion = self.cache.guardar(clave, cuerpo, guardadas, scope.get('route'), generacion)
+                await self._enviar_representacion(send, cabeceras, representacion, codificacion)
+                return
+            await self._enviar(send, respuesta['status'], respuesta['headers'], cuerpo, codificacion)
+
+        await self.app(scope, receive, enviar)
+
+    async def _enviar_representacion(self, send, cabeceras, representacion, codificacion):
+        validadores = [
+            (b'etag', representacion.etag.encode('latin-1')),
+            (b'last-modified', _fecha_http(representacion.ultima_modificacion).encode('latin-1')),
+            # El navegador puede guardar la respuesta pero tiene que revalidarla siempre
+            (b'cache-control', b'no-cache'),
+        ]
+        if no_modificada(cabeceras, representacion):
+            self.cache.contar_no_modificada()
+            await send({'type': 'http.response.start', 'status': 304,
+                        'headers': validadores + [(b'vary', b'accept-encoding')]})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        await self._enviar(send, 200, representacion.cabeceras + validadores, representacion.cuerpo,
+                           codificacion, representacion)
+
+    async def _enviar(self, send, status, headers, cuerpo, codificacion, representacion=None):
+        respuesta = MutableHeaders(raw=list(headers))
+        tipo = respuesta.get('content-type', '')
+        if (codificacion is not None and len(cuerpo) >= self.comprimir_min
+                and 'content-encoding' not in respuesta and tipo.startswith(TIPOS_COMPRIMIBLES)):
+            cuerpo = representacion.version(codificacion) if representacion is not None else comprimir(cuerpo, codificacion)
+            respuesta['content-encoding'] = codificacion
+            respuesta.add_vary_header('accept-encoding')
+        elif representacion is not None:
+            respuesta.add_vary_header('accept-encoding')
+        respuesta['content-length'] = str(len(cuerpo))
+        await send({'type': 'http.response.start', 'status': status, 'headers': respuesta.raw})
+        await send({'type': 'http.response.body', 'body': cuerpo})
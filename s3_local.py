@@ -0,0 +1,81 @@
+import hashlib
+import io
+import os
+import shutil
+import threading
+
+from metricas import metricas
+
+
+metricas.histograma('s3_llamada_segundos', "Duración de cada llamada al cliente de S3")
+
+
+# Sustituto local de un cliente boto3 de S3 respaldado por un directorio.
+# Cada bucket es una subcarpeta y cada key un fichero. Implementa sólo las
+# operaciones que usa la API, con el mismo formato de respuesta que boto3.
+# Se activa con la variable de entorno S3_LOCAL_DIR.
+class S3Local:
+    def __init__(self, directorio):
+        self.directorio = directorio
+
+    def head_object(self, Bucket, Key):
+        ruta = self._ruta(Bucket, Key)
+        with open(ruta, 'rb') as f:
+            contenido = f.read()
+        return {'ETag': _etag(contenido), 'ContentLength': len(contenido)}
+
+    def get_object(self, Bucket, Key):
+        with open(self._ruta(Bucket, Key), 'rb') as f:
+            contenido = f.read()
+        return {'ETag': _etag(contenido), 'ContentLength': len(contenido), 'Body': io.BytesIO(contenido)}
+
+    def put_object(self, Bucket, Key, Body):
+        ruta = self._ruta(Bucket, Key)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        contenido = Body if isinstance(Body, bytes) else Body.read()
+        # Escritura atómica para que un lector nunca vea un fichero a medias
+        with open(ruta + '.tmp', 'wb') as f:
+            f.write(contenido)
+        os.replace(ruta + '.tmp', ruta)
+        return {'ETag': _etag(contenido)}
+
+    def upload_file(self, Filename, Bucket, Key):
+        with open(Filename, 'rb') as f:
+            self.put_object(Bucket, Key, f)
+
+    def download_file(self, Bucket, Key, Filename):
+        shutil.copyfile(self._ruta(Bucket, Key), Filename)
+
+    def _ruta(self, bucket, key):
+        return os.path.join(self.directorio, bucket, key)
+
+
+# Cliente de S3 que se crea con `fabrica()` la primera vez que se usa. Importar
+# boto3 y crear el cliente cuesta varios cientos de milisegundos, así que no
+# tiene sentido pagarlo al arrancar si nadie llama a S3.
+# Cada llamada se mide en s3_llamada_segundos por operación.
+class ClienteS3Perezoso:
+    def __init__(self, fabrica):
+        self._fabrica = fabrica
+        self._cliente = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, nombre):
+        cliente = self._cliente
+        if cliente is None:
+            with self._lock:
+                if self._cliente is None:
+                    self._cliente = self._fabrica()
+                cliente = self._cliente
+        atributo = getattr(cliente, nombre)
+        if not callable(atributo):
+            return atributo
+
+        def medido(*args, **kwargs):
+            with metricas.medir('s3_llamada_segundos', operacion=nombre):
+                return atributo(*args, **kwargs)
+        return medido
+
+
+def _etag(contenido):
+    return '"' + hashlib.md5(contenido).hexdigest() + '"'
@@ -0,0 +1,155 @@
+# Lanzador de producción de api_empleados con varios workers (sólo Linux/Unix).
+#
+#   python servidor.py --workers 4 --port 8000
+#
+# El proceso principal importa la API, carga el modelo una sola vez, abre el
+# socket y hace fork de los workers. Todos heredan el modelo ya cargado: sus
+# arrays (el bosque aplanado o el fichero compacto con mmap) se comparten entre
+# procesos copy-on-write en lugar de ocupar memoria una vez por worker.
+# - Cada worker abre su propio pool de MySQL de DB_POOL_TOTAL / workers
+#   conexiones, así el total de conexiones no crece con los workers. Por
+#   defecto hay un worker por CPU, pero no más de los que caben en el total con
+#   MIN_POOL_WORKER conexiones cada uno; pedir más con --workers es un error.
+# - Cuando un worker publica un modelo reentrenado avisa al proceso principal
+#   con SIGUSR1 y éste lo reenvía a todos, que lo recargan en el momento.
+#   `kill -USR1 <pid principal>` fuerza la misma recarga a mano.
+# - Si un worker muere se arranca otro; SIGTERM o SIGINT paran todos.
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+import uvicorn
+
+
+# Conexiones que necesita como mínimo cada worker
+MIN_POOL_WORKER = 2
+
+
+# Workers que caben en `total` conexiones
+def max_workers(total):
+    return total // MIN_POOL_WORKER
+
+
+def workers_por_defecto(total):
+    return max(1, min(os.cpu_count() or 1, max_workers(total)))
+
+
+# Conexiones por worker a partir del total; workers <= max_workers(total)
+def tamano_pool(total, workers):
+    return total // workers
+
+
+def abrir_socket(host, port, backlog=2048):
+    sock = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    # Las conexiones aceptadas lo heredan; sin él cada respuesta pequeña espera
+    # ~40 ms al ACK retardado del cliente (uvicorn no lo activa con sockets propios)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def ejecutar_worker(app, sock, args):
+    # Los manejadores del proceso principal no valen aquí: uvicorn instala los
+    # de SIGINT/SIGTERM y la API el de SIGUSR1 al arrancar. Hasta entonces se
+    # ignora SIGUSR1 para que una recarga temprana no mate al worker.
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+    config = uvicorn.Config(app, log_level=args.log_level, timeout_keep_alive=args.keep_alive)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def main(args):
+    # Se fija antes de importar la API: configura el pool y la cola de reentrenamiento
+    os.environ['API_WORKERS'] = str(args.workers)
+    os.environ['DB_POOL_SIZE'] = str(tamano_pool(args.pool_total, args.workers))
+
+    import api_empleados
+    inicio = time.perf_counter()
+    api_empleados.cargar_primer_modelo()
+    print(f"Modelo cargado en {time.perf_counter() - inicio:.2f} s; "
+          f"{args.workers} workers con {os.environ['DB_POOL_SIZE']} conexiones cada uno", flush=True)
+
+    sock = abrir_socket(args.host, args.port)
+
+    # Los objetos que ya existen no los vuelve a recorrer el recolector de
+    # basura, así los workers no escriben en sus páginas y siguen compartidas
+    gc.collect()
+    gc.freeze()
+
+    workers = {}  # pid -> instante de arranque
+    parando = False
+
+    def arrancar():
+        pid = os.fork()
+        if pid == 0:
+            try:
+                ejecutar_worker(api_empleados.app, sock, args)
+            finally:
+                os._exit(0)
+        workers[pid] = time.monotonic()
+
+    def reenviar(signum, frame):
+        for pid in list(workers):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def parar(signum, frame):
+        nonlocal parando
+        parando = True
+        reenviar(signal.SIGTERM, frame)
+
+    signal.signal(signal.SIGTERM, parar)
+    signal.signal(signal.SIGINT, parar)
+    signal.signal(signal.SIGUSR1, reenviar)
+
+    for _ in range(args.workers):
+        arrancar()
+
+    while workers:
+        try:
+            pid, estado = os.wait()
+        except ChildProcessError:
+            break
+        arrancado = workers.pop(pid, None)
+        if parando or arrancado is None:
+            continue
+        print(f"Worker {pid} terminó (estado {estado}); arrancando otro", file=sys.stderr, flush=True)
+        # Si muere nada más arrancar, se espera un poco para no entrar en bucle
+        if time.monotonic() - arrancado < 1:
+            time.sleep(1)
+        if not parando:
+            arrancar()
+
+    sock.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=None,
+                        help="por defecto uno por CPU, limitado por --pool-total")
+    parser.add_argument('--pool-total', type=int, default=int(os.getenv('DB_POOL_TOTAL', '32')),
+                        help="conexiones a MySQL entre todos los workers")
+    parser.add_argument('--keep-alive', type=int, default=5, help="segundos de keep-alive HTTP")
+    parser.add_argument('--log-level', default='info')
+    args = parser.parse_args()
+    if args.pool_total < MIN_POOL_WORKER:
+        parser.error(f"--pool-total / DB_POOL_TOTAL tiene que ser al menos {MIN_POOL_WORKER}")
+    if args.workers is None:
+        args.workers = workers_por_defecto(args.pool_total)
+    elif not 1 <= args.workers <= max_workers(args.pool_total):
+        parser.error(f"{args.workers} workers no caben en {args.pool_total} conexiones "
+                     f"({MIN_POOL_WORKER} por worker): usa como mucho {max_workers(args.pool_total)} "
+                     f"o sube DB_POOL_TOTAL")
+    main(args)
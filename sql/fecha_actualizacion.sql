@@ -0,0 +1,24 @@
+-- Columna fecha_actualizacion en candidaturas y competencias para el
+-- reentrenamiento incremental: /retrain sólo vuelve a leer las candidaturas
+-- cambiadas desde la última ejecución (marca guardada junto al modelo).
+-- MySQL la mantiene sola con cada INSERT y UPDATE.
+--
+-- Los DELETE no dejan rastro: el reentrenamiento los detecta comparando el
+-- número de candidaturas y, en cualquier caso, hace una lectura completa cada
+-- REENTRENAMIENTO_COMPLETO_CADA segundos.
+--
+-- Mientras no se aplique esta migración /retrain lee siempre todas las filas.
+
+ALTER TABLE candidaturas
+    ADD COLUMN fecha_actualizacion TIMESTAMP NOT NULL
+        DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    ADD KEY idx_candidaturas_fecha_actualizacion (fecha_actualizacion);
+
+ALTER TABLE competencias
+    ADD COLUMN fecha_actualizacion TIMESTAMP NOT NULL
+        DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    ADD KEY idx_competencias_fecha_actualizacion (fecha_actualizacion);
+
+-- Para contar rápido las candidaturas que entran en el entrenamiento
+ALTER TABLE candidaturas
+    ADD KEY idx_candidaturas_status (status);
@@ -0,0 +1,11 @@
+-- Columna fecha_actualizacion en candidatos para que la instantánea de
+-- analitica.py (/estadisticas/*) se refresque leyendo sólo los candidatos
+-- cambiados desde el refresco anterior. MySQL la mantiene sola con cada
+-- INSERT y UPDATE; los DELETE se detectan comparando el número de candidatos.
+--
+-- Mientras no se aplique esta migración cada refresco lee la tabla entera.
+
+ALTER TABLE candidatos
+    ADD COLUMN fecha_actualizacion TIMESTAMP NOT NULL
+        DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    ADD KEY idx_candidatos_fecha_actualizacion (fecha_actualizacion);
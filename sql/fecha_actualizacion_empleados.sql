@@ -0,0 +1,9 @@
+-- Columna fecha_actualizacion en empleados para las exportaciones incrementales
+-- (/export/empleados?updated_since=...), igual que la de candidaturas y
+-- competencias en fecha_actualizacion.sql. MySQL la mantiene sola con cada
+-- INSERT y UPDATE.
+
+ALTER TABLE empleados
+    ADD COLUMN fecha_actualizacion TIMESTAMP NOT NULL
+        DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    ADD KEY idx_empleados_fecha_actualizacion (fecha_actualizacion);
@@ -0,0 +1,5 @@
+-- Índices para la paginación por keyset de /all_empleados: uno por cada columna
+-- de ordenación, con id_empleado como desempate para que el orden sea total.
+CREATE INDEX idx_empleados_num_candidaturas ON empleados (num_candidaturas, id_empleado);
+CREATE INDEX idx_empleados_nombre ON empleados (nombre_empleado, id_empleado);
+CREATE INDEX idx_empleados_rol ON empleados (rol, id_empleado);
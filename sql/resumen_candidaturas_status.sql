@@ -0,0 +1,74 @@
+-- Tabla resumen con el número de candidaturas por empleado, día y estado.
+-- Los triggers la mantienen al día de forma incremental con cada INSERT, UPDATE
+-- o DELETE sobre candidaturas, así /candidaturas_status y
+-- /candidaturas_por_empleado no necesitan recorrer candidaturas.
+--
+-- fecha_candidatura tiene que ser la columna de CANDIDATURAS_COLUMNA_FECHA
+-- (ver consultas_candidaturas.py); si la columna de fecha se llama de otra forma,
+-- sustituirla aquí antes de aplicar el script.
+--
+-- id_empleado y status forman parte de la clave primaria, así que no admiten
+-- NULL: las candidaturas con alguno de los dos nulo se cuentan con 0 y ''.
+-- Las consultas de la API los devuelven otra vez como NULL.
+
+CREATE TABLE IF NOT EXISTS resumen_candidaturas_status (
+    id_empleado INT NOT NULL,
+    fecha DATE NOT NULL,
+    status VARCHAR(50) NOT NULL,
+    total INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (id_empleado, fecha, status),
+    KEY idx_resumen_fecha (fecha)
+);
+
+DROP TRIGGER IF EXISTS candidaturas_resumen_insert;
+DROP TRIGGER IF EXISTS candidaturas_resumen_update;
+DROP TRIGGER IF EXISTS candidaturas_resumen_delete;
+
+DELIMITER //
+
+CREATE TRIGGER candidaturas_resumen_insert AFTER INSERT ON candidaturas
+FOR EACH ROW
+BEGIN
+    INSERT INTO resumen_candidaturas_status (id_empleado, fecha, status, total)
+    VALUES (COALESCE(NEW.id_empleado, 0), COALESCE(DATE(NEW.fecha_candidatura), '1970-01-01'), COALESCE(NEW.status, ''), 1)
+    ON DUPLICATE KEY UPDATE total = total + 1;
+END//
+
+CREATE TRIGGER candidaturas_resumen_update AFTER UPDATE ON candidaturas
+FOR EACH ROW
+BEGIN
+    IF NOT (OLD.id_empleado <=> NEW.id_empleado)
+        OR NOT (OLD.status <=> NEW.status)
+        OR NOT (DATE(OLD.fecha_candidatura) <=> DATE(NEW.fecha_candidatura)) THEN
+
+        UPDATE resumen_candidaturas_status
+        SET total = total - 1
+        WHERE id_empleado = COALESCE(OLD.id_empleado, 0)
+          AND fecha = COALESCE(DATE(OLD.fecha_candidatura), '1970-01-01')
+          AND status = COALESCE(OLD.status, '');
+
+        INSERT INTO resumen_candidaturas_status (id_empleado, fecha, status, total)
+        VALUES (COALESCE(NEW.id_empleado, 0), COALESCE(DATE(NEW.fecha_candidatura), '1970-01-01'), COALESCE(NEW.status, ''), 1)
+        ON DUPLICATE KEY UPDATE total = total + 1;
+    END IF;
+END//
+
+CREATE TRIGGER candidaturas_resumen_delete AFTER DELETE ON candidaturas
+FOR EACH ROW
+BEGIN
+    UPDATE resumen_candidaturas_status
+    SET total = total - 1
+    WHERE id_empleado = COALESCE(OLD.id_empleado, 0)
+      AND fecha = COALESCE(DATE(OLD.fecha_candidatura), '1970-01-01')
+      AND status = COALESCE(OLD.status, '');
+END//
+
+DELIMITER ;
+
+-- Carga inicial a partir de los datos existentes
+DELETE FROM resumen_candidaturas_status;
+
+INSERT INTO resumen_candidaturas_status (id_empleado, fecha, status, total)
+SELECT COALESCE(id_empleado, 0), COALESCE(DATE(fecha_candidatura), '1970-01-01'), COALESCE(status, ''), COUNT(*)
+FROM candidaturas
+GROUP BY COALESCE(id_empleado, 0), COALESCE(DATE(fecha_candidatura), '1970-01-01'), COALESCE(status, '');
@@ -0,0 +1,87 @@
+# Base de datos en memoria compartida por las pruebas de los módulos que leen de
+# MySQL (fixture base_datos)
+from datetime import datetime, timedelta
+
+import pytest
+
+
+# Tablas en memoria (nombre -> {id: (fila, fecha_actualizacion)}) y un reloj propio
+# para NOW(). Cada prueba indica con responder() qué filas devuelve cada consulta
+# del módulo que prueba; una consulta sin respuesta hace fallar la prueba.
+class BaseDatosMemoria:
+    def __init__(self):
+        self.ahora = datetime(2026, 1, 1)
+        self.tablas = {}
+        self.respuestas = {}
+        self.consultas = []  # (query, clase de cursor)
+
+    def insertar(self, tabla, id_fila, fila, fecha=None):
+        self.tablas.setdefault(tabla, {})[id_fila] = (fila, fecha or self.ahora)
+
+    def borrar(self, tabla, id_fila):
+        del self.tablas[tabla][id_fila]
+
+    def pasar(self, segundos):
+        self.ahora += timedelta(seconds=segundos)
+
+    # Filas de `tabla` ordenadas por id; con `desde`, sólo las actualizadas desde entonces
+    def filas(self, tabla, desde=None):
+        return [(id_fila, fila) for id_fila, (fila, fecha) in sorted(self.tablas.get(tabla, {}).items())
+                if desde is None or fecha >= desde]
+
+    # Resultado de lectura_incremental.query_totales sobre las filas que cumplen `filtro`
+    def totales(self, tabla, filtro=lambda fila: True):
+        ids = [id_fila for id_fila, fila in self.filas(tabla) if filtro(fila)]
+        return [{'total': len(ids), 'suma_ids': sum(ids)}]
+
+    def responder(self, query, funcion):
+        self.respuestas[query] = funcion
+
+    def cursor(self, clase=None):
+        return CursorMemoria(self, clase)
+
+    def close(self):
+        pass
+
+    def resolver(self, query, params, clase):
+        self.consultas.append((query, clase))
+        if 'NOW()' in query:
+            return [{'ahora': self.ahora}]
+        if query not in self.respuestas:
+            raise AssertionError(f"Consulta inesperada: {query}")
+        return list(self.respuestas[query](params))
+
+
+class CursorMemoria:
+    def __init__(self, db, clase):
+        self.db = db
+        self.clase = clase
+        self.filas = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        self.filas = self.db.resolver(query, params, self.clase)
+
+    def fetchone(self):
+        return self.filas.pop(0) if self.filas else None
+
+    def fetchall(self):
+        filas, self.filas = self.filas, []
+        return filas
+
+    def fetchmany(self, n):
+        lote, self.filas = self.filas[:n], self.filas[n:]
+        return lote
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def base_datos():
+    return BaseDatosMemoria()
@@ -0,0 +1,76 @@
+# Pruebas de analitica.leer_candidatos con una tabla candidatos en memoria
+import pymysql
+import pytest
+
+import analitica
+from estadisticas import resumen_desde_filas
+
+
+def candidato(id_candidato):
+    return {'id_candidato': id_candidato, 'carrera': 'informática', 'nivel_ingles': 'B2',
+            'nota_media': 7.5, 'edad': 20 + id_candidato}
+
+
+@pytest.fixture
+def db(base_datos):
+    base_datos.responder(analitica.QUERY_CANDIDATOS, lambda params: [
+        fila for _, fila in base_datos.filas('candidatos')])
+    base_datos.responder(analitica.QUERY_CANDIDATOS_CAMBIADOS, lambda params: [
+        fila for _, fila in base_datos.filas('candidatos', desde=params[0])])
+    base_datos.responder(analitica.QUERY_TOTAL_CANDIDATOS, lambda params: base_datos.totales('candidatos'))
+
+    for i in range(1, 11):
+        base_datos.insertar('candidatos', i, candidato(i))
+    return base_datos
+
+
+def test_las_lecturas_de_candidatos_usan_cursor_de_servidor(db):
+    tabla, _ = analitica.leer_candidatos(db)
+    db.pasar(3600)
+    db.insertar('candidatos', 11, candidato(11))
+    analitica.leer_candidatos(db, tabla)
+
+    lecturas = [clase for query, clase in db.consultas
+                if query in (analitica.QUERY_CANDIDATOS, analitica.QUERY_CANDIDATOS_CAMBIADOS)]
+    assert lecturas == [pymysql.cursors.SSDictCursor] * 2
+
+
+def test_sin_borrados_el_refresco_es_incremental(db):
+    tabla, _ = analitica.leer_candidatos(db)
+    db.pasar(3600)
+    db.insertar('candidatos', 11, candidato(11))
+
+    tabla, estadisticas = analitica.leer_candidatos(db, tabla)
+
+    assert estadisticas['tipo'] == 'incremental'
+    assert sorted(tabla.ids.tolist()) == list(range(1, 12))
+
+
+def test_un_borrado_compensado_en_el_count_fuerza_la_lectura_completa(db):
+    tabla, _ = analitica.leer_candidatos(db)
+    db.pasar(3600)
+    # Una inserción que la lectura incremental no ve compensa el borrado en el COUNT
+    db.borrar('candidatos', 3)
+    db.insertar('candidatos', 11, candidato(11), fecha=tabla.marca - analitica.MARGEN_MARCA * 2)
+
+    tabla, estadisticas = analitica.leer_candidatos(db, tabla)
+
+    assert estadisticas['tipo'] == 'completa'
+    assert sorted(tabla.ids.tolist()) == [1, 2] + list(range(4, 12))
+
+
+def test_carrera_y_nivel_se_agrupan_sin_mayusculas_ni_tildes(db):
+    db.insertar('candidatos', 11, dict(candidato(11), carrera='Informatica', nivel_ingles='b2'))
+    db.insertar('candidatos', 12, dict(candidato(12), carrera='física', nota_media=6.0))
+    # Tras un refresco incremental los valores nuevos caen en los mismos grupos
+    tabla, _ = analitica.leer_candidatos(db)
+    db.pasar(3600)
+    db.insertar('candidatos', 13, dict(candidato(13), carrera='Física', nota_media=8.0))
+    tabla, _ = analitica.leer_candidatos(db, tabla)
+
+    resumen = resumen_desde_filas(tabla.filas_resumen())
+    assert resumen['carrera'] == {'informática': round(11 / 13 * 100, 2), 'física': round(2 / 13 * 100, 2)}
+    assert resumen['notas']['física'] == 7.0
+    assert resumen['ingles'] == {'B2': 100.0}
+    grupos = tabla.consultar(filtros={'carrera': ['FISICA']})['grupos']
+    assert grupos[0]['count'] == 2
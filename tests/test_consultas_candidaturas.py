@@ -0,0 +1,47 @@
+# Pruebas de consultas_candidaturas: comprobación de la columna de fecha y
+# consultas sobre la tabla resumen
+import datetime
+
+import pytest
+
+import consultas_candidaturas as c
+
+
+def test_la_columna_de_fecha_configurada_tiene_que_existir(base_datos, monkeypatch):
+    monkeypatch.setattr(c, 'COLUMNA_FECHA', 'fecha_alta')
+    base_datos.responder(c.QUERY_COLUMNA_FECHA, lambda params: [])
+
+    with pytest.raises(c.ColumnaFechaInexistente, match="fecha_alta.*CANDIDATURAS_COLUMNA_FECHA"):
+        c.comprobar_columna_fecha(base_datos)
+
+
+def test_la_columna_de_fecha_existente_se_acepta(base_datos, monkeypatch):
+    monkeypatch.setattr(c, 'COLUMNA_FECHA', 'fecha_alta')
+    base_datos.responder(c.QUERY_COLUMNA_FECHA, lambda params: [{'existe': 1}] if params == ('fecha_alta',) else [])
+
+    c.comprobar_columna_fecha(base_datos)
+
+
+def test_sin_columna_de_fecha_no_se_comprueba_nada(base_datos, monkeypatch):
+    monkeypatch.setattr(c, 'COLUMNA_FECHA', None)
+
+    c.comprobar_columna_fecha(base_datos)
+
+    assert base_datos.consultas == []
+
+
+def test_la_tabla_resumen_devuelve_los_nulos_como_null():
+    query, _ = c.consulta_matriz_por_status(resumen=True)
+
+    assert "NULLIF(id_empleado, 0) AS id_empleado" in query
+    assert "NULLIF(status, '') AS status" in query
+    assert "GROUP BY id_empleado, status" in query
+
+
+def test_filtro_de_fechas_sobre_candidaturas_usa_la_columna_configurada(monkeypatch):
+    monkeypatch.setattr(c, 'COLUMNA_FECHA', 'fecha_alta')
+
+    query, params = c.consulta_conteo_por_status(7, datetime.date(2026, 1, 1), datetime.date(2026, 1, 31), resumen=False)
+
+    assert 'fecha_alta >= %s' in query and 'fecha_alta < %s' in query
+    assert params == [7, datetime.date(2026, 1, 1), datetime.date(2026, 2, 1)]
@@ -0,0 +1,133 @@
+# Pruebas de escritura_empleados con una conexión en memoria que se comporta
+# como las del pool (autocommit): cada sentencia fuera de una transacción abierta
+# con begin() se confirma al momento y rollback sólo deshace desde begin()
+import copy
+
+import pymysql
+import pytest
+
+from escritura_empleados import ID_EMPLEADO_REASIGNACION, actualizar_empleados, eliminar_empleados, es_id
+
+
+class ConexionMemoria:
+    def __init__(self, empleados, candidaturas, fallar_en=None):
+        self.tablas = {'empleados': empleados, 'candidaturas': candidaturas}
+        self.confirmado = copy.deepcopy(self.tablas)
+        self.en_transaccion = False
+        self.fallar_en = fallar_en
+        self.sentencias = []
+
+    def begin(self):
+        self.en_transaccion = True
+
+    def commit(self):
+        self.confirmado = copy.deepcopy(self.tablas)
+        self.en_transaccion = False
+
+    def rollback(self):
+        self.tablas = copy.deepcopy(self.confirmado)
+        self.en_transaccion = False
+
+    def cursor(self, *args):
+        return CursorMemoria(self)
+
+    def ejecutar(self, query, params):
+        sentencia = query.split()[0]
+        self.sentencias.append((sentencia, self.en_transaccion))
+        if sentencia == self.fallar_en:
+            raise pymysql.err.OperationalError(1205, "Lock wait timeout exceeded")
+
+        empleados = self.tablas['empleados']
+        candidaturas = self.tablas['candidaturas']
+        filas = []
+        if sentencia == 'SELECT':
+            filas = [{'id_empleado': i} for i in params if i in empleados]
+        elif sentencia == 'UPDATE' and 'candidaturas' in query:
+            nuevo, *ids = params
+            for id_candidatura, id_empleado in candidaturas.items():
+                if id_empleado in ids:
+                    candidaturas[id_candidatura] = nuevo
+        elif sentencia == 'UPDATE':
+            # Tabla derivada: id_empleado seguido de los campos actualizables
+            ancho = len(params) // query.count('SELECT')
+            for k in range(0, len(params), ancho):
+                if params[k] in empleados and params[k + 1] is not None:
+                    empleados[params[k]]['nombre_empleado'] = params[k + 1]
+        elif sentencia == 'DELETE':
+            for id_empleado in params:
+                empleados.pop(id_empleado, None)
+
+        if not self.en_transaccion:
+            self.commit()
+        return filas
+
+
+class CursorMemoria:
+    def __init__(self, conexion):
+        self.conexion = conexion
+        self.filas = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        self.filas = self.conexion.ejecutar(query, params)
+
+    def fetchall(self):
+        return self.filas
+
+
+def conexion(fallar_en=None):
+    empleados = {i: {'nombre_empleado': f'empleado{i}'} for i in (1, 2, 3)}
+    candidaturas = {10: 2, 11: 3, 12: 3, 13: 1}
+    return ConexionMemoria(empleados, candidaturas, fallar_en)
+
+
+def test_eliminar_reasigna_y_borra_en_una_transaccion():
+    db = conexion()
+
+    assert eliminar_empleados(db, [2, 3, 99]) == {2, 3}
+
+    assert set(db.confirmado['empleados']) == {1}
+    assert set(db.confirmado['candidaturas'].values()) == {ID_EMPLEADO_REASIGNACION}
+    assert [sentencia for sentencia, _ in db.sentencias] == ['SELECT', 'UPDATE', 'DELETE']
+    assert all(en_transaccion for _, en_transaccion in db.sentencias)
+
+
+def test_si_falla_el_delete_se_deshace_la_reasignacion():
+    db = conexion(fallar_en='DELETE')
+
+    with pytest.raises(pymysql.err.OperationalError):
+        eliminar_empleados(db, [2, 3])
+
+    assert db.confirmado['candidaturas'] == {10: 2, 11: 3, 12: 3, 13: 1}
+    assert set(db.confirmado['empleados']) == {1, 2, 3}
+    assert db.tablas == db.confirmado
+    assert not db.en_transaccion
+
+
+def test_actualizar_bloquea_y_actualiza_en_una_transaccion():
+    db = conexion()
+
+    assert actualizar_empleados(db, {2: {'nombre_empleado': 'Ana'}, 99: {'nombre_empleado': 'X'}}) == {2}
+
+    assert db.confirmado['empleados'][2]['nombre_empleado'] == 'Ana'
+    assert db.sentencias == [('SELECT', True), ('UPDATE', True)]
+
+
+def test_si_falla_actualizar_no_queda_la_transaccion_abierta():
+    db = conexion(fallar_en='UPDATE')
+
+    with pytest.raises(pymysql.err.OperationalError):
+        actualizar_empleados(db, {2: {'nombre_empleado': 'Ana'}})
+
+    assert db.confirmado['empleados'][2]['nombre_empleado'] == 'empleado2'
+    assert not db.en_transaccion
+
+
+@pytest.mark.parametrize('valor, valido', [(1, True), (0, True), (True, False), (False, False), (1.0, False), ('1', False), (None, False)])
+def test_es_id_rechaza_booleanos(valor, valido):
+    assert es_id(valor) is valido
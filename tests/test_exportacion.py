@@ -0,0 +1,73 @@
+# Pruebas de las columnas de /export: se leen de la tabla real al abrir la exportación
+from datetime import datetime
+
+import pytest
+
+import exportacion
+from exportacion import Exportador, consulta_exportacion, leer_columnas
+
+
+def columna(nombre, tipo, precision=None, escala=None):
+    return {'columna': nombre, 'tipo': tipo, 'precision_': precision, 'escala': escala}
+
+
+# Tablas tal y como están antes de aplicar las migraciones de sql/ (sin fecha_actualizacion)
+COLUMNAS = {
+    'empleados': [columna('id_empleado', 'int', 10, 0), columna('nombre_empleado', 'varchar'),
+                  columna('password', 'varchar'), columna('rol', 'varchar')],
+    'competencias': [columna('id_competencia', 'int', 10, 0), columna('nombre_competencia', 'varchar'),
+                     columna('nota', 'decimal', 4, 2)],
+}
+
+
+@pytest.fixture
+def exportador(base_datos, monkeypatch):
+    base_datos.responder(exportacion.QUERY_COLUMNAS, lambda params: COLUMNAS.get(params[0], []))
+    base_datos.responder("SET SESSION net_write_timeout = %s", lambda params: [])
+    monkeypatch.setattr(exportacion.pymysql, 'connect', lambda **kwargs: base_datos)
+    return Exportador({}, max_concurrentes=1)
+
+
+def responder_filas(base_datos, tabla, filas):
+    query, _ = consulta_exportacion(tabla, leer_columnas(base_datos.cursor(), tabla))
+    base_datos.responder(query, lambda params: filas)
+    return query
+
+
+def test_por_defecto_se_exportan_las_columnas_reales_sin_la_contrasena(exportador, base_datos):
+    query = responder_filas(base_datos, 'empleados', [{'id_empleado': 1, 'nombre_empleado': 'Ana', 'rol': 'x'}])
+
+    abierta = exportador.abrir('empleados')
+
+    assert [c.nombre for c in abierta.columnas] == ['id_empleado', 'nombre_empleado', 'rol']
+    assert query == "SELECT id_empleado, nombre_empleado, rol FROM empleados"
+    assert b''.join(exportacion.ndjson(abierta)) == b'{"id_empleado":1,"nombre_empleado":"Ana","rol":"x"}\n'
+
+
+def test_la_contrasena_no_se_puede_pedir(exportador):
+    with pytest.raises(ValueError, match="password"):
+        exportador.abrir('empleados', 'id_empleado,password')
+
+
+def test_updated_since_sin_la_columna_de_fecha_es_un_error_claro(exportador):
+    with pytest.raises(ValueError, match="fecha_actualizacion"):
+        exportador.abrir('competencias', desde=datetime(2026, 1, 1))
+
+    # El hueco de la exportación fallida se devuelve
+    assert exportador._huecos.acquire(blocking=False)
+
+
+def test_columnas_pedidas_en_su_orden(exportador, base_datos):
+    base_datos.responder("SELECT nota, id_competencia FROM competencias", lambda params: [])
+
+    abierta = exportador.abrir('competencias', 'nota, id_competencia')
+
+    assert [(c.nombre, c.tipo) for c in abierta.columnas] == [('nota', 'decimal'), ('id_competencia', 'int')]
+    abierta.cerrar()
+
+
+def test_la_nota_decimal_se_exporta_a_parquet_como_decimal():
+    pa = pytest.importorskip('pyarrow')
+    nota = exportacion.Columna('nota', 'decimal', 4, 2)
+
+    assert exportacion.tipo_arrow(pa, nota) == pa.decimal128(4, 2)
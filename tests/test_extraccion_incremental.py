@@ -0,0 +1,62 @@
+# Pruebas de reentrenamiento.extraer_incremental con una base de datos en memoria
+import pytest
+
+import reentrenamiento as r
+from inferencia import COMPETENCIAS
+
+
+@pytest.fixture
+def db(base_datos):
+    def en_status(status):
+        return {i for i, fila in base_datos.filas('candidaturas') if fila['status'] in status}
+
+    def cambiadas(params):
+        return {i for i, _ in base_datos.filas('candidaturas', desde=params[0])}
+
+    def candidaturas(ids):
+        return [(i, fila['status']) for i, fila in base_datos.filas('candidaturas') if i in ids]
+
+    def competencias(ids):
+        return [(i, nombre, 7.0) for i in sorted(ids) for nombre in COMPETENCIAS]
+
+    base_datos.responder(r.QUERY_CANDIDATURAS, lambda status: candidaturas(en_status(status)))
+    base_datos.responder(r.QUERY_COMPETENCIAS, lambda status: competencias(en_status(status)))
+    base_datos.responder(r.QUERY_CANDIDATURAS_CAMBIADAS, lambda params: candidaturas(cambiadas(params)))
+    base_datos.responder(r.QUERY_COMPETENCIAS_CAMBIADAS, lambda params: competencias(cambiadas(params)))
+    base_datos.responder(r.QUERY_TOTAL_CANDIDATURAS, lambda status: base_datos.totales(
+        'candidaturas', lambda fila: fila['status'] in status))
+
+    for i in range(1, 11):
+        base_datos.insertar('candidaturas', i, {'status': 'Ofertado' if i % 2 else 'Descartado'})
+    return base_datos
+
+
+def extraer(db, anterior=None):
+    X, y, estadisticas, instantanea = r.extraer_incremental(db, anterior)
+    return estadisticas, instantanea
+
+
+def test_sin_borrados_el_refresco_es_incremental(db):
+    _, anterior = extraer(db)
+    db.pasar(3600)
+    db.insertar('candidaturas', 11, {'status': 'Ofertado'})
+
+    estadisticas, instantanea = extraer(db, anterior)
+
+    assert estadisticas['tipo'] == 'incremental'
+    assert instantanea.conjunto.ids.tolist() == list(range(1, 12))
+
+
+def test_un_borrado_compensado_con_una_insercion_fuerza_la_extraccion_completa(db):
+    _, anterior = extraer(db)
+    db.pasar(3600)
+    # Una inserción que la lectura incremental no ve (confirmada después del margen
+    # de la marca) compensa el borrado en el COUNT: sólo la suma de los ids lo delata
+    db.borrar('candidaturas', 3)
+    db.insertar('candidaturas', 11, {'status': 'Ofertado'}, fecha=anterior.marca - r.MARGEN_MARCA * 2)
+
+    estadisticas, instantanea = extraer(db, anterior)
+
+    assert estadisticas['tipo'] == 'completa'
+    assert [query for query, _ in db.consultas].count(r.QUERY_CANDIDATURAS) == 2
+    assert instantanea.conjunto.ids.tolist() == [1, 2] + list(range(4, 12))
@@ -0,0 +1,155 @@
+# Pruebas de RegistroModelos con FuenteS3 sobre S3Local (un bucket en un directorio)
+import io
+import threading
+
+import joblib
+import pytest
+
+import registro_modelos
+from registro_modelos import FuenteS3, RegistroModelos
+from s3_local import S3Local
+
+BUCKET = 'modelosexe'
+KEY = 'model_web1.pkl'
+
+
+# S3Local que cuenta las llamadas y puede retener las descargas hasta que se le indique
+class S3Contado(S3Local):
+    def __init__(self, directorio):
+        super().__init__(directorio)
+        self.heads = 0
+        self.gets = 0
+        self.descargando = threading.Event()
+        self.continuar = threading.Event()
+        self.continuar.set()
+
+    def head_object(self, Bucket, Key):
+        self.heads += 1
+        return super().head_object(Bucket, Key)
+
+    def get_object(self, Bucket, Key):
+        self.gets += 1
+        self.descargando.set()
+        self.continuar.wait(timeout=5)
+        return super().get_object(Bucket, Key)
+
+
+def publicar(s3, modelo):
+    contenido = io.BytesIO()
+    joblib.dump(modelo, contenido)
+    s3.put_object(Bucket=BUCKET, Key=KEY, Body=contenido.getvalue())
+
+
+@pytest.fixture
+def s3(tmp_path):
+    cliente = S3Contado(str(tmp_path))
+    publicar(cliente, {'nombre': 'v1'})
+    return cliente
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    ahora = [1000.0]
+    monkeypatch.setattr(registro_modelos.time, 'monotonic', lambda: ahora[0])
+    return ahora
+
+
+def test_primera_carga_usa_el_etag_como_version(s3):
+    registro = RegistroModelos(FuenteS3(s3, BUCKET, KEY), ttl=60)
+
+    cargado = registro.obtener()
+
+    assert cargado.modelo == {'nombre': 'v1'}
+    assert cargado.version == s3.head_object(Bucket=BUCKET, Key=KEY)['ETag']
+    assert s3.gets == 1
+
+
+def test_dentro_del_ttl_no_se_consulta_s3(s3, reloj):
+    registro = RegistroModelos(FuenteS3(s3, BUCKET, KEY), ttl=60)
+    primero = registro.obtener()
+    heads = s3.heads
+
+    reloj[0] += 59
+    assert not registro.caducado()
+    assert registro.obtener() is primero
+    assert s3.heads == heads
+    assert s3.gets == 1
+
+
+def test_caducado_el_ttl_con_el_mismo_etag_no_se_descarga(s3, reloj):
+    registro = RegistroModelos(FuenteS3(s3, BUCKET, KEY), ttl=60)
+    primero = registro.obtener()
+
+    reloj[0] += 61
+    assert registro.caducado()
+    assert registro.obtener() is primero
+    assert not registro.caducado()
+    assert s3.heads == 1
+    assert s3.gets == 1
+
+    # El TTL vuelve a contar desde la comprobación
+    reloj[0] += 30
+    registro.obtener()
+    assert s3.heads == 1
+
+
+def test_caducado_el_ttl_con_etag_nuevo_se_carga_el_modelo_nuevo(s3, reloj):
+    registro = RegistroModelos(FuenteS3(s3, BUCKET, KEY), ttl=60)
+    primero = registro.obtener()
+    publicar(s3, {'nombre': 'v2'})
+
+    reloj[0] += 30
+    assert registro.obtener() is primero
+
+    reloj[0] += 31
+    nuevo = registro.obtener()
+    assert nuevo.modelo == {'nombre': 'v2'}
+    assert nuevo.version != primero.version
+    assert s3.gets == 2
+
+
+def test_recargar_comprueba_sin_esperar_al_ttl(s3, reloj):
+    registro = RegistroModelos(FuenteS3(s3, BUCKET, KEY), ttl=3600)
+    registro.obtener()
+
+    assert registro.recargar() is False
+    assert s3.gets == 1
+
+    publicar(s3, {'nombre': 'v2'})
+    assert registro.recargar() is True
+    assert registro.obtener().modelo == {'nombre': 'v2'}
+    assert s3.gets == 2
+
+
+def test_si_s3_falla_se_sigue_con_el_modelo_cargado(s3, reloj, tmp_path):
+    registro = RegistroModelos(FuenteS3(s3, BUCKET, KEY), ttl=60)
+    primero = registro.obtener()
+    (tmp_path / BUCKET / KEY).unlink()
+
+    reloj[0] += 61
+    assert registro.obtener() is primero
+
+
+def test_swap_atomico_con_un_lector_que_conserva_el_modelo_anterior(s3):
+    registro = RegistroModelos(FuenteS3(s3, BUCKET, KEY), ttl=0,
+                               preparar=lambda modelo: ('predictor', modelo['nombre']))
+    en_uso = registro.obtener()
+    publicar(s3, {'nombre': 'v2'})
+
+    # Mientras se descarga la versión nueva, el resto de lectores sigue con la anterior sin esperar
+    s3.descargando.clear()
+    s3.continuar.clear()
+    recarga = threading.Thread(target=registro.obtener)
+    recarga.start()
+    assert s3.descargando.wait(timeout=5)
+    assert registro.obtener() is en_uso
+    assert registro.actual is en_uso
+    s3.continuar.set()
+    recarga.join(timeout=5)
+
+    nuevo = registro.actual
+    assert nuevo.modelo == {'nombre': 'v2'}
+    assert nuevo.predictor == ('predictor', 'v2')
+    # La tupla que obtuvo el lector no se modifica: modelo y predictor siguen siendo de v1
+    assert en_uso.modelo == {'nombre': 'v1'}
+    assert en_uso.predictor == ('predictor', 'v1')
@@ -0,0 +1,19 @@
+# Reparto de las conexiones a MySQL entre los workers de servidor.py
+import pytest
+
+import servidor
+
+
+@pytest.mark.parametrize('total', [2, 3, 10, 32, 33])
+def test_el_total_de_conexiones_no_se_supera_con_ningun_numero_de_workers_permitido(total):
+    for workers in range(1, servidor.max_workers(total) + 1):
+        tamano = servidor.tamano_pool(total, workers)
+        assert tamano >= servidor.MIN_POOL_WORKER
+        assert workers * tamano <= total
+
+
+@pytest.mark.parametrize('cpus, total, esperado', [(64, 32, 16), (4, 32, 4), (8, 3, 1), (None, 32, 1)])
+def test_por_defecto_un_worker_por_cpu_sin_pasar_del_total(monkeypatch, cpus, total, esperado):
+    monkeypatch.setattr(servidor.os, 'cpu_count', lambda: cpus)
+
+    assert servidor.workers_por_defecto(total) == esperado